@@ -0,0 +1,110 @@
+"""
+Tiện ích cho trang danh sách admin của các bảng lớn (Bet, Transaction, yêu
+cầu nạp/rút): phân trang không đếm toàn bảng, tìm kiếm đi qua index và xuất
+file theo luồng.
+"""
+import re
+
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .exports import export_response
+
+
+def estimated_row_count(model, using='default'):
+    """
+    Số dòng ước lượng của cả bảng, không quét bảng: thống kê của planner
+    (PostgreSQL) hoặc id lớn nhất (các database khác, bỏ qua các id đã xóa).
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model._default_manager.using(using).aggregate(last=Max('pk'))['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator không chạy COUNT(*) chính xác trên bảng lớn: chỉ đếm tối đa
+    `count_limit` + 1 dòng khớp bộ lọc (COUNT trên subquery có LIMIT). Vượt
+    ngưỡng thì dùng số ước lượng của cả bảng khi không lọc, hoặc chính ngưỡng
+    khi có lọc (trang cuối hiển thị là trang thứ count_limit / per_page).
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        capped = queryset.order_by().values('pk')[:self.count_limit + 1].count()
+        if capped <= self.count_limit:
+            return capped
+        if not queryset.query.has_filters():
+            return max(estimated_row_count(queryset.model, queryset.db), capped)
+        return self.count_limit
+
+
+class IndexedSearchMixin:
+    """
+    Tìm kiếm admin chỉ bằng phép so sánh dùng được index, thay cho
+    `search_fields` (icontains, quét toàn bảng).
+
+    `indexed_search_fields` là danh sách (đường dẫn trường, kiểu, regex):
+    trường đầu tiên có regex khớp với từ khóa được dùng (regex None = luôn
+    khớp). Nếu regex có nhóm tên `term` (ví dụ r'dai:(?P<term>.+)') thì giá
+    trị tìm là phần khớp nhóm đó, để chọn trường bằng tiền tố trong từ khóa.
+    Kiểu 'exact' so sánh bằng; 'prefix' là khoảng
+    [từ khóa, từ khóa + U+10FFFF) nên đi qua index B-tree (phân biệt hoa thường).
+    """
+    indexed_search_fields = ()
+
+    def get_search_fields(self, request):
+        # Hiện ô tìm kiếm trên trang danh sách
+        return [field for field, _, _ in self.indexed_search_fields]
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        for field, mode, pattern in self.indexed_search_fields:
+            match = re.fullmatch(pattern, term) if pattern is not None else None
+            if pattern is not None and not match:
+                continue
+            if match and 'term' in match.groupdict():
+                term = match.group('term')
+            if mode == 'exact':
+                return queryset.filter(Q(**{field: term})), False
+            return queryset.filter(Q(**{f"{field}__gte": term, f"{field}__lt": term + '\U0010ffff'})), False
+        return queryset.none(), False
+
+
+class StreamingExportMixin:
+    """
+    Các action xuất CSV / CSV.gz / JSONL.gz các dòng đã chọn (hoặc toàn bộ kết
+    quả lọc khi chọn "tất cả"), stream theo khối id (xem DjangoProject.exports).
+    Lớp con khai báo `export_fields` và thêm tên action vào `actions`.
+    """
+    export_fields = ()
+    export_actions = ['export_csv', 'export_csv_gzip', 'export_jsonl_gzip']
+
+    def _export(self, queryset, fmt, compress):
+        filename = f"{self.model._meta.model_name}-{timezone.localdate():%Y%m%d}"
+        return export_response(queryset, self.export_fields, filename, fmt, compress)
+
+    @admin.action(description="Xuất CSV các dòng đã chọn")
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv', False)
+
+    @admin.action(description="Xuất CSV (nén gzip) các dòng đã chọn")
+    def export_csv_gzip(self, request, queryset):
+        return self._export(queryset, 'csv', True)
+
+    @admin.action(description="Xuất JSON Lines (nén gzip) các dòng đã chọn")
+    def export_jsonl_gzip(self, request, queryset):
+        return self._export(queryset, 'jsonl', True)
@@ -0,0 +1,187 @@
+"""
+Xuất dữ liệu lớn (Bet, Transaction) ra CSV hoặc JSON Lines theo luồng.
+
+Dữ liệu được đọc từng khối theo khóa chính (WHERE pk > id cuối ORDER BY pk
+LIMIT n, trong một cửa sổ id), mỗi khối một truy vấn riêng, nên bộ nhớ không phụ thuộc số dòng
+và một lần xuất bị đứt có thể chạy tiếp từ id cuối cùng đã nhận (cột đầu
+tiên của mỗi dòng luôn là id). Nén gzip được làm ngay trên luồng.
+"""
+import csv
+import datetime
+import json
+import sys
+import zlib
+from decimal import Decimal
+
+from django.db.models import Max, Min
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_WINDOW_FACTOR = 10
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# (đường dẫn trường, tên cột) của file xuất; cột 'id' được thêm vào đầu
+BET_EXPORT_FIELDS = (
+    ('user__username', 'username'),
+    ('station__identifier', 'station'),
+    ('bet_type', 'bet_type'),
+    ('number', 'number'),
+    ('amount', 'amount'),
+    ('winnings', 'winnings'),
+    ('status', 'status'),
+    ('date', 'date'),
+    ('created_at', 'created_at'),
+)
+TRANSACTION_EXPORT_FIELDS = (
+    ('wallet_id', 'wallet_id'),
+    ('wallet__user__username', 'username'),
+    ('transaction_type', 'transaction_type'),
+    ('amount', 'amount'),
+    ('timestamp', 'timestamp'),
+    ('description', 'description'),
+    ('external_id', 'external_id'),
+)
+
+
+def iter_chunks(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE, after_id=0):
+    """
+    Các khối dòng (tuple: pk, *fields) của queryset, tăng dần theo pk, bắt
+    đầu sau `after_id`. Bỏ qua ordering/select_related của queryset.
+
+    Mỗi truy vấn chỉ xét một cửa sổ id (pk > id cuối AND pk <= id cuối +
+    EXPORT_WINDOW_FACTOR x chunk_size): database đi theo khóa chính thay vì
+    lấy mọi dòng khớp bộ lọc rồi sắp xếp lại ở từng khối, và mỗi truy vấn
+    ngắn (SQLite không giữ khóa đọc suốt lần xuất).
+    """
+    queryset = queryset.order_by().select_related(None)
+    bounds = queryset.filter(pk__gt=after_id or 0).aggregate(first=Min('pk'), last=Max('pk'))
+    if bounds['first'] is None:
+        return
+    window = chunk_size * EXPORT_WINDOW_FACTOR
+    last_id = bounds['first'] - 1
+    while last_id < bounds['last']:
+        upper = min(last_id + window, bounds['last'])
+        rows = list(
+            queryset.filter(pk__gt=last_id, pk__lte=upper).order_by('pk').values_list('pk', *fields)[:chunk_size]
+        )
+        if rows:
+            yield rows
+        # Khối đầy thì cửa sổ có thể còn dòng: đi tiếp từ id cuối đã nhận
+        last_id = rows[-1][0] if len(rows) == chunk_size else upper
+
+
+def _cell(value):
+    if isinstance(value, datetime.datetime):
+        return (timezone.localtime(value) if timezone.is_aware(value) else value).isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class _Echo:
+    """Bộ đệm giả cho csv.writer: trả lại chuỗi thay vì ghi."""
+
+    def write(self, value):
+        return value
+
+
+def csv_blocks(chunks, header):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for rows in chunks:
+        yield ''.join(writer.writerow([_cell(value) for value in row]) for row in rows)
+
+
+def jsonl_blocks(chunks, header):
+    for rows in chunks:
+        yield ''.join(
+            json.dumps(dict(zip(header, (_cell(value) for value in row))), ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def gzip_blocks(blocks):
+    """
+    Nén gzip từng khối (bytes) ngay khi nhận, không giữ toàn bộ file. Mỗi
+    khối được đẩy hết ra (Z_SYNC_FLUSH) thay vì nằm trong bộ đệm của zlib:
+    khối đã qua đây là đã giải nén được từ file, nên id cuối báo cho
+    --after-id khớp với dữ liệu thực sự đã ghi.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for block in blocks:
+        yield compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _tracked(chunks, progress):
+    for rows in chunks:
+        yield rows
+        # Chạy khi khối tiếp theo được yêu cầu, tức là bytes của khối này
+        # (kể cả khi nén, xem gzip_blocks) đã được ghi ra
+        progress(len(rows), rows[-1][0])
+
+
+def export_blocks(queryset, fields, fmt='csv', compress=False, chunk_size=EXPORT_CHUNK_SIZE, after_id=0,
+                  progress=None):
+    """
+    Luồng bytes của file xuất. `fields` là danh sách (đường dẫn trường, tên
+    cột); cột 'id' luôn đứng đầu. `progress(số dòng, id cuối)` được gọi sau
+    mỗi khối đã ghi ra (dùng để chạy tiếp bằng after_id).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Định dạng xuất không hỗ trợ: {fmt}")
+    header = ['id'] + [name for _, name in fields]
+    chunks = iter_chunks(queryset, [path for path, _ in fields], chunk_size, after_id)
+    if progress is not None:
+        chunks = _tracked(chunks, progress)
+    text = csv_blocks(chunks, header) if fmt == 'csv' else jsonl_blocks(chunks, header)
+    blocks = (block.encode('utf-8') for block in text)
+    return gzip_blocks(blocks) if compress else blocks
+
+
+def write_export(queryset, fields, options, stderr):
+    """
+    Dùng cho lệnh quản trị: ghi file xuất ra options['output'] (hoặc stdout)
+    theo các tùy chọn format, gzip, chunk_size, after_id. Báo id cuối cùng đã
+    ghi ra `stderr`, kể cả khi bị dừng giữa chừng.
+    """
+    written = {'rows': 0, 'last_id': options['after_id']}
+
+    def progress(count, last_id):
+        written['rows'] += count
+        written['last_id'] = last_id
+
+    blocks = export_blocks(
+        queryset, fields, options['format'], options['gzip'], options['chunk_size'], options['after_id'], progress,
+    )
+    out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+    try:
+        for block in blocks:
+            out.write(block)
+        out.flush()
+    except BaseException:
+        stderr.write(
+            f"Dừng sau {written['rows']} dòng; chạy tiếp với --after-id {written['last_id']} (ghi ra file mới)."
+        )
+        raise
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    stderr.write(f"Đã xuất {written['rows']} dòng (id cuối: {written['last_id']}).")
+    return written
+
+
+def export_response(queryset, fields, filename, fmt='csv', compress=False, after_id=0):
+    """StreamingHttpResponse tải file xuất (`filename` không kèm phần mở rộng)."""
+    filename = f"{filename}.{fmt}" + ('.gz' if compress else '')
+    content_type = 'application/gzip' if compress else (
+        'text/csv; charset=utf-8' if fmt == 'csv' else 'application/x-ndjson; charset=utf-8'
+    )
+    response = StreamingHttpResponse(
+        export_blocks(queryset, fields, fmt, compress, after_id=after_id), content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -83,6 +83,22 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Nhiều tiến trình cùng ghi (tính thưởng song song, đặt cược, duyệt
+        # nạp/rút): BEGIN IMMEDIATE để chờ theo 'timeout' thay vì báo
+        # "database is locked" ngay lập tức. Với BEGIN DEFERRED, transaction
+        # đọc rồi mới ghi phải nâng khóa giữa chừng và SQLite trả lỗi ngay
+        # (không chờ timeout) nếu đã có tiến trình khác đang ghi. Mọi
+        # atomic() của project đều có ghi; các atomic() chỉ đọc (trang
+        # sửa/xóa của admin) ngắn và ít, nên áp dụng cho cả kết nối.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # DB test dạng file (thay vì in-memory) để các test nhiều luồng
+        # mở được nhiều kết nối cùng lúc
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
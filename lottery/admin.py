@@ -1,6 +1,10 @@
 from django.contrib import admin, messages
-from .models import LotteryResult, Bet, LotteryStation  # Thêm LotteryStation
+from DjangoProject.admin_utils import EstimatedCountPaginator, IndexedSearchMixin, StreamingExportMixin
+from DjangoProject.exports import BET_EXPORT_FIELDS
+from .models import LotteryResult, Bet, LotteryStation, SettlementRun, DrawCalendar, DrawClosure, BetSlip, BetExposure  # Thêm LotteryStation
+from .models import ExtractionCacheStats, GeminiExtraction, ResultImage
 from .logic import process_lottery_results
+from .extraction_cache import cache_stats, max_cache_bytes
 
 
 # Đăng ký model mới
@@ -57,8 +61,139 @@ class LotteryResultAdmin(admin.ModelAdmin):
 
 
 @admin.register(Bet)
-class BetAdmin(admin.ModelAdmin):
+class BetAdmin(IndexedSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     list_display = ('user', 'station', 'bet_type', 'number', 'amount', 'date', 'status', 'winnings', 'created_at')
-    list_filter = ('date', 'status', 'bet_type', 'station')
-    search_fields = ('user__username', 'number', 'station__name')
-    readonly_fields = ('winnings', 'created_at')
\ No newline at end of file
+    list_filter = ('status', 'bet_type', 'station')
+    list_select_related = ('user', 'station')
+    date_hierarchy = 'date'
+    # Bảng lớn: sắp theo id (rowid), không đếm toàn bảng
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # Hai chữ số -> tìm theo số cược (nên chọn ngày để đi qua index (date, station, status)),
+    # "dai:<mã đài>" -> theo mã đài (duy nhất, có index; thay cho tìm theo tên đài),
+    # còn lại -> tìm theo đầu username
+    indexed_search_fields = (
+        ('number', 'exact', r'\d{2}'),
+        ('station__identifier', 'exact', r'dai:\s*(?P<term>[-\w]+)'),
+        ('user__username', 'prefix', None),
+    )
+    readonly_fields = ('winnings', 'created_at')
+    raw_id_fields = ('user',)
+    # Xuất cho bộ phận tài chính (lọc theo ngày/đài/trạng thái trước khi chọn "tất cả")
+    export_fields = BET_EXPORT_FIELDS
+    actions = StreamingExportMixin.export_actions
+
+
+@admin.register(SettlementRun)
+class SettlementRunAdmin(admin.ModelAdmin):
+    list_display = ('date', 'station', 'status', 'started_at', 'finished_at', 'win_count', 'lose_count',
+                    'total_winnings', 'chunk_count')
+    list_filter = ('status', 'date', 'station')
+
+    # Sổ cái chỉ do tiến trình tính thưởng ghi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DrawClosure)
+class DrawClosureAdmin(admin.ModelAdmin):
+    list_display = ('start_date', 'end_date', 'station', 'reason')
+    list_filter = ('station',)
+
+
+@admin.register(DrawCalendar)
+class DrawCalendarAdmin(admin.ModelAdmin):
+    list_display = ('draw_date', 'station', 'cutoff_at')
+    list_filter = ('station',)
+    date_hierarchy = 'draw_date'
+
+    # Lịch được sinh từ lịch quay của đài và các ngày nghỉ (lệnh build_draw_calendar)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BetSlip)
+class BetSlipAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'station', 'bet_type', 'amount_per_bet', 'bet_date', 'status', 'created_at',
+                    'processed_at')
+    list_filter = ('status', 'bet_date', 'station')
+    search_fields = ('user__username',)
+
+    # Phiếu chỉ do view đặt cược và tiến trình drain_bet_slips ghi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BetExposure)
+class BetExposureAdmin(admin.ModelAdmin):
+    list_display = ('date', 'station', 'bet_type', 'number', 'amount', 'pending_amount')
+    list_filter = ('date', 'bet_type', 'station')
+
+    # Được cập nhật bởi luồng đặt/hủy cược và tính thưởng (lệnh rebuild_exposure để tính lại)
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ExtractionCacheStats)
+class ExtractionCacheStatsAdmin(admin.ModelAdmin):
+    list_display = ('name', 'hits', 'misses', 'hit_rate', 'evictions', 'cached_images', 'cached_size', 'updated_at')
+
+    @admin.display(description="Tỉ lệ hit")
+    def hit_rate(self, obj):
+        total = obj.hits + obj.misses
+        return f"{obj.hits * 100 / total:.1f}%" if total else "-"
+
+    @admin.display(description="Số ảnh trong cache")
+    def cached_images(self, obj):
+        return cache_stats()['images']
+
+    @admin.display(description="Dung lượng cache")
+    def cached_size(self, obj):
+        return f"{cache_stats()['bytes'] / 1024 / 1024:,.2f} / {max_cache_bytes() / 1024 / 1024:,.0f} MB"
+
+    # Bộ đếm chỉ do lottery/extraction_cache.py ghi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(GeminiExtraction)
+class GeminiExtractionAdmin(admin.ModelAdmin):
+    list_display = ('image', 'prize_count', 'prompt_version', 'hit_count', 'created_at')
+    list_filter = ('prize_count', 'prompt_version')
+    list_select_related = ('image',)
+    readonly_fields = ('image', 'prize_count', 'prompt_version', 'prizes', 'hit_count', 'created_at')
+
+    # Xóa một dòng để buộc bóc tách lại ảnh đó bằng Gemini
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResultImage)
+class ResultImageAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'size', 'created_at', 'last_used_at')
+    search_fields = ('=sha256',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LotteryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'lottery'
+
+    def ready(self):
+        # Đăng ký signal làm mới danh mục đài
+        import lottery.signals
@@ -0,0 +1,310 @@
+"""
+Lưu trữ lạnh cho vé đã tính thưởng (WON/LOST).
+
+Vé cũ hơn thời hạn lưu giữ được chuyển ra các file theo tháng
+(`bets-YYYY-MM.json.gz` trong LOTTERY_ARCHIVE_DIR), rồi xóa khỏi bảng Bet.
+Mỗi file là chuỗi các khối (mỗi khối tối đa ARCHIVE_CHUNK_SIZE vé, một
+member gzip chứa một dòng JSON theo cột: mỗi trường một danh sách, tiền lưu
+bằng xu), nên nhỏ hơn nhiều so với dòng + index trong database, và được đọc
+/ ghi lần lượt từng khối: bộ nhớ không phụ thuộc số vé của tháng.
+
+Mỗi khối vé được lưu trữ trong MỘT transaction: khóa các vé của khối, ghi
+thêm khối vào cuối file (fsync), rồi xóa đúng các id vừa ghi. Vé không thể
+bị sửa lại giữa lúc ghi và lúc xóa. Nếu tiến trình dừng sau khi ghi file mà
+trước khi commit, vé nằm ở cả hai nơi: các hàm đọc bỏ bản lưu trữ của vé vẫn
+còn trong bảng, và lần chạy sau bỏ các bản đó (cùng khối cuối ghi dở) khỏi
+file trước khi ghi thêm (compact_month), nên không nhân đôi.
+
+API đọc (bet_history, bet_statistics, archived_bet_totals) trả lời trên cả
+bảng Bet lẫn file lưu trữ.
+"""
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Bet
+
+ARCHIVE_VERSION = 1
+ARCHIVE_CHUNK_SIZE = 500
+SETTLED_STATUSES = ('WON', 'LOST')
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+# Thứ tự cột trong file (cũng là thứ tự trường của BetRecord)
+COLUMNS = ('id', 'user_id', 'station_id', 'bet_type', 'number', 'amount', 'winnings', 'status', 'date',
+           'created_at')
+
+BetRecord = namedtuple('BetRecord', COLUMNS)
+
+
+def archive_dir():
+    return Path(getattr(settings, 'LOTTERY_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'bets'))
+
+
+def retention_days():
+    return getattr(settings, 'LOTTERY_ARCHIVE_RETENTION_DAYS', 90)
+
+
+def month_path(year, month):
+    return archive_dir() / f"bets-{year:04d}-{month:02d}.json.gz"
+
+
+def _months_between(date_from, date_to):
+    """Các (năm, tháng) giao với [date_from, date_to]; None = mọi file hiện có."""
+    if date_from is None or date_to is None:
+        found = sorted(archive_dir().glob('bets-*.json.gz'))
+        months = [tuple(int(part) for part in path.name[5:12].split('-')) for path in found]
+        return [
+            (year, month) for year, month in months
+            if (date_from is None or (year, month) >= (date_from.year, date_from.month))
+            and (date_to is None or (year, month) <= (date_to.year, date_to.month))
+        ]
+    months = []
+    year, month = date_from.year, date_from.month
+    while (year, month) <= (date_to.year, date_to.month):
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+# --- ĐỊNH DẠNG FILE ---
+
+def _encode(records):
+    columns = {name: [] for name in COLUMNS}
+    for record in records:
+        for name, value in zip(COLUMNS, record):
+            columns[name].append(value)
+    columns['amount'] = [int(amount / CENT) for amount in columns['amount']]
+    columns['winnings'] = [int(winnings / CENT) for winnings in columns['winnings']]
+    columns['date'] = [value.isoformat() for value in columns['date']]
+    columns['created_at'] = [value.isoformat() for value in columns['created_at']]
+    return {'version': ARCHIVE_VERSION, 'count': len(columns['id']), 'columns': columns}
+
+
+def _decode(payload):
+    columns = payload['columns']
+    rows = zip(*(columns[name] for name in COLUMNS))
+    for bet_id, user_id, station_id, bet_type, number, amount, winnings, status, date, created_at in rows:
+        yield BetRecord(
+            bet_id, user_id, station_id, bet_type, number,
+            Decimal(amount) * CENT, Decimal(winnings) * CENT, status,
+            datetime.date.fromisoformat(date), datetime.datetime.fromisoformat(created_at),
+        )
+
+
+def _read_chunks(path, strict=False):
+    """
+    Các khối vé của một file, lần lượt (không có gì nếu chưa có file). Khối
+    cuối ghi dở (tiến trình dừng giữa lúc ghi; vé của nó chưa bị xóa khỏi
+    bảng) bị bỏ qua, trừ khi `strict` (khi đó ném EOFError).
+    """
+    if not path.exists():
+        return
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                # Mỗi khối nằm giữa hai dấu xuống dòng (file cũ một khối không có)
+                if line.strip():
+                    yield list(_decode(json.loads(line)))
+    except EOFError:
+        if strict:
+            raise
+
+
+def read_month_chunks(year, month):
+    """Các vé đã lưu trữ của một tháng, theo từng khối (danh sách BetRecord)."""
+    return _read_chunks(month_path(year, month))
+
+
+def read_month(year, month):
+    """Các vé đã lưu trữ của một tháng, đọc lần lượt từng khối."""
+    for chunk in read_month_chunks(year, month):
+        yield from chunk
+
+
+def _append_chunks(path, records):
+    """Ghi thêm `records` vào cuối file, mỗi khối một member gzip; trả về số vé."""
+    count = 0
+    with open(path, 'ab') as f:
+        for start in range(0, len(records), ARCHIVE_CHUNK_SIZE):
+            chunk = records[start:start + ARCHIVE_CHUNK_SIZE]
+            line = json.dumps(_encode(chunk), separators=(',', ':'))
+            f.write(gzip.compress(f"\n{line}\n".encode('utf-8')))
+            count += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+    return count
+
+
+def write_month(year, month, records):
+    """Ghi thêm (fsync) các vé vào file của một tháng. Trả về số vé đã ghi."""
+    path = month_path(year, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return _append_chunks(path, list(records))
+
+
+def compact_month(year, month):
+    """
+    Bỏ khỏi file tháng các vé vẫn còn trong bảng Bet (lần lưu trữ trước dừng
+    giữa lúc ghi file và lúc xóa vé) cùng khối cuối ghi dở. File chỉ được ghi
+    lại (file tạm rồi os.replace, từng khối một) khi có gì để bỏ. Trả về số vé
+    đã bỏ.
+    """
+    path = month_path(year, month)
+    try:
+        stale = any(_live_ids(record.id for record in chunk) for chunk in _read_chunks(path, strict=True))
+    except EOFError:
+        stale = True
+    if not stale:
+        return 0
+
+    dropped = 0
+    tmp_path = path.with_suffix('.tmp')
+    tmp_path.unlink(missing_ok=True)
+    for chunk in _read_chunks(path):
+        live_ids = _live_ids(record.id for record in chunk)
+        kept = [record for record in chunk if record.id not in live_ids]
+        dropped += len(chunk) - len(kept)
+        _append_chunks(tmp_path, kept)
+    tmp_path.touch()
+    os.replace(tmp_path, path)
+    return dropped
+
+
+# --- LƯU TRỮ ---
+
+def archivable_bets(before):
+    """Vé đã tính thưởng có ngày cược trước `before`."""
+    return Bet.objects.filter(date__lt=before, status__in=SETTLED_STATUSES)
+
+
+def archive_bets(before, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """
+    Chuyển vé đã tính thưởng có ngày < `before` ra file theo tháng và xóa
+    khỏi bảng Bet, từng khối `chunk_size` vé. Trả về {'YYYY-MM': số vé đã chuyển}.
+    """
+    archived = {}
+    for first_day in archivable_bets(before).dates('date', 'month'):
+        next_month = (first_day + datetime.timedelta(days=32)).replace(day=1)
+        bets = archivable_bets(before).filter(date__gte=first_day, date__lt=next_month).order_by('pk')
+        compact_month(first_day.year, first_day.month)
+
+        count = 0
+        cursor = 0
+        while True:
+            with db_transaction.atomic():
+                # Khóa khối vé tới khi xóa xong: vé không thể bị mở lại giữa lúc ghi file và lúc xóa
+                records = [
+                    BetRecord(*row)
+                    for row in bets.filter(pk__gt=cursor).select_for_update().values_list(*COLUMNS)[:chunk_size]
+                ]
+                if not records:
+                    break
+                write_month(first_day.year, first_day.month, records)
+                Bet.objects.filter(pk__in=[record.id for record in records]).delete()
+            cursor = records[-1].id
+            count += len(records)
+        if count:
+            archived[f"{first_day:%Y-%m}"] = count
+    return archived
+
+
+# --- ĐỌC TRÊN CẢ BẢNG LẪN LƯU TRỮ ---
+
+def iter_archived_bets(date_from=None, date_to=None, user_id=None, station_id=None, user_ids=None):
+    """
+    Vé trong lưu trữ khớp bộ lọc, đọc từng khối; bỏ bản lưu trữ của vé vẫn
+    còn trong bảng (lần lưu trữ bị dừng giữa chừng), nên không nhân đôi.
+    """
+    for year, month in _months_between(date_from, date_to):
+        for chunk in read_month_chunks(year, month):
+            matched = [
+                record for record in chunk
+                if (not date_from or record.date >= date_from)
+                and (not date_to or record.date <= date_to)
+                and (user_id is None or record.user_id == user_id)
+                and (user_ids is None or record.user_id in user_ids)
+                and (station_id is None or record.station_id == station_id)
+            ]
+            live_ids = _live_ids(record.id for record in matched)
+            yield from (record for record in matched if record.id not in live_ids)
+
+
+def _live_ids(ids):
+    """Các id trong `ids` vẫn còn trong bảng Bet (lần lưu trữ bị dừng giữa chừng)."""
+    ids = list(ids)
+    live = set()
+    for start in range(0, len(ids), ARCHIVE_CHUNK_SIZE):
+        live.update(Bet.objects.filter(pk__in=ids[start:start + ARCHIVE_CHUNK_SIZE]).values_list('pk', flat=True))
+    return live
+
+
+def bet_history(user_id, date_from=None, date_to=None):
+    """Mọi vé của một user (bảng + lưu trữ), mới nhất trước, dạng BetRecord."""
+    live = Bet.objects.filter(user_id=user_id)
+    if date_from:
+        live = live.filter(date__gte=date_from)
+    if date_to:
+        live = live.filter(date__lte=date_to)
+    records = [BetRecord(*row) for row in live.values_list(*COLUMNS)]
+    records.extend(iter_archived_bets(date_from, date_to, user_id=user_id))
+    records.sort(key=lambda record: (record.date, record.id), reverse=True)
+    return records
+
+
+def bet_statistics(date_from, date_to, station_id=None):
+    """
+    Thống kê theo (ngày, đài) trên bảng + lưu trữ: số vé, số vé thắng, tổng
+    tiền cược, tổng tiền thưởng. Trả về danh sách dict, sắp theo ngày, đài.
+    """
+    stats = defaultdict(lambda: {'bet_count': 0, 'won_count': 0, 'total_amount': ZERO, 'total_winnings': ZERO})
+
+    live = Bet.objects.filter(date__gte=date_from, date__lte=date_to)
+    if station_id is not None:
+        live = live.filter(station_id=station_id)
+    for row in live.values('date', 'station_id').annotate(
+        bet_count=Count('id'),
+        won_count=Count('id', filter=Q(status='WON')),
+        staked=Sum('amount'),
+        paid=Sum('winnings'),
+    ):
+        entry = stats[(row['date'], row['station_id'])]
+        entry['bet_count'] += row['bet_count']
+        entry['won_count'] += row['won_count']
+        entry['total_amount'] += row['staked']
+        entry['total_winnings'] += row['paid']
+
+    for record in iter_archived_bets(date_from, date_to, station_id=station_id):
+        entry = stats[(record.date, record.station_id)]
+        entry['bet_count'] += 1
+        entry['won_count'] += record.status == 'WON'
+        entry['total_amount'] += record.amount
+        entry['total_winnings'] += record.winnings
+
+    return [
+        {'date': date, 'station_id': station, **entry}
+        for (date, station), entry in sorted(stats.items(), key=lambda item: (item[0][0], item[0][1] or 0))
+    ]
+
+
+def archived_bet_totals(user_ids=None):
+    """
+    {user_id: (tổng tiền cược, tổng tiền thắng)} của các vé đã lưu trữ (không
+    tính vé còn trong bảng); `user_ids` = None là mọi user. Đọc lần lượt từng
+    khối và chỉ giữ tổng theo user, nên bộ nhớ không phụ thuộc số vé.
+    Dùng khi đối soát ví (lệnh reconcile tính một lần cho cả lượt chạy).
+    """
+    user_ids = None if user_ids is None else set(user_ids)
+    totals = defaultdict(lambda: (ZERO, ZERO))
+    for record in iter_archived_bets(user_ids=user_ids):
+        staked, won = totals[record.user_id]
+        totals[record.user_id] = (staked + record.amount, won + (record.winnings if record.status == 'WON' else ZERO))
+    return dict(totals)
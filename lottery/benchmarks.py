@@ -0,0 +1,175 @@
+"""
+Bộ sinh dữ liệu giả lập và đo hiệu năng tính thưởng.
+
+Dùng bởi lệnh `bench_settlement` và lottery/tests.py. Mọi hàm ở đây GHI
+vào database hiện tại, chỉ nên chạy trên database test/tạm.
+"""
+import re
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from wallet.models import Wallet
+from .logic import settle_lottery_result
+from .models import Bet, LotteryResult, LotteryStation
+
+# Số chữ số của từng giải, theo đúng thứ tự trong prompt Gemini (GĐB trước)
+PRIZE_DIGITS = {
+    # Miền Bắc: ĐB, Nhất, Nhì x2, Ba x6 (5 số) | Tư x4, Năm x6 (4 số) | Sáu x3 | Bảy x4
+    27: [5] * 10 + [4] * 10 + [3] * 3 + [2] * 4,
+    # Miền Nam/Trung: ĐB (6 số) | Nhất, Nhì, Ba x2, Tư x7 (5 số) | Năm, Sáu x3 | Bảy | Tám
+    18: [6] + [5] * 11 + [4] * 4 + [3] + [2],
+}
+
+BET_AMOUNTS = [Decimal(value) for value in ('1000', '5000', '10000', '20000', '50000', '100000')]
+
+
+def random_prizes(prize_count, rng):
+    return [f"{rng.randrange(10 ** digits):0{digits}d}" for digits in PRIZE_DIGITS[prize_count]]
+
+
+def create_users(count, prefix='bench', balance=Decimal('1000000.00')):
+    """Tạo hàng loạt user kèm ví (bulk_create không gọi signal nên tạo ví trực tiếp)."""
+    User = get_user_model()
+    start = User.objects.count()
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}_{start + i}", password='!') for i in range(count)],
+        batch_size=1000,
+    )
+    user_ids = list(
+        User.objects.filter(username__in=[user.username for user in users]).values_list('id', flat=True)
+    )
+    Wallet.objects.bulk_create([Wallet(user_id=user_id, balance=balance) for user_id in user_ids], batch_size=1000)
+    return user_ids
+
+
+def create_stations(north=1, south=3, prefix='bench'):
+    """Một đài miền Bắc (27 giải) và vài đài miền Nam (18 giải), giống một buổi tối thật."""
+    stations = []
+    for region, prize_count, count in (('NORTH', 27, north), ('SOUTH', 18, south)):
+        for i in range(count):
+            identifier = f"{prefix}-{region.lower()}-{i}"
+            station, _ = LotteryStation.objects.get_or_create(
+                identifier=identifier,
+                defaults={'name': identifier, 'region': region, 'prize_count': prize_count},
+            )
+            stations.append(station)
+    return stations
+
+
+def create_results(stations, draw_date, rng):
+    return [
+        LotteryResult.objects.create(
+            station=station,
+            date=draw_date,
+            prizes=random_prizes(station.prize_count, rng),
+        )
+        for station in stations
+    ]
+
+
+def create_bets(user_ids, stations, draw_date, count, rng, batch_size=5000):
+    """
+    Sinh `count` vé PENDING rải đều trên user, đài, loại cược và 100 số,
+    không trùng khóa unique_together (user, bet_type, number, date, station).
+    """
+    capacity = len(user_ids) * len(stations) * 2 * 100
+    if count > capacity:
+        raise ValueError(f"Không thể tạo {count} vé khác nhau từ {len(user_ids)} user ({capacity} tối đa).")
+
+    station_ids = [station.id for station in stations]
+    seen = set()
+    batch = []
+    created = 0
+
+    while created + len(batch) < count:
+        key = (rng.choice(user_ids), rng.choice(station_ids), rng.choice(('DE', 'LO')), f"{rng.randrange(100):02d}")
+        if key in seen:
+            continue
+        seen.add(key)
+        user_id, station_id, bet_type, number = key
+        batch.append(Bet(
+            user_id=user_id, station_id=station_id, bet_type=bet_type, number=number,
+            amount=rng.choice(BET_AMOUNTS), date=draw_date, status='PENDING',
+        ))
+        if len(batch) >= batch_size:
+            Bet.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    if batch:
+        Bet.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def measure_settlement(results):
+    """
+    Tính thưởng lần lượt từng kết quả, đo thời gian, số câu SQL và bộ nhớ
+    Python cao nhất (tracemalloc). Trả về dict có thể ghi ra JSON.
+    """
+    per_station = []
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            for result in results:
+                station_started = time.perf_counter()
+                query_start = len(queries.captured_queries)
+                stats = settle_lottery_result(result)
+                per_station.append({
+                    'station': result.station.identifier,
+                    'prize_count': len(result.prizes),
+                    'bets': stats['bet_count'],
+                    'won': stats['win_count'],
+                    'total_winnings': str(stats['total_winnings']),
+                    'seconds': round(time.perf_counter() - station_started, 4),
+                    'queries': len(queries.captured_queries) - query_start,
+                })
+        wall_seconds = time.perf_counter() - started
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    bet_count = sum(row['bets'] for row in per_station)
+    return {
+        'bets': bet_count,
+        'wall_seconds': round(wall_seconds, 4),
+        'bets_per_second': round(bet_count / wall_seconds, 1) if wall_seconds else None,
+        'queries': len(queries.captured_queries),
+        'peak_memory_bytes': peak_memory,
+        'stations': per_station,
+    }
+
+
+def run_settlement_benchmark(bet_count, user_ids, stations, draw_date, rng):
+    """Sinh một buổi quay giả lập với `bet_count` vé rồi đo việc tính thưởng."""
+    results = create_results(stations, draw_date, rng)
+    create_bets(user_ids, stations, draw_date, bet_count, rng)
+    report = measure_settlement(results)
+    report.update({'scale': bet_count, 'users': len(user_ids), 'date': draw_date.isoformat()})
+    return report
+
+
+def full_table_scans(captured_queries, tables):
+    """
+    Chạy EXPLAIN QUERY PLAN (SQLite) cho các câu SELECT/UPDATE/DELETE đã bắt
+    bằng CaptureQueriesContext. Trả về [(câu SQL, dòng plan)] cho mỗi lần
+    quét toàn bộ (SCAN, kể cả quét hết một index) một bảng trong `tables`.
+    """
+    scans = []
+    with connection.cursor() as cursor:
+        for query in captured_queries:
+            sql = query['sql']
+            if not re.match(r'\s*(SELECT|UPDATE|DELETE)\b', sql, re.IGNORECASE):
+                continue
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            for *_, detail in cursor.fetchall():
+                match = re.match(r'SCAN (\w+)', detail)
+                if match and match.group(1) in tables:
+                    scans.append((sql, detail))
+    return scans
@@ -0,0 +1,91 @@
+"""
+Danh mục đài (snapshot bất biến trong bộ nhớ của mỗi tiến trình).
+
+Bảng LotteryStation gần như không đổi, nên thay vì truy vấn nó ở mọi
+request đặt cược, ta giữ một snapshot (tên, vùng, giờ chốt...) để tra theo id.
+Lịch quay từng ngày nằm ở bảng DrawCalendar (xem lottery/draw_calendar.py).
+Snapshot được dựng lại khi có signal save/delete của LotteryStation
+(xem lottery/signals.py); các tiến trình khác tự làm mới sau
+LOTTERY_STATION_CATALOG_TTL giây.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import LotteryStation
+
+StationInfo = namedtuple(
+    'StationInfo',
+    ['id', 'name', 'identifier', 'region', 'prize_count', 'cutoff_hour'],
+)
+
+
+def _station_info(station):
+    return StationInfo(
+        id=station.id,
+        name=station.name,
+        identifier=station.identifier,
+        region=station.region,
+        prize_count=station.prize_count,
+        cutoff_hour=station.cutoff_hour,
+    )
+
+
+class StationCatalog:
+    """Snapshot bất biến của bảng LotteryStation."""
+
+    def __init__(self, stations):
+        self.stations = tuple(stations)
+        self._by_id = {station.id: station for station in self.stations}
+
+    @classmethod
+    def load(cls):
+        return cls(_station_info(station) for station in LotteryStation.objects.order_by('id'))
+
+    def get(self, station_id):
+        return self._by_id.get(station_id)
+
+
+_catalog = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def get_station_catalog():
+    global _catalog, _loaded_at
+
+    ttl = getattr(settings, 'LOTTERY_STATION_CATALOG_TTL', 300)
+    catalog = _catalog
+    if catalog is not None and time.monotonic() - _loaded_at < ttl:
+        return catalog
+
+    with _lock:
+        if _catalog is None or time.monotonic() - _loaded_at >= ttl:
+            _catalog = StationCatalog.load()
+            _loaded_at = time.monotonic()
+        return _catalog
+
+
+def invalidate_station_catalog(**kwargs):
+    """Receiver cho signal: snapshot sẽ được dựng lại ở lần đọc kế tiếp."""
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+def get_station(station_id):
+    """
+    StationInfo của một đài: tra snapshot trước, không có thì đọc DB (đài vừa
+    được thêm ở tiến trình khác, snapshot chưa hết TTL) và bỏ snapshot cũ để
+    lần đọc sau dựng lại. Trả về None nếu đài không tồn tại.
+    """
+    station = get_station_catalog().get(station_id)
+    if station is not None or station_id is None:
+        return station
+    station = LotteryStation.objects.filter(pk=station_id).first()
+    if station is None:
+        return None
+    invalidate_station_catalog()
+    return _station_info(station)
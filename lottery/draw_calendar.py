@@ -0,0 +1,181 @@
+"""
+Lịch quay vật chất hóa (bảng DrawCalendar).
+
+schedule_days của LotteryStation chỉ là chuỗi cấu hình; lịch thật sự được
+sinh trước LOTTERY_DRAW_CALENDAR_DAYS ngày (mặc định 60) thành các dòng
+(đài, ngày quay, thời điểm chốt cược), bỏ qua các ngày nghỉ DrawClosure.
+
+- Lệnh `build_draw_calendar` (chạy hằng ngày) nối dài lịch.
+- Sửa đài / ngày nghỉ sẽ sinh lại phần lịch bị ảnh hưởng (lottery/signals.py).
+- Nếu lịch chưa được sinh tới ngày cần tra, nó được sinh ngay khi đọc. Ngày
+  cuối đã sinh được nhớ trong tiến trình (không chạy MAX ở mọi request) và
+  được quên mỗi khi lịch được sinh lại.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .catalog import get_station
+from .models import DrawCalendar, DrawClosure, LotteryStation
+
+ALL_DAYS = frozenset(range(7))
+
+# Ngày cuối cùng đã có trong lịch, nhớ trong tiến trình (None = chưa biết)
+_built_through = None
+
+
+def parse_schedule_days(value):
+    """'ALL' -> cả 7 ngày; '0,3, 6' -> {0, 3, 6}. Bỏ qua giá trị không hợp lệ."""
+    value = (value or '').strip()
+    if value.upper() == 'ALL':
+        return ALL_DAYS
+
+    days = set()
+    for token in value.split(','):
+        token = token.strip()
+        if token.isdigit() and int(token) in ALL_DAYS:
+            days.add(int(token))
+    return frozenset(days)
+
+
+def calendar_horizon_days():
+    return getattr(settings, 'LOTTERY_DRAW_CALENDAR_DAYS', 60)
+
+
+def cutoff_datetime(draw_date, cutoff_hour):
+    """Thời điểm chốt cược (theo múi giờ hiện tại) của một buổi quay."""
+    return timezone.make_aware(
+        # cutoff_hour=24 nghĩa là nhận cược tới hết ngày
+        datetime.datetime.combine(draw_date, datetime.time()) + datetime.timedelta(hours=cutoff_hour),
+        timezone.get_current_timezone(),
+    )
+
+
+def build_draw_calendar(start_date, end_date, station_ids=None):
+    """
+    Sinh lại lịch quay trong [start_date, end_date] cho các đài `station_ids`
+    (mặc định: tất cả). Idempotent: buổi quay thừa (ví dụ vừa thêm ngày nghỉ)
+    bị xóa, buổi quay thiếu được thêm, giờ chốt được cập nhật.
+    Trả về (số buổi quay, số dòng đã xóa).
+    """
+    stations = LotteryStation.objects.only('id', 'cutoff_hour', 'schedule_days')
+    closures = DrawClosure.objects.filter(start_date__lte=end_date, end_date__gte=start_date)
+    if station_ids is not None:
+        stations = stations.filter(id__in=station_ids)
+        closures = closures.filter(Q(station__isnull=True) | Q(station_id__in=station_ids))
+
+    closed = [(closure.station_id, closure.start_date, closure.end_date) for closure in closures]
+
+    def is_closed(station_id, day):
+        return any(
+            (closed_station is None or closed_station == station_id) and first <= day <= last
+            for closed_station, first, last in closed
+        )
+
+    days = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    draws = []
+    for station in stations:
+        weekdays = parse_schedule_days(station.schedule_days)
+        draws.extend(
+            DrawCalendar(station_id=station.id, draw_date=day, cutoff_at=cutoff_datetime(day, station.cutoff_hour))
+            for day in days
+            if day.weekday() in weekdays and not is_closed(station.id, day)
+        )
+
+    wanted = {(draw.station_id, draw.draw_date) for draw in draws}
+    with db_transaction.atomic():
+        existing = DrawCalendar.objects.filter(draw_date__gte=start_date, draw_date__lte=end_date)
+        if station_ids is not None:
+            existing = existing.filter(station_id__in=station_ids)
+        stale_ids = [
+            pk for pk, station_id, draw_date in existing.values_list('id', 'station_id', 'draw_date')
+            if (station_id, draw_date) not in wanted
+        ]
+        deleted = 0
+        for i in range(0, len(stale_ids), 500):
+            deleted += DrawCalendar.objects.filter(id__in=stale_ids[i:i + 500]).delete()[0]
+
+        DrawCalendar.objects.bulk_create(
+            draws,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['station', 'draw_date'],
+            update_fields=['cutoff_at'],
+        )
+    forget_built_through()
+    return len(draws), deleted
+
+
+def forget_built_through():
+    """Lịch vừa được sinh lại: lần tra sau đọc lại ngày cuối từ DB."""
+    global _built_through
+    _built_through = None
+
+
+def built_through():
+    """Ngày cuối cùng đã có trong lịch (MAX trên index draw_date), hoặc None."""
+    return DrawCalendar.objects.aggregate(last=Max('draw_date'))['last']
+
+
+def ensure_draw_calendar(through_date):
+    """
+    Đảm bảo lịch đã được sinh tới hết `through_date` (sinh thêm nếu thiếu).
+    Không truy vấn gì nếu ngày cuối đã nhớ trong tiến trình đã đủ xa.
+    """
+    global _built_through
+    known = _built_through
+    if known is not None and through_date <= known:
+        return
+
+    last = built_through()
+    if last is None or through_date > last:
+        today = timezone.localdate()
+        start_date = max(today, last + datetime.timedelta(days=1)) if last else today
+        end_date = max(through_date, today + datetime.timedelta(days=calendar_horizon_days()))
+        build_draw_calendar(start_date, end_date)
+        last = end_date
+    _built_through = last
+
+
+def open_stations(draw_dates, now=None):
+    """
+    Các đài còn nhận cược cho từng ngày trong `draw_dates` (chốt cược sau
+    `now`), tra bằng MỘT truy vấn trên index (draw_date, cutoff_at).
+    Đài có trong lịch nhưng chưa có trong snapshot danh mục (vừa thêm ở
+    tiến trình khác) được đọc từ DB.
+    Trả về {ngày: [StationInfo, ...]} theo thứ tự id đài.
+    """
+    now = now or timezone.now()
+    ensure_draw_calendar(max(draw_dates))
+
+    stations = {day: [] for day in draw_dates}
+    draws = DrawCalendar.objects.filter(draw_date__in=draw_dates, cutoff_at__gt=now).order_by('station_id')
+    for draw_date, station_id in draws.values_list('draw_date', 'station_id'):
+        station = get_station(station_id)
+        if station is not None:
+            stations[draw_date].append(station)
+    return stations
+
+
+def draw_cutoff(station_id, draw_date):
+    """Thời điểm chốt cược của buổi quay, hoặc None nếu đài không quay ngày đó."""
+    ensure_draw_calendar(draw_date)
+    return DrawCalendar.objects.filter(station_id=station_id, draw_date=draw_date).values_list(
+        'cutoff_at', flat=True
+    ).first()
+
+
+def rebuild_future_calendar(station_ids=None, start_date=None, end_date=None):
+    """Sinh lại phần lịch từ hôm nay (hoặc start_date) tới hết horizon đã sinh."""
+    today = timezone.localdate()
+    start_date = max(start_date or today, today)
+    horizon_end = today + datetime.timedelta(days=calendar_horizon_days())
+    last = built_through()
+    if last is not None:
+        horizon_end = max(horizon_end, last)
+    end_date = min(end_date, horizon_end) if end_date else horizon_end
+    if start_date <= end_date:
+        build_draw_calendar(start_date, end_date, station_ids)
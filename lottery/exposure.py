@@ -0,0 +1,117 @@
+"""
+Mức rủi ro (tổng tiền cược) theo từng số, bảng BetExposure.
+
+Bảng được cập nhật dần bằng UPDATE với biểu thức F() trong cùng transaction
+với thao tác trên vé:
+- đặt cược:   amount và pending_amount tăng   (record_exposure)
+- hủy cược:   amount và pending_amount giảm   (release_exposure)
+- tính thưởng: pending_amount giảm theo lô vé (settle_exposure)
+
+Nếu vé bị sửa ngoài các đường này (ví dụ qua trang admin), dựng lại bằng
+lệnh `rebuild_exposure`.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+
+from .models import Bet, BetExposure
+from .payout import CENT, DE_RATE, LO_RATE, ZERO
+
+
+def record_exposure(station_id, date, bet_type, numbers, amount):
+    """Cộng `amount` vào mỗi số trong `numbers` (một phiếu cược): 2 câu SQL."""
+    BetExposure.objects.bulk_create(
+        [
+            BetExposure(station_id=station_id, date=date, bet_type=bet_type, number=number)
+            for number in numbers
+        ],
+        ignore_conflicts=True,
+    )
+    BetExposure.objects.filter(
+        station_id=station_id, date=date, bet_type=bet_type, number__in=numbers
+    ).update(amount=F('amount') + amount, pending_amount=F('pending_amount') + amount)
+
+
+def release_exposure(station_id, date, bet_type, number, amount):
+    """Trừ tiền của một vé PENDING bị hủy."""
+    BetExposure.objects.filter(
+        station_id=station_id, date=date, bet_type=bet_type, number=number
+    ).update(amount=F('amount') - amount, pending_amount=F('pending_amount') - amount)
+
+
+def settle_exposure(station_id, date, bets):
+    """
+    Một lô vé vừa được tính thưởng: trừ tiền của chúng khỏi pending_amount.
+    MỘT câu UPDATE cho cả lô (tối đa 200 ô (loại cược, số) trong CASE).
+    """
+    amount_by_key = defaultdict(Decimal)
+    for bet in bets:
+        amount_by_key[(bet.bet_type, bet.number)] += bet.amount
+    if not amount_by_key:
+        return
+
+    settled = Case(
+        *[
+            When(bet_type=bet_type, number=number, then=Value(amount))
+            for (bet_type, number), amount in amount_by_key.items()
+        ],
+        default=Value(ZERO),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+    BetExposure.objects.filter(
+        station_id=station_id, date=date,
+        bet_type__in={bet_type for bet_type, _ in amount_by_key},
+        number__in={number for _, number in amount_by_key},
+    ).update(pending_amount=F('pending_amount') - settled)
+
+
+def rebuild_exposure(station_id, date):
+    """Tính lại toàn bộ mức rủi ro của (đài, ngày) từ bảng Bet."""
+    rows = (
+        Bet.objects.filter(station_id=station_id, date=date)
+        .values('bet_type', 'number')
+        .annotate(staked=Sum('amount'), pending=Sum('amount', filter=Q(status='PENDING')))
+    )
+    with db_transaction.atomic():
+        BetExposure.objects.filter(station_id=station_id, date=date).delete()
+        BetExposure.objects.bulk_create([
+            BetExposure(
+                station_id=station_id, date=date,
+                bet_type=row['bet_type'], number=row['number'],
+                amount=row['staked'], pending_amount=row['pending'] or ZERO,
+            )
+            for row in rows
+        ])
+    return len(rows)
+
+
+def exposure_grid(station, date):
+    """
+    Bản đồ rủi ro 100 số của một (đài, ngày) từ tối đa 200 dòng BetExposure.
+
+    Trường hợp xấu nhất: GĐB rơi vào số d (trả DE[d] * DE_RATE, và cũng là
+    một giải lô của d), còn (prize_count - 1) giải còn lại đều rơi vào số có
+    tiền lô lớn nhất.
+    """
+    de = [ZERO] * 100
+    lo = [ZERO] * 100
+    rows = BetExposure.objects.filter(station=station, date=date).values_list('bet_type', 'number', 'pending_amount')
+    for bet_type, number, pending_amount in rows:
+        (de if bet_type == 'DE' else lo)[int(number)] = pending_amount
+
+    de_payout = [amount * DE_RATE for amount in de]
+    lo_payout = [amount * LO_RATE for amount in lo]
+    worst_number = max(range(100), key=lambda n: de_payout[n] + lo_payout[n])
+    worst_case = de_payout[worst_number] + lo_payout[worst_number] + (station.prize_count - 1) * max(lo_payout)
+
+    return {
+        'de': de,
+        'lo': lo,
+        'de_payout': [amount.quantize(CENT) for amount in de_payout],
+        'lo_payout': [amount.quantize(CENT) for amount in lo_payout],
+        'total_stake': sum(de, ZERO) + sum(lo, ZERO),
+        'worst_number': f"{worst_number:02d}",
+        'worst_case_payout': worst_case.quantize(CENT),
+    }
@@ -0,0 +1,164 @@
+"""
+Cache cho việc bóc tách kết quả xổ số từ ảnh bằng Gemini.
+
+Ảnh upload được lưu theo SHA-256 của nội dung (ResultImage), danh sách giải
+đã bóc tách được lưu theo (ảnh, số giải, phiên bản prompt)
+(GeminiExtraction). Upload lại cùng một ảnh (ví dụ sau khi form báo lỗi)
+hoặc thử lại sau một lỗi phía sau bước bóc tách không gọi Gemini lần nào.
+Kết quả bị Gemini trả sai (thiếu giải) không được lưu.
+
+Tổng dung lượng ảnh bị giới hạn bởi LOTTERY_EXTRACTION_CACHE_MAX_BYTES; vượt
+thì xóa ảnh (kèm các kết quả bóc tách của nó) lâu không dùng nhất trước. Ảnh
+chỉ bị xóa (cả dòng lẫn file) nếu last_used_at vẫn là giá trị lúc được chọn,
+nên ảnh vừa được upload lại trong lúc dọn không mất file.
+Số lần hit/miss/xóa được đếm trong ExtractionCacheStats (xem trong admin).
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction as db_transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import ExtractionCacheStats, GeminiExtraction, ResultImage
+
+CACHE_NAME = 'gemini'
+EVICTION_BATCH_SIZE = 100
+
+
+def image_dir():
+    return Path(getattr(settings, 'LOTTERY_RESULT_IMAGE_DIR', settings.BASE_DIR / 'archive' / 'result_images'))
+
+
+def max_cache_bytes():
+    return getattr(settings, 'LOTTERY_EXTRACTION_CACHE_MAX_BYTES', 200 * 1024 * 1024)
+
+
+def image_path(sha256):
+    return image_dir() / sha256[:2] / sha256
+
+
+def _count(field, amount=1):
+    ExtractionCacheStats.objects.get_or_create(name=CACHE_NAME)
+    ExtractionCacheStats.objects.filter(name=CACHE_NAME).update(**{field: F(field) + amount})
+
+
+def cache_stats():
+    """{'hits', 'misses', 'evictions', 'images', 'bytes'} của cache."""
+    stats = ExtractionCacheStats.objects.filter(name=CACHE_NAME).values('hits', 'misses', 'evictions').first()
+    usage = ResultImage.objects.aggregate(bytes=Sum('size'))
+    return {
+        **(stats or {'hits': 0, 'misses': 0, 'evictions': 0}),
+        'images': ResultImage.objects.count(),
+        'bytes': usage['bytes'] or 0,
+    }
+
+
+def store_image(image_file):
+    """
+    Lưu file upload theo SHA-256 (đọc từng khối, ghi file tạm rồi
+    os.replace). Trả về ResultImage; ảnh đã có thì chỉ cập nhật last_used_at
+    (trước khi dùng file: lượt dọn cache đã chọn ảnh này sẽ bỏ qua nó), ảnh
+    mới thì dọn cache về dưới giới hạn dung lượng.
+    """
+    digest = hashlib.sha256()
+    image_dir().mkdir(parents=True, exist_ok=True)
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=image_dir(), suffix='.tmp', delete=False) as f:
+        for chunk in image_file.chunks():
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    tmp_path = Path(f.name)
+    sha256 = digest.hexdigest()
+    reused = ResultImage.objects.filter(sha256=sha256).update(last_used_at=timezone.now())
+
+    path = image_path(sha256)
+    if path.exists():
+        tmp_path.unlink()
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, path)
+
+    if reused:
+        return ResultImage.objects.get(sha256=sha256)
+    image, created = ResultImage.objects.get_or_create(sha256=sha256, defaults={'size': size})
+    if created:
+        evict(keep=image.pk)
+    else:
+        ResultImage.objects.filter(pk=image.pk).update(last_used_at=timezone.now())
+    return image
+
+
+def cached_extraction(image_file, prize_count, prompt_version, extract):
+    """
+    Danh sách giải của ảnh: lấy từ cache nếu đã bóc tách với cùng số giải và
+    phiên bản prompt, nếu không thì gọi `extract(đường dẫn ảnh, prize_count)`
+    rồi lưu lại. Lỗi của `extract` được ném ra và không được cache.
+    """
+    image = store_image(image_file)
+    key = {'image': image, 'prize_count': prize_count, 'prompt_version': prompt_version}
+
+    cached = GeminiExtraction.objects.filter(**key).values_list('pk', 'prizes').first()
+    if cached is not None:
+        GeminiExtraction.objects.filter(pk=cached[0]).update(hit_count=F('hit_count') + 1)
+        _count('hits')
+        print(f"Dùng lại kết quả đã bóc tách của ảnh {image.sha256[:12]}… (không gọi Gemini).")
+        return cached[1]
+
+    _count('misses')
+    prizes = extract(image_path(image.sha256), prize_count)
+    try:
+        with db_transaction.atomic():
+            GeminiExtraction.objects.create(prizes=prizes, **key)
+    except IntegrityError:
+        # Một request khác vừa bóc tách cùng ảnh: giữ bản đã lưu
+        pass
+    return prizes
+
+
+def _eviction_candidates(keep):
+    """Tối đa EVICTION_BATCH_SIZE ảnh lâu không dùng nhất: (id, dung lượng, last_used_at)."""
+    return list(
+        ResultImage.objects.exclude(pk=keep).order_by('last_used_at', 'id')
+        .values_list('pk', 'size', 'last_used_at')[:EVICTION_BATCH_SIZE]
+    )
+
+
+def evict(max_bytes=None, keep=None):
+    """
+    Xóa ảnh lâu không dùng nhất (dòng ResultImage kèm file và các
+    GeminiExtraction của nó) cho tới khi tổng dung lượng <= max_bytes. Ảnh `keep`
+    (vừa dùng) và ảnh được dùng lại sau khi được chọn không bị xóa. Trả về số
+    ảnh đã xóa.
+    """
+    max_bytes = max_cache_bytes() if max_bytes is None else max_bytes
+    total = ResultImage.objects.aggregate(total=Sum('size'))['total'] or 0
+    evicted = 0
+    while total > max_bytes:
+        victims = _eviction_candidates(keep)
+        if not victims:
+            break
+        chosen = []
+        freed = 0
+        for pk, size, last_used_at in victims:
+            if total - freed <= max_bytes:
+                break
+            chosen.append((pk, last_used_at))
+            freed += size
+        with db_transaction.atomic():
+            # Khóa các ảnh còn last_used_at như lúc chọn; ảnh vừa được dùng lại thì giữ
+            unchanged = Q()
+            for pk, last_used_at in chosen:
+                unchanged |= Q(pk=pk, last_used_at=last_used_at)
+            idle = list(ResultImage.objects.select_for_update().filter(unchanged).values_list('pk', 'size'))
+            # File ảnh được xóa bởi signal post_delete (lottery/signals.py), chỉ cho dòng đã xóa
+            ResultImage.objects.filter(pk__in=[pk for pk, _ in idle]).delete()
+        total -= sum(size for _, size in idle)
+        evicted += len(idle)
+    if evicted:
+        _count('evictions', evicted)
+    return evicted
@@ -16,19 +16,20 @@ def get_local_now():
 class BetForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
-        # View sẽ truyền vào 2 queryset: 1 cho hôm nay, 1 cho ngày mai
-        stations_today = kwargs.pop('stations_today', LotteryStation.objects.none())
-        stations_tomorrow = kwargs.pop('stations_tomorrow', LotteryStation.objects.none())
+        # View sẽ truyền vào 2 danh sách đài (StationInfo từ danh mục đài):
+        # 1 cho hôm nay, 1 cho ngày mai
+        stations_today = kwargs.pop('stations_today', ())
+        stations_tomorrow = kwargs.pop('stations_tomorrow', ())
 
         super().__init__(*args, **kwargs)
 
         # Tạo các lựa chọn (choices) theo nhóm
         choices = []
-        if stations_today.exists():
+        if stations_today:
             choices.append(
                 ('Hôm nay', [(s.id, s.name) for s in stations_today])
             )
-        if stations_tomorrow.exists():
+        if stations_tomorrow:
             choices.append(
                 ('Ngày mai', [(s.id, s.name) for s in stations_tomorrow])
             )
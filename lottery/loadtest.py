@@ -0,0 +1,182 @@
+"""
+Tải giả lập giờ chốt cược: nhiều user đồng thời gọi các view đặt cược,
+hủy cược và rút tiền qua Django test client (mỗi luồng một kết nối DB).
+
+Dùng bởi lệnh `loadtest_betting` và lottery/tests.py. Mọi hàm ở đây GHI
+vào database hiện tại, chỉ nên chạy trên database test/tạm.
+"""
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.messages import constants as message_levels
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Bet
+
+# Tỷ lệ mặc định các thao tác (gần với giờ cao điểm: phần lớn là đặt cược)
+DEFAULT_MIX = {'bet': 80, 'delete': 10, 'withdraw': 10}
+DEFAULT_SLIP_SIZES = [1, 2, 5, 10, 20]
+BET_AMOUNTS = ['1000', '5000', '10000', '20000']
+
+
+def classify_error(text):
+    """Xếp loại thông báo lỗi của view thành nhóm lỗi để thống kê."""
+    lowered = text.lower()
+    if 'locked' in lowered:
+        return 'lock_timeout'
+    if 'unique' in lowered or 'đã được xử lý' in lowered or 'integrity' in lowered:
+        return 'integrity_error'
+    if 'số dư không đủ' in lowered:
+        return 'insufficient_balance'
+    if 'giờ chốt' in lowered:
+        return 'past_cutoff'
+    return 'other_error'
+
+
+def percentile(sorted_values, fraction):
+    """Percentile theo thứ hạng gần nhất trên danh sách đã sắp xếp."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class LoadUser:
+    """Một user giả lập: một test client đã đăng nhập, chạy trong luồng riêng."""
+
+    def __init__(self, user, station_ids, rng, mix, slip_sizes):
+        self.user = user
+        self.station_ids = station_ids
+        self.rng = rng
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.slip_sizes = slip_sizes
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(user)
+
+    def request(self):
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        if operation == 'delete':
+            bet_id = (
+                Bet.objects.filter(user=self.user, status='PENDING')
+                .values_list('id', flat=True).order_by('?').first()
+            )
+            if bet_id is None:
+                operation = 'bet'  # chưa có vé để hủy
+            else:
+                return operation, lambda: self.client.get(reverse('delete_bet', args=[bet_id]))
+
+        if operation == 'withdraw':
+            data = {
+                'amount': self.rng.choice(['50000', '100000']),
+                'full_name_cccd': 'NGUYEN VAN A', 'bank_name': 'VCB', 'account_number': '0123456789',
+            }
+            return operation, lambda: self.client.post(reverse('request_withdrawal'), data)
+
+        size = self.rng.choice(self.slip_sizes)
+        numbers = ''.join(f"{n:02d}" for n in self.rng.sample(range(100), size))
+        data = {
+            'station': self.rng.choice(self.station_ids),
+            'bet_type': self.rng.choice(['DE', 'LO']),
+            'number': numbers,
+            'amount': self.rng.choice(BET_AMOUNTS),
+        }
+        return 'bet', lambda: self.client.post(reverse('place_bet'), data)
+
+
+def run_load(users, station_ids, requests_per_user, seed=86, mix=None, slip_sizes=None):
+    """
+    Chạy `requests_per_user` request cho mỗi user, tất cả user đồng thời
+    (một luồng mỗi user). Trả về dict có thể ghi ra JSON.
+    """
+    mix = mix or DEFAULT_MIX
+    slip_sizes = slip_sizes or DEFAULT_SLIP_SIZES
+    samples = defaultdict(list)  # thao tác -> [(giây, số câu SQL, kết quả)]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(len(users))
+    crashes = []
+
+    def worker(index, user):
+        try:
+            load_user = LoadUser(user, station_ids, random.Random(seed + index), mix, slip_sizes)
+            local = []
+            start_barrier.wait()
+            for _ in range(requests_per_user):
+                operation, send = load_user.request()
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = send()
+                    elapsed = time.perf_counter() - started
+                local.append((operation, elapsed, len(queries.captured_queries), _outcome(response)))
+                # Không theo redirect nên thông báo không bao giờ được hiển thị: bỏ đi
+                load_user.client.cookies.pop('messages', None)
+            with lock:
+                for operation, *sample in local:
+                    samples[operation].append(sample)
+        except Exception as e:  # lỗi của bộ tạo tải, không phải của view
+            start_barrier.abort()
+            crashes.append(repr(e))
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i, user)) for i, user in enumerate(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+
+    endpoints = {operation: _summarize(rows, wall_seconds) for operation, rows in sorted(samples.items())}
+    all_rows = [row for rows in samples.values() for row in rows]
+    return {
+        'concurrency': len(users),
+        'requests_per_user': requests_per_user,
+        'mix': mix,
+        'slip_sizes': slip_sizes,
+        'wall_seconds': round(wall_seconds, 4),
+        'overall': _summarize(all_rows, wall_seconds),
+        'endpoints': endpoints,
+        'harness_errors': crashes,
+    }
+
+
+def _outcome(response):
+    if response.status_code >= 500:
+        return 'server_error'
+    if response.status_code >= 400:
+        return 'client_error'
+    # Chỉ xét các thông báo do chính request này tạo ra
+    storage = getattr(response.wsgi_request, '_messages', None)
+    for message in getattr(storage, '_queued_messages', []):
+        if message.level == message_levels.ERROR:
+            return classify_error(str(message))
+    return 'ok'
+
+
+def _summarize(rows, wall_seconds):
+    latencies = sorted(elapsed for elapsed, _, _ in rows)
+    outcomes = Counter(outcome for _, _, outcome in rows)
+    count = len(rows)
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'requests': count,
+        'throughput_rps': round(count / wall_seconds, 1) if wall_seconds else None,
+        'latency_ms': {
+            'p50': ms(percentile(latencies, 0.50)),
+            'p95': ms(percentile(latencies, 0.95)),
+            'p99': ms(percentile(latencies, 0.99)),
+            'max': ms(latencies[-1] if latencies else None),
+        },
+        'queries_per_request': round(sum(queries for _, queries, _ in rows) / count, 2) if count else None,
+        'outcomes': dict(outcomes),
+        'error_rate': round(1 - outcomes['ok'] / count, 4) if count else None,
+    }
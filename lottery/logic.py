@@ -1,16 +1,31 @@
-from django.db import transaction as db_transaction  # Module transaction
-from .models import LotteryResult, Bet  # Import từ app 'lottery'
-from wallet.models import Transaction  # Import 'Transaction' từ app 'wallet'
+from django.db import transaction as db_transaction, IntegrityError  # Module transaction
+from django.db.models import Case, DecimalField, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.conf import settings
+from django.utils import timezone
+from .models import LotteryResult, Bet, BetSlip, SettlementRun  # Import từ app 'lottery'
+from .catalog import get_station
+from .exposure import record_exposure, settle_exposure
+from .extraction_cache import cached_extraction
+from .payout import DE_RATE, LO_RATE, PayoutTable
+from wallet.models import Wallet  # Import từ app 'wallet'
+from wallet.logic import InsufficientBalance, credit_wallets, debit_wallet
+from collections import defaultdict
 from decimal import Decimal
 import google.generativeai as genai
+import datetime
 import os
 import json
 from PIL import Image
 
 
 # --- LOGIC GEMINI (Động) ---
-# (Toàn bộ phần 'get_dynamic_gemini_prompt' và 'get_results_from_gemini'
-#  giữ nguyên, không cần thay đổi)
+GEMINI_MODEL = 'gemini-flash-latest'
+# Tăng khi sửa prompt bên dưới: kết quả đã cache với phiên bản cũ không được dùng lại
+GEMINI_PROMPT_VERSION = 1
+GEMINI_CACHE_VERSION = f"{GEMINI_MODEL}/prompt-v{GEMINI_PROMPT_VERSION}"
+
+
 def get_dynamic_gemini_prompt(prize_count):
     if prize_count == 27:
         # Miền Bắc (27 giải)
@@ -54,17 +69,26 @@ không có bất kỳ văn bản giải thích nào khác.
 
 
 def get_results_from_gemini(image_file, prize_count):
+    """
+    Danh sách giải của ảnh kết quả. Ảnh và kết quả bóc tách được cache theo
+    SHA-256 của ảnh (xem lottery/extraction_cache.py): upload lại cùng ảnh
+    không gọi Gemini.
+    """
+    return cached_extraction(image_file, prize_count, GEMINI_CACHE_VERSION, extract_prizes_with_gemini)
+
+
+def extract_prizes_with_gemini(image_path, prize_count):
     api_key = os.environ.get('GEMINI_API_KEY')
     if not api_key:
         raise ValueError("Không tìm thấy GEMINI_API_KEY.")
 
     genai.configure(api_key=api_key)
-    img = Image.open(image_file)
+    img = Image.open(image_path)
 
     prompt = get_dynamic_gemini_prompt(prize_count)
 
     print(f"Đang gửi ảnh đến Gemini (Hỏi {prize_count} giải)...")
-    model = genai.GenerativeModel('gemini-flash-latest')
+    model = genai.GenerativeModel(GEMINI_MODEL)
     response = model.generate_content([prompt, img])
 
     raw_json = response.text.strip().replace("```json", "").replace("```", "")
@@ -72,77 +96,352 @@ def get_results_from_gemini(image_file, prize_count):
     prizes_list = data.get("prizes")
 
     if not prizes_list or len(prizes_list) != prize_count:
-        raise ValueError(f"Gemini chỉ trả về {len(prizes_list)} giải (cần {prize_count}).")
+        raise ValueError(f"Gemini chỉ trả về {len(prizes_list or [])} giải (cần {prize_count}).")
 
     print(f"Gemini trả về {len(prizes_list)} giải. GĐB: {prizes_list[0]}")
     return prizes_list
 
 
 # --- LOGIC TÍNH TOÁN (Đã nâng cấp) ---
-DE_RATE = Decimal('70.0')
-LO_RATE = Decimal('80.0') / Decimal('23.0')
+# (DE_RATE, LO_RATE và bảng trả thưởng nằm trong lottery/payout.py)
+SETTLEMENT_CHUNK_SIZE = 2000
+# Khóa RUNNING không có nhịp tim (lô mới) quá lâu được coi là tiến trình đã chết
+SETTLEMENT_LOCK_TIMEOUT = datetime.timedelta(minutes=10)
+
+
+class SettlementLocked(Exception):
+    """Đài/ngày này đang được một tiến trình khác tính thưởng."""
+
+
+def calculate_winnings(bet_type, number, amount, result):
+    """
+    Tiền thắng của một vé theo kết quả (0 nếu vé thua).
+    Cách chấm từng vé cũ, giữ lại làm chuẩn đối chiếu cho PayoutTable.
+    """
+    if bet_type == 'DE':
+        if number == result.de_number:
+            return amount * DE_RATE
+
+    elif bet_type == 'LO':
+        hits = result.lo_numbers.count(number)
+        if hits > 0:
+            return (amount * LO_RATE) * hits
+
+    return Decimal('0.00')
+
+
+def settle_bet_chunk(result, bets, payout_table=None):
+    """
+    Chấm một lô vé PENDING theo tập hợp (set-based).
+
+    Toàn bộ việc phân loại thắng/thua làm trong bộ nhớ, sau đó số câu lệnh
+    cho cả lô là cố định: một UPDATE (CASE) cho mọi vé, một UPDATE trừ
+    BetExposure, rồi wallet.logic.credit_wallets cộng tiền cho các ví (một
+    UPDATE) và bulk_create các giao dịch WIN.
+    Phải được gọi bên trong một transaction.
+    Trả về (số vé thắng, số vé thua, tổng tiền thắng).
+    """
+    if payout_table is None:
+        payout_table = PayoutTable.from_result(result)
+
+    station_name = result.station.name
+    winnings_by_user = defaultdict(Decimal)
+    won_ids_by_winnings = defaultdict(list)
+    won_bets = []
+
+    for bet, winnings in zip(bets, payout_table.score_bets(bets)):
+        if winnings > 0:
+            bet.status = 'WON'
+            bet.winnings = winnings
+            winnings_by_user[bet.user_id] += winnings
+            won_ids_by_winnings[winnings].append(bet.pk)
+            won_bets.append(bet)
+        else:
+            bet.status = 'LOST'
+
+    # MỘT UPDATE cho cả lô. CASE gom theo mức tiền thắng (vài mức, vì tiền
+    # cược và số lần trúng là rời rạc) thay vì một nhánh WHEN cho từng vé
+    # như bulk_update. Chỉ chuyển vé còn PENDING; nếu thiếu vé thì một lượt
+    # chạy khác đã chấm chúng -> hủy cả lô (không cộng tiền lần hai).
+    if won_ids_by_winnings:
+        status = Case(When(pk__in=[bet.pk for bet in won_bets], then=Value('WON')), default=Value('LOST'))
+        winnings = Case(
+            *[When(pk__in=bet_ids, then=Value(amount)) for amount, bet_ids in won_ids_by_winnings.items()],
+            default=Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    else:
+        status, winnings = Value('LOST'), Value(Decimal('0.00'))
+    updated = Bet.objects.filter(pk__in=[bet.pk for bet in bets], status='PENDING').update(
+        status=status, winnings=winnings,
+    )
+    if updated != len(bets):
+        raise SettlementLocked(f"{len(bets) - updated} vé trong lô đã được tính thưởng bởi tiến trình khác.")
+    settle_exposure(result.station_id, result.date, bets)
+
+    if winnings_by_user:
+        wallet_ids = dict(
+            Wallet.objects.filter(user_id__in=winnings_by_user).values_list('user_id', 'id')
+        )
+        missing = set(winnings_by_user) - set(wallet_ids)
+        if missing:
+            raise ValueError(f"Không tìm thấy ví của user {sorted(missing)}.")
+
+        # Mỗi ví chỉ được cộng MỘT lần với tổng tiền thắng trong lô
+        entries_by_wallet = defaultdict(list)
+        for bet in won_bets:
+            entries_by_wallet[wallet_ids[bet.user_id]].append(
+                (bet.winnings, f"Thắng cược {station_name} {bet.get_bet_type_display()} số {bet.number}")
+            )
+        credit_wallets('WIN', entries_by_wallet)
+
+    return len(won_bets), len(bets) - len(won_bets), sum(winnings_by_user.values(), Decimal('0.00'))
+
+
+def acquire_settlement_run(station_id, process_date):
+    """
+    Lấy khóa tính thưởng cho (đài, ngày) bằng một UPDATE có điều kiện.
+    Trả về SettlementRun nếu lấy được khóa, ném SettlementLocked nếu đang
+    có lượt chạy khác (còn nhịp tim).
+    """
+    run, _ = SettlementRun.objects.get_or_create(station_id=station_id, date=process_date)
+
+    now = timezone.now()
+    acquired = SettlementRun.objects.filter(pk=run.pk).filter(
+        ~Q(status='RUNNING') | Q(updated_at__lt=now - SETTLEMENT_LOCK_TIMEOUT)
+    ).update(status='RUNNING', started_at=now, finished_at=None, error='', updated_at=now)
+
+    if not acquired:
+        raise SettlementLocked(f"Đài {station_id} ngày {process_date} đang được tính thưởng bởi tiến trình khác.")
+
+    run.refresh_from_db()
+    return run
+
+
+def release_settlement_run(run, error=None):
+    SettlementRun.objects.filter(pk=run.pk).update(
+        status='FAILED' if error else 'COMPLETED',
+        error=error or '',
+        finished_at=timezone.now(),
+    )
+
+
+def settle_lottery_result(result, chunk_size=SETTLEMENT_CHUNK_SIZE):
+    """
+    Chấm toàn bộ vé PENDING của một kết quả theo kiểu streaming.
+
+    Trước tiên lấy khóa trên sổ cái SettlementRun của (đài, ngày); nếu
+    đang có lượt khác chạy thì ném SettlementLocked ngay.
+
+    Vé được duyệt theo khóa chính, mỗi lần một lô `chunk_size` vé với
+    projection gọn (.only()), và mỗi lô được commit trong transaction
+    riêng cùng với checkpoint (SettlementRun.last_bet_id). Nếu một lô
+    lỗi, các lô trước đó vẫn giữ nguyên; chạy lại sẽ tiếp tục từ
+    checkpoint. Vé đã chấm không còn PENDING nên không bao giờ được trả
+    thưởng lần hai.
+
+    Trả về dict thống kê của lần chạy này. Ngoại lệ được ném ra ngoài.
+    """
+    run = acquire_settlement_run(result.station_id, result.date)
+    try:
+        stats = _settle_pending_bets(result, run, chunk_size)
+    except Exception as e:
+        release_settlement_run(run, error=str(e))
+        raise
+
+    release_settlement_run(run)
+    return stats
+
+
+def _settle_pending_bets(result, run, chunk_size):
+    payout_table = PayoutTable.from_result(result)
+
+    pending_bets = Bet.objects.filter(
+        date=result.date,
+        station_id=result.station_id,
+        status='PENDING'
+    ).only('id', 'user_id', 'bet_type', 'number', 'amount', 'status', 'winnings').order_by('pk')
+
+    stats = {'bet_count': 0, 'win_count': 0, 'lose_count': 0, 'total_winnings': Decimal('0.00'), 'chunk_count': 0}
+    resumed_from = run.last_bet_id
+    cursor = resumed_from
+
+    while True:
+        with db_transaction.atomic():
+            # Đọc lô BÊN TRONG transaction (khóa dòng): một lượt chạy cũ bị
+            # chiếm khóa vì quá hạn nhịp tim vẫn có thể đang chấm song song
+            bets = list(pending_bets.select_for_update().filter(pk__gt=cursor)[:chunk_size])
+            if bets:
+                won, lost, total = settle_bet_chunk(result, bets, payout_table)
+                cursor = bets[-1].pk
+                SettlementRun.objects.filter(pk=run.pk).update(
+                    last_bet_id=Greatest(F('last_bet_id'), Value(cursor)),
+                    chunk_count=F('chunk_count') + 1,
+                    win_count=F('win_count') + won,
+                    lose_count=F('lose_count') + lost,
+                    total_winnings=F('total_winnings') + total,
+                    updated_at=timezone.now(),
+                )
+
+        if not bets:
+            # Vé PENDING nằm trước checkpoint (hiếm gặp) -> quét lại từ đầu một lần
+            if resumed_from and pending_bets.filter(pk__lte=resumed_from).exists():
+                cursor = resumed_from = 0
+                continue
+            break
+
+        stats['bet_count'] += len(bets)
+        stats['win_count'] += won
+        stats['lose_count'] += lost
+        stats['total_winnings'] += total
+        stats['chunk_count'] += 1
+
+    return stats
 
 
 def process_lottery_results(process_date, station_id):
     try:
-        result = LotteryResult.objects.get(date=process_date, station_id=station_id)
+        result = LotteryResult.objects.select_related('station').get(date=process_date, station_id=station_id)
     except LotteryResult.DoesNotExist:
         return None, f"Chưa nhập kết quả cho đài {station_id} ngày {process_date}."
 
-    pending_bets = Bet.objects.filter(
-        date=process_date,
-        station_id=station_id,
-        status='PENDING'
+    if not Bet.objects.filter(date=process_date, station_id=station_id, status='PENDING').exists():
+        return f"Không có vé cược PENDING nào cho đài {station_id} ngày {process_date}.", None
+
+    try:
+        stats = settle_lottery_result(result)
+    except SettlementLocked as e:
+        return None, str(e)
+    except Exception as e:
+        return None, (f"Gặp lỗi nghiêm trọng khi xử lý: {e}. "
+                      f"Các lô đã commit được giữ nguyên, chạy lại để tiếp tục từ checkpoint.")
+
+    success_msg = (f"Hoàn tất cho {result.station.name} ngày {process_date}! "
+                   f"Thắng: {stats['win_count']}, Thua: {stats['lose_count']}")
+    return success_msg, None
+
+
+# --- LOGIC ĐẶT CƯỢC ---
+def place_bet_slip(user, station, bet_type, numbers, amount_per_bet, bet_date):
+    """
+    Ghi một phiếu cược nhiều số với số câu SQL cố định, bất kể số lượng số:
+    một UPDATE trừ tiền có điều kiện kèm bulk_create giao dịch BET, một
+    SELECT lấy các vé PENDING đã có, một UPDATE cộng dồn tiền cho chúng và
+    một bulk_create vé mới. Phải được gọi bên trong một transaction.
+    Ném InsufficientBalance nếu số dư không đủ.
+
+    `station` là LotteryStation hoặc StationInfo (chỉ cần id và name).
+    Trả về (danh sách số cược mới, danh sách (số, tổng tiền sau khi ghi thêm)).
+    """
+    # Trừ tiền trước: ném InsufficientBalance nếu số dư không đủ
+    debit_wallet(user.wallet.pk, 'BET', [
+        (amount_per_bet, f"Cược {bet_type} {station.name} số {number} ngày {bet_date}")
+        for number in numbers
+    ])
+
+    existing_bets = {
+        bet.number: bet
+        for bet in Bet.objects.filter(
+            user=user, station_id=station.id,
+            bet_type=bet_type, number__in=numbers,
+            date=bet_date, status='PENDING'
+        ).only('id', 'number', 'amount')
+    }
+
+    if existing_bets:
+        Bet.objects.filter(pk__in=[bet.pk for bet in existing_bets.values()]).update(
+            amount=F('amount') + amount_per_bet
+        )
+
+    new_numbers = [number for number in numbers if number not in existing_bets]
+    Bet.objects.bulk_create([
+        Bet(
+            user=user, station_id=station.id,
+            bet_type=bet_type, number=number,
+            amount=amount_per_bet, date=bet_date,
+            status='PENDING'
+        )
+        for number in new_numbers
+    ])
+
+    record_exposure(station.id, bet_date, bet_type, numbers, amount_per_bet)
+
+    updated_bets = [(number, bet.amount + amount_per_bet) for number, bet in existing_bets.items()]
+    return new_numbers, updated_bets
+
+
+# --- HÀNG ĐỢI PHIẾU CƯỢC (group commit) ---
+# Trước giờ chốt, mỗi POST đặt cược mở một transaction ghi riêng và SQLite
+# tuần tự hóa chúng. Ở chế độ 'queue', view chỉ INSERT một BetSlip; MỘT
+# tiến trình ghi (lệnh drain_bet_slips) lấy từng lô phiếu và ghi cả lô trong
+# một transaction, mỗi phiếu trong một savepoint riêng để phiếu lỗi không
+# kéo cả lô rollback.
+BET_INTAKE_BATCH_SIZE = 200
+
+
+def bet_intake_mode():
+    return getattr(settings, 'LOTTERY_BET_INTAKE_MODE', 'direct')
+
+
+def enqueue_bet_slip(user, station, bet_type, numbers, amount_per_bet, bet_date, cutoff_at):
+    """Đưa phiếu (đã kiểm tra hợp lệ) vào hàng đợi; trả về BetSlip để client hỏi kết quả."""
+    return BetSlip.objects.create(
+        user=user, station_id=station.id, bet_type=bet_type,
+        numbers=list(numbers), amount_per_bet=amount_per_bet,
+        bet_date=bet_date, cutoff_at=cutoff_at,
     )
 
-    if not pending_bets.exists():
-        return f"Không có vé cược PENDING nào cho đài {station_id} ngày {process_date}.", None
 
-    win_count = 0
-    lose_count = 0
+def drain_bet_slips(batch_size=BET_INTAKE_BATCH_SIZE):
+    """
+    Ghi tối đa `batch_size` phiếu đang chờ trong MỘT transaction.
+    Trả về (số phiếu đã ghi, số phiếu bị từ chối).
 
-    try:
-        with db_transaction.atomic():  # Dùng module 'db_transaction'
-            for bet in pending_bets:
-                winnings = Decimal('0.00')
-
-                if bet.bet_type == 'DE':
-                    if bet.number == result.de_number:
-                        winnings = bet.amount * DE_RATE
-
-                elif bet.bet_type == 'LO':
-                    hits = result.lo_numbers.count(bet.number)
-                    if hits > 0:
-                        winnings = (bet.amount * LO_RATE) * hits
-
-                if winnings > 0:
-                    bet.status = 'WON'
-                    bet.winnings = winnings
-                    win_count += 1
-
-                    # Lỗi 'wallet' for class 'CustomUser' mà bạn thấy
-                    # là lỗi của linter, không phải lỗi code.
-                    # 'bet.user.wallet' sẽ chạy đúng.
-                    user_wallet = bet.user.wallet
-                    user_wallet.balance += winnings
-                    user_wallet.save()
-
-                    # Dòng này bây giờ đã đúng, 'Transaction'
-                    # được import từ 'wallet.models'
-                    Transaction.objects.create(
-                        wallet=user_wallet,
-                        amount=winnings,
-                        transaction_type='WIN',
-                        description=f"Thắng cược {bet.station.name} {bet.get_bet_type_display()} số {bet.number}"
+    Tiến trình ghi không nhận signal làm mới danh mục đài của các tiến trình
+    web, nên đài không có trong snapshot được tra lại trong DB (get_station).
+    """
+    accepted = rejected = 0
+
+    with db_transaction.atomic():
+        # Đọc hàng đợi bên trong transaction ghi: hai tiến trình ghi chạy
+        # nhầm cùng lúc cũng không xử lý trùng một phiếu
+        slips = list(
+            BetSlip.objects.filter(status='QUEUED')
+            .select_related('user__wallet')
+            .order_by('id')[:batch_size]
+        )
+        now = timezone.now()
+
+        for slip in slips:
+            station = get_station(slip.station_id)
+            try:
+                if station is None:
+                    raise ValueError("Đài không còn tồn tại.")
+                if slip.created_at > slip.cutoff_at:
+                    raise ValueError(f"Phiếu được nhận sau giờ chốt cược của đài {station.name}.")
+
+                with db_transaction.atomic():
+                    new_numbers, updated_bets = place_bet_slip(
+                        slip.user, station, slip.bet_type,
+                        slip.numbers, slip.amount_per_bet, slip.bet_date
                     )
-                else:
-                    bet.status = 'LOST'
-                    lose_count += 1
+            except (InsufficientBalance, ValueError) as e:
+                slip.status, slip.error = 'REJECTED', str(e)
+            except IntegrityError:
+                slip.status, slip.error = 'REJECTED', "Một trong các số cược đã được xử lý."
+            else:
+                slip.status = 'ACCEPTED'
+                slip.result = {
+                    'new_numbers': new_numbers,
+                    'updated': [[number, str(total)] for number, total in updated_bets],
+                }
+            slip.processed_at = now
 
-                bet.save()
+            if slip.status == 'ACCEPTED':
+                accepted += 1
+            else:
+                rejected += 1
 
-    except Exception as e:
-        return None, f"Gặp lỗi nghiêm trọng khi xử lý: {e}"
+        BetSlip.objects.bulk_update(slips, ['status', 'result', 'error', 'processed_at'])
 
-    success_msg = f"Hoàn tất cho {result.station.name} ngày {process_date}! Thắng: {win_count}, Thua: {lose_count}"
-    return success_msg, None
\ No newline at end of file
+    return accepted, rejected
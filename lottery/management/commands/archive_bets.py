@@ -0,0 +1,62 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from lottery.archive import archive_bets, archive_dir, archivable_bets, month_path, retention_days
+
+
+class Command(BaseCommand):
+    help = ("Chuyển vé đã tính thưởng (WON/LOST) cũ hơn thời hạn lưu giữ ra file lưu trữ theo tháng "
+            "(nén, theo cột) và xóa khỏi bảng Bet.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            help="Giữ lại vé của N ngày gần nhất. Mặc định: LOTTERY_ARCHIVE_RETENTION_DAYS (90).",
+        )
+        parser.add_argument(
+            '--before',
+            type=str,
+            help="Lưu trữ vé có ngày cược trước ngày này (YYYY-MM-DD). Ghi đè --retention-days.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ in số vé sẽ được lưu trữ theo tháng.")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                before = datetime.datetime.strptime(options['before'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        else:
+            days = options['retention_days'] if options['retention_days'] is not None else retention_days()
+            if days < 1:
+                raise CommandError("--retention-days phải >= 1.")
+            before = timezone.localdate() - datetime.timedelta(days=days)
+
+        self.stdout.write(f"Lưu trữ vé đã tính thưởng trước {before} vào {archive_dir()}")
+
+        if options['dry_run']:
+            rows = (
+                archivable_bets(before).annotate(month=TruncMonth('date'))
+                .values('month').annotate(bet_count=Count('id')).order_by('month')
+            )
+            for row in rows:
+                self.stdout.write(f"  {row['month']:%Y-%m}: {row['bet_count']} vé")
+            return
+
+        started = time.perf_counter()
+        archived = archive_bets(before)
+        elapsed = time.perf_counter() - started
+
+        for month, count in archived.items():
+            year, month_number = (int(part) for part in month.split('-'))
+            size = month_path(year, month_number).stat().st_size
+            self.stdout.write(f"  {month}: {count} vé -> {size / 1024:,.1f} KB")
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã lưu trữ {sum(archived.values())} vé ({len(archived)} tháng, {elapsed:.2f}s)."
+        ))
@@ -0,0 +1,55 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from lottery.logic import calculate_winnings
+from lottery.models import LotteryResult
+from lottery.payout import CENT, PayoutTable
+
+
+class Command(BaseCommand):
+    help = 'Microbenchmark: chấm vé từng vé (cách cũ) so với PayoutTable (chấm theo lô).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=str, default='10000,100000,1000000',
+                            help='Các cỡ lô vé cần đo, cách nhau bằng dấu phẩy')
+        parser.add_argument('--prize-count', type=int, default=27, help='Số giải của kết quả giả lập (27 hoặc 18)')
+        parser.add_argument('--seed', type=int, default=86)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(size) for size in options['sizes'].split(',') if size]
+
+        # Kết quả giả lập (không lưu DB, chỉ cần de_number/lo_numbers)
+        prizes = [f"{rng.randrange(100000):05d}" for _ in range(options['prize_count'])]
+        result = LotteryResult(prizes=prizes)
+        result.de_number = prizes[0][-2:]
+        result.lo_numbers = [prize[-2:] for prize in prizes]
+
+        amounts_pool = [Decimal(value) for value in ('1000', '5000', '10000', '50000', '100000')]
+
+        self.stdout.write(f"{'Số vé':>10} | {'Từng vé (s)':>12} | {'PayoutTable (s)':>15} | {'Tăng tốc':>8}")
+        for size in sizes:
+            bet_types = [rng.choice(('DE', 'LO')) for _ in range(size)]
+            numbers = [f"{rng.randrange(100):02d}" for _ in range(size)]
+            amounts = [rng.choice(amounts_pool) for _ in range(size)]
+
+            started = time.perf_counter()
+            legacy = [
+                calculate_winnings(bet_type, number, amount, result).quantize(CENT)
+                for bet_type, number, amount in zip(bet_types, numbers, amounts)
+            ]
+            legacy_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            table = PayoutTable.from_result(result)
+            kernel = table.score(bet_types, numbers, amounts)
+            kernel_seconds = time.perf_counter() - started
+
+            if legacy != kernel:
+                self.stderr.write(f"LỖI: Kết quả hai cách chấm khác nhau ở cỡ {size}!")
+
+            speedup = legacy_seconds / kernel_seconds if kernel_seconds else float('inf')
+            self.stdout.write(f"{size:>10} | {legacy_seconds:>12.4f} | {kernel_seconds:>15.4f} | {speedup:>7.2f}x")
@@ -0,0 +1,71 @@
+import datetime
+import json
+import platform
+import random
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from lottery.benchmarks import create_stations, create_users, run_settlement_benchmark
+
+
+class Command(BaseCommand):
+    help = ('Đo hiệu năng tính thưởng trên dữ liệu giả lập (thời gian, số câu SQL, bộ nhớ đỉnh). '
+            'Chạy trên một database test tạm, không đụng tới dữ liệu thật.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=str, default='1000,10000,100000',
+                            help='Số vé của mỗi lần đo, cách nhau bằng dấu phẩy')
+        parser.add_argument('--users', type=int, default=1000, help='Số user giả lập')
+        parser.add_argument('--north', type=int, default=1, help='Số đài miền Bắc (27 giải)')
+        parser.add_argument('--south', type=int, default=3, help='Số đài miền Nam (18 giải)')
+        parser.add_argument('--seed', type=int, default=86)
+        parser.add_argument('--output', type=str, default=None, help='Ghi kết quả JSON ra file này')
+
+    def handle(self, *args, **options):
+        scales = [int(scale) for scale in options['scales'].split(',') if scale]
+        if not scales:
+            raise CommandError("Cần ít nhất một giá trị --scales.")
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = self._run(scales, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Đã ghi kết quả vào {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, scales, options):
+        rng = random.Random(options['seed'])
+        user_ids = create_users(options['users'])
+        stations = create_stations(north=options['north'], south=options['south'])
+
+        runs = []
+        draw_date = datetime.date(2000, 1, 1)
+        for scale in scales:
+            self.stderr.write(f"Đang đo {scale} vé...")
+            run = run_settlement_benchmark(scale, user_ids, stations, draw_date, rng)
+            self.stderr.write(f"  {run['wall_seconds']}s, {run['queries']} câu SQL, "
+                              f"bộ nhớ đỉnh {run['peak_memory_bytes'] / 1024 / 1024:.1f} MB")
+            runs.append(run)
+            draw_date += datetime.timedelta(days=1)
+
+        return {
+            'benchmark': 'settlement',
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'seed': options['seed'],
+            'users': len(user_ids),
+            'runs': runs,
+        }
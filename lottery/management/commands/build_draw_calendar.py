@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from lottery.draw_calendar import build_draw_calendar, calendar_horizon_days
+
+
+class Command(BaseCommand):
+    help = ("Sinh lịch quay (DrawCalendar) cho N ngày tới từ lịch quay của các đài, "
+            "bỏ qua các ngày nghỉ. Nên chạy hằng ngày (cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--from-date',
+            type=str,
+            help="Ngày bắt đầu (YYYY-MM-DD). Mặc định: hôm nay.",
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help="Số ngày sinh trước. Mặc định: settings.LOTTERY_DRAW_CALENDAR_DAYS (60).",
+        )
+
+    def handle(self, *args, **options):
+        if options['from_date']:
+            try:
+                start_date = datetime.datetime.strptime(options['from_date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        else:
+            start_date = timezone.localdate()
+
+        days = options['days'] if options['days'] is not None else calendar_horizon_days()
+        if days < 0:
+            raise CommandError("--days phải >= 0.")
+        end_date = start_date + datetime.timedelta(days=days)
+
+        draw_count, deleted = build_draw_calendar(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã sinh lịch quay {start_date} -> {end_date}: {draw_count} buổi quay, xóa {deleted} buổi không còn hợp lệ."
+        ))
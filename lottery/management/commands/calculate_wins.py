@@ -1,34 +1,137 @@
-from django.core.management.base import BaseCommand
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
 from django.utils import timezone
 # Import hàm logic mới
-from lottery.logic import process_lottery_results
+from lottery.logic import SettlementLocked, settle_lottery_result
+from lottery.models import LotteryResult
+
+
+def _init_worker():
+    # Tiến trình con (fork) không được dùng lại kết nối DB của tiến trình cha;
+    # với 'spawn' thì cần setup Django trước.
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
 
+def _settle_station(result_id):
+    """Tính thưởng cho một đài (chạy trong tiến trình worker)."""
+    outcome = {
+        'station': f"Kết quả #{result_id}",
+        'date': None,
+        'stats': None,
+        'error': None,
+        'locked': False,
+    }
+    started = time.perf_counter()
+    try:
+        # Kết quả có thể vừa bị xóa sau khi lệnh lấy danh sách: báo lỗi cho
+        # riêng đài này thay vì làm hỏng cả lượt chạy của pool
+        result = LotteryResult.objects.select_related('station').get(pk=result_id)
+        outcome['station'], outcome['date'] = result.station.name, result.date
+        outcome['stats'] = settle_lottery_result(result)
+    except LotteryResult.DoesNotExist:
+        outcome['error'] = "Không tìm thấy kết quả xổ số (đã bị xóa?)."
+    except SettlementLocked as e:
+        # Đã có tiến trình khác đang tính đài này -> bỏ qua, không phải lỗi
+        outcome['locked'] = str(e)
+    except Exception as e:
+        outcome['error'] = str(e)
+    outcome['seconds'] = time.perf_counter() - started
+    return outcome
 
-# Xóa các import không cần thiết khác (models, Decimal, v.v.)
 
 class Command(BaseCommand):
-    help = 'Tính toán thắng/thua cho các vé cược của một ngày cụ thể.'
+    help = 'Tính toán thắng/thua cho các vé cược của tất cả các đài trong một ngày hoặc khoảng ngày.'
 
     def add_arguments(self, parser):
-        # (Giữ nguyên hàm add_arguments)
         parser.add_argument('--date', type=str, help='Ngày để tính (YYYY-MM-DD)', default=None)
+        parser.add_argument('--from-date', type=str, help='Ngày bắt đầu của khoảng ngày (YYYY-MM-DD)', default=None)
+        parser.add_argument('--to-date', type=str, help='Ngày kết thúc của khoảng ngày (YYYY-MM-DD)', default=None)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Số tiến trình tính song song (mỗi đài một tác vụ)')
+
+    def _parse_date(self, value):
+        try:
+            return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Ngày không hợp lệ: {value} (cần YYYY-MM-DD)")
 
     def handle(self, *args, **options):
-        date_str = options['date']
-        if date_str:
-            process_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
+        if options['from_date'] or options['to_date']:
+            if options['date']:
+                raise CommandError("Chỉ dùng --date HOẶC --from-date/--to-date.")
+            start_date = self._parse_date(options['from_date'] or options['to_date'])
+            end_date = self._parse_date(options['to_date'] or options['from_date'])
+        elif options['date']:
+            start_date = end_date = self._parse_date(options['date'])
         else:
-            process_date = timezone.now().date()
+            start_date = end_date = timezone.localdate()
+
+        if start_date > end_date:
+            raise CommandError("--from-date phải trước hoặc bằng --to-date.")
+
+        workers = max(1, options['workers'])
+        result_ids = list(
+            LotteryResult.objects.filter(date__range=(start_date, end_date))
+            .order_by('date', 'station_id')
+            .values_list('id', flat=True)
+        )
+
+        self.stdout.write(f"Bắt đầu tính toán kết quả từ {start_date} đến {end_date}: "
+                          f"{len(result_ids)} đài, {workers} worker")
+        if not result_ids:
+            self.stdout.write(self.style.WARNING("Không có kết quả xổ số nào trong khoảng ngày này."))
+            return
+
+        started = time.perf_counter()
+        outcomes = []
+
+        if workers == 1:
+            for result_id in result_ids:
+                outcomes.append(self._report(_settle_station(result_id)))
+        else:
+            # Đóng kết nối trước khi fork để tiến trình con tự mở kết nối riêng
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                futures = [pool.submit(_settle_station, result_id) for result_id in result_ids]
+                for future in as_completed(futures):
+                    outcomes.append(self._report(future.result()))
+
+        elapsed = time.perf_counter() - started
+        total_bets = sum(o['stats']['bet_count'] for o in outcomes if o['stats'])
+        failures = [o for o in outcomes if o['error']]
+        skipped = [o for o in outcomes if o['locked']]
+        throughput = total_bets / elapsed if elapsed else 0
+
+        self.stdout.write(f"Tổng: {total_bets} vé / {elapsed:.2f}s = {throughput:,.0f} vé/giây "
+                          f"({len(outcomes) - len(failures) - len(skipped)} đài thành công, "
+                          f"{len(skipped)} đài bỏ qua, {len(failures)} đài lỗi)")
 
-        self.stdout.write(f"Bắt đầu tính toán kết quả cho ngày: {process_date}")
+        if failures:
+            raise CommandError(f"{len(failures)} đài tính thưởng thất bại, chạy lại để tiếp tục từ checkpoint.")
 
-        # === THAY ĐỔI CỐT LÕI ===
-        # Gọi hàm logic và nhận kết quả trả về
-        success_msg, error_msg = process_lottery_results(process_date)
+    def _report(self, outcome):
+        label = outcome['station']
+        if outcome['date'] is not None:
+            label += f" ngày {outcome['date']}"
+        if outcome['locked']:
+            self.stdout.write(self.style.WARNING(f"BỎ QUA {label}: {outcome['locked']}"))
+            return outcome
+        if outcome['error']:
+            self.stderr.write(f"LỖI {label}: {outcome['error']}")
+            return outcome
 
-        # In kết quả ra console
-        if error_msg:
-            self.stderr.write(f"LỖI: {error_msg}")
-        if success_msg:
-            self.stdout.write(self.style.SUCCESS(success_msg))
-        # === HẾT THAY ĐỔI ===
\ No newline at end of file
+        stats = outcome['stats']
+        seconds = outcome['seconds']
+        rate = stats['bet_count'] / seconds if seconds else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{label}: {stats['bet_count']} vé (Thắng: {stats['win_count']}, Thua: {stats['lose_count']}) "
+            f"trong {seconds:.2f}s = {rate:,.0f} vé/giây"
+        ))
+        return outcome
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from lottery.logic import BET_INTAKE_BATCH_SIZE, drain_bet_slips
+
+
+class Command(BaseCommand):
+    help = ("Tiến trình ghi DUY NHẤT của chế độ nhận cược theo lô (LOTTERY_BET_INTAKE_MODE='queue'): "
+            "lấy các phiếu đang chờ và ghi nhiều phiếu trong một transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BET_INTAKE_BATCH_SIZE,
+            help=f"Số phiếu tối đa mỗi transaction. Mặc định: {BET_INTAKE_BATCH_SIZE}.",
+        )
+        parser.add_argument(
+            '--idle-sleep',
+            type=float,
+            default=0.2,
+            help="Số giây chờ khi hàng đợi trống. Mặc định: 0.2.",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Ghi hết hàng đợi hiện có rồi thoát (thay vì chạy liên tục).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size phải >= 1.")
+
+        total_accepted = total_rejected = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                accepted, rejected = drain_bet_slips(batch_size)
+                processed = accepted + rejected
+
+                if processed:
+                    total_accepted += accepted
+                    total_rejected += rejected
+                    self.stdout.write(
+                        f"Lô {processed} phiếu: {accepted} ghi, {rejected} từ chối "
+                        f"({time.perf_counter() - started:.3f}s)"
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['idle_sleep'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xử lý {total_accepted + total_rejected} phiếu: {total_accepted} ghi, {total_rejected} từ chối."
+        ))
@@ -0,0 +1,51 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from DjangoProject.exports import BET_EXPORT_FIELDS, EXPORT_CHUNK_SIZE, EXPORT_FORMATS, write_export
+from lottery.models import Bet, LotteryStation
+
+
+class Command(BaseCommand):
+    help = ("Xuất vé cược ra CSV hoặc JSON Lines (tùy chọn nén gzip), đọc từng khối theo id nên bộ nhớ "
+            "không đổi. Bị dừng giữa chừng thì chạy lại với --after-id.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-date', type=str, help="Ngày cược đầu (YYYY-MM-DD). Mặc định: hôm nay.")
+        parser.add_argument('--to-date', type=str, help="Ngày cược cuối (YYYY-MM-DD). Mặc định: bằng --from-date.")
+        parser.add_argument('--station', type=str, help="Mã đài (identifier), ví dụ: mien-bac.")
+        parser.add_argument('--status', choices=[code for code, _ in Bet.STATUS_CHOICES])
+        parser.add_argument('--bet-type', choices=[code for code, _ in Bet.BET_TYPES])
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Nén gzip ngay khi ghi.")
+        parser.add_argument('--output', '-o', type=str, help="File đích. Mặc định: stdout.")
+        parser.add_argument('--after-id', type=int, default=0, help="Chỉ xuất vé có id lớn hơn (chạy tiếp).")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            date_from = (datetime.datetime.strptime(options['from_date'], '%Y-%m-%d').date()
+                         if options['from_date'] else timezone.localdate())
+            date_to = (datetime.datetime.strptime(options['to_date'], '%Y-%m-%d').date()
+                       if options['to_date'] else date_from)
+        except ValueError:
+            raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        if date_from > date_to:
+            raise CommandError("--from-date phải trước hoặc bằng --to-date.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size phải >= 1.")
+
+        bets = Bet.objects.filter(date__gte=date_from, date__lte=date_to)
+        if options['station']:
+            station = LotteryStation.objects.filter(identifier=options['station']).first()
+            if station is None:
+                raise CommandError(f"Không tìm thấy đài '{options['station']}'.")
+            bets = bets.filter(station=station)
+        if options['status']:
+            bets = bets.filter(status=options['status'])
+        if options['bet_type']:
+            bets = bets.filter(bet_type=options['bet_type'])
+
+        write_export(bets, BET_EXPORT_FIELDS, options, self.stderr)
+
@@ -0,0 +1,128 @@
+import json
+import platform
+import threading
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from lottery.benchmarks import create_stations, create_users
+from lottery.loadtest import DEFAULT_MIX, DEFAULT_SLIP_SIZES, run_load
+from lottery.logic import drain_bet_slips
+
+
+def parse_mix(value):
+    """'bet=80,delete=10,withdraw=10' -> {'bet': 80, 'delete': 10, 'withdraw': 10}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX or not weight.strip().isdigit():
+            raise CommandError(f"--mix không hợp lệ: {part!r} (ví dụ: bet=80,delete=10,withdraw=10)")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+class Command(BaseCommand):
+    help = ('Tải giả lập giờ chốt cược: nhiều user đồng thời đặt cược / hủy cược / rút tiền qua '
+            'Django test client. Báo cáo thông lượng, độ trễ p50/p95/p99, tỷ lệ lỗi và số câu SQL '
+            'mỗi request dưới dạng JSON. Chạy trên một database test tạm, không đụng tới dữ liệu thật.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Số user đồng thời (mỗi user một luồng)')
+        parser.add_argument('--requests', type=int, default=20, help='Số request của mỗi user')
+        parser.add_argument('--north', type=int, default=1, help='Số đài miền Bắc')
+        parser.add_argument('--south', type=int, default=3, help='Số đài miền Nam')
+        parser.add_argument('--mix', type=str, default=None,
+                            help='Tỷ lệ thao tác, ví dụ: bet=80,delete=10,withdraw=10')
+        parser.add_argument('--slip-sizes', type=str, default=None,
+                            help='Các cỡ phiếu (số lượng số mỗi phiếu), ví dụ: 1,2,5,10,20')
+        parser.add_argument('--intake-mode', choices=['direct', 'queue'], default='direct',
+                            help="LOTTERY_BET_INTAKE_MODE khi chạy; 'queue' chạy kèm một luồng drain_bet_slips")
+        parser.add_argument('--seed', type=int, default=86)
+        parser.add_argument('--output', type=str, default=None, help='Ghi kết quả JSON ra file này')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['requests'] < 1:
+            raise CommandError("--users và --requests phải >= 1.")
+
+        mix = parse_mix(options['mix']) if options['mix'] else DEFAULT_MIX
+        slip_sizes = ([int(size) for size in options['slip_sizes'].split(',') if size]
+                      if options['slip_sizes'] else DEFAULT_SLIP_SIZES)
+        if not all(1 <= size <= 100 for size in slip_sizes):
+            raise CommandError("--slip-sizes phải nằm trong khoảng 1..100.")
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+                raise CommandError("Cần DB test dạng file (DATABASES['default']['TEST']['NAME']) "
+                                   "để nhiều luồng cùng kết nối.")
+            with override_settings(LOTTERY_BET_INTAKE_MODE=options['intake_mode'], ALLOWED_HOSTS=['*']):
+                report = self._run(options, mix, slip_sizes)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+            self.stdout.write(self.style.SUCCESS(f"Đã ghi kết quả vào {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, options, mix, slip_sizes):
+        user_ids = create_users(options['users'], prefix='load')
+        users = list(get_user_model().objects.filter(id__in=user_ids))
+        stations = create_stations(north=options['north'], south=options['south'], prefix='load')
+        connection.close()  # các luồng tự mở kết nối riêng
+
+        drained = {'accepted': 0, 'rejected': 0}
+        stop = threading.Event()
+
+        def drainer():
+            try:
+                while True:
+                    accepted, rejected = drain_bet_slips()
+                    drained['accepted'] += accepted
+                    drained['rejected'] += rejected
+                    if not accepted + rejected:
+                        if stop.is_set():
+                            break
+                        stop.wait(0.05)
+            finally:
+                connection.close()
+
+        drain_thread = None
+        if options['intake_mode'] == 'queue':
+            drain_thread = threading.Thread(target=drainer)
+            drain_thread.start()
+
+        self.stderr.write(f"Đang chạy {options['users']} user x {options['requests']} request...")
+        try:
+            run = run_load(users, [station.id for station in stations], options['requests'],
+                           seed=options['seed'], mix=mix, slip_sizes=slip_sizes)
+        finally:
+            stop.set()
+            if drain_thread:
+                drain_thread.join()
+
+        overall = run['overall']
+        self.stderr.write(f"  {overall['throughput_rps']} request/giây, p95 {overall['latency_ms']['p95']} ms, "
+                          f"tỷ lệ lỗi {overall['error_rate']:.2%}")
+
+        run.update({
+            'benchmark': 'betting_load',
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'intake_mode': options['intake_mode'],
+            'seed': options['seed'],
+            'stations': len(stations),
+        })
+        if drain_thread:
+            run['drained_slips'] = drained
+        return run
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from lottery.exposure import rebuild_exposure
+from lottery.models import Bet
+
+
+class Command(BaseCommand):
+    help = ("Tính lại bảng mức rủi ro theo số (BetExposure) từ bảng Bet, "
+            "dùng khi vé bị sửa ngoài luồng đặt/hủy cược và tính thưởng.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            help="Ngày cược (YYYY-MM-DD). Mặc định: hôm nay.",
+        )
+        parser.add_argument(
+            '--station',
+            type=int,
+            help="ID đài. Mặc định: mọi đài có vé trong ngày.",
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                target_date = timezone.datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        else:
+            target_date = timezone.localdate()
+
+        if options['station']:
+            station_ids = [options['station']]
+        else:
+            # Vé cũ không gắn đài (station_id NULL) không có mức rủi ro để tính
+            station_ids = list(
+                Bet.objects.filter(date=target_date, station__isnull=False)
+                .values_list('station_id', flat=True).distinct().order_by()
+            )
+
+        for station_id in station_ids:
+            row_count = rebuild_exposure(station_id, target_date)
+            self.stdout.write(f"Đài #{station_id} ngày {target_date}: {row_count} ô (loại cược, số).")
+
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại mức rủi ro cho {len(station_ids)} đài."))
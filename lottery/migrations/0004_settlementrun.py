@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0003_lotterystation_alter_bet_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lotteryresult',
+            name='station',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='lottery.lotterystation', verbose_name='Đài'),
+        ),
+        migrations.CreateModel(
+            name='SettlementRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Ngày mở thưởng')),
+                ('last_bet_id', models.PositiveBigIntegerField(default=0, help_text='ID vé cuối cùng của lô đã commit')),
+                ('chunk_count', models.PositiveIntegerField(default=0, verbose_name='Số lô đã commit')),
+                ('win_count', models.PositiveIntegerField(default=0, verbose_name='Số vé thắng')),
+                ('lose_count', models.PositiveIntegerField(default=0, verbose_name='Số vé thua')),
+                ('total_winnings', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16, verbose_name='Tổng tiền thưởng')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='settlement_runs', to='lottery.lotterystation', verbose_name='Đài')),
+            ],
+            options={
+                'verbose_name': 'Lượt tính thưởng',
+                'verbose_name_plural': 'Các lượt tính thưởng',
+                'ordering': ['-date', 'station'],
+                'unique_together': {('station', 'date')},
+            },
+        ),
+    ]
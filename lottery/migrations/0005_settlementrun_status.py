@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0004_settlementrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='settlementrun',
+            name='error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='settlementrun',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, help_text='Lần chạy gần nhất kết thúc lúc', null=True),
+        ),
+        migrations.AddField(
+            model_name='settlementrun',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='Lần chạy gần nhất bắt đầu lúc', null=True),
+        ),
+        migrations.AddField(
+            model_name='settlementrun',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Chưa chạy'), ('RUNNING', 'Đang chạy'), ('COMPLETED', 'Hoàn tất'), ('FAILED', 'Lỗi')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0005_settlementrun_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrawClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(verbose_name='Nghỉ từ ngày')),
+                ('end_date', models.DateField(verbose_name='Đến hết ngày')),
+                ('reason', models.CharField(blank=True, max_length=200, verbose_name='Lý do')),
+                ('station', models.ForeignKey(blank=True, help_text='Để trống nếu tất cả các đài cùng nghỉ', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='closures', to='lottery.lotterystation', verbose_name='Đài')),
+            ],
+            options={
+                'verbose_name': 'Ngày nghỉ quay',
+                'verbose_name_plural': 'Các ngày nghỉ quay',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DrawCalendar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('draw_date', models.DateField(verbose_name='Ngày quay')),
+                ('cutoff_at', models.DateTimeField(verbose_name='Chốt cược lúc')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='draws', to='lottery.lotterystation', verbose_name='Đài')),
+            ],
+            options={
+                'verbose_name': 'Buổi quay',
+                'verbose_name_plural': 'Lịch quay',
+                'ordering': ['draw_date', 'station'],
+                'indexes': [models.Index(fields=['draw_date', 'cutoff_at'], name='lottery_draw_date_cutoff_idx')],
+                'unique_together': {('station', 'draw_date')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0006_drawcalendar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BetSlip',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bet_type', models.CharField(choices=[('DE', 'Đề (2 số cuối GĐB)'), ('LO', 'Lô (2 số cuối các giải)')], max_length=10, verbose_name='Loại cược')),
+                ('numbers', models.JSONField(help_text='Danh sách số cược')),
+                ('amount_per_bet', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Tiền cược mỗi số')),
+                ('bet_date', models.DateField(help_text='Cược cho ngày')),
+                ('cutoff_at', models.DateTimeField(verbose_name='Chốt cược lúc')),
+                ('status', models.CharField(choices=[('QUEUED', 'Đang chờ'), ('ACCEPTED', 'Đã ghi'), ('REJECTED', 'Bị từ chối')], default='QUEUED', max_length=10)),
+                ('result', models.JSONField(blank=True, help_text='Số cược mới / số được ghi thêm', null=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bet_slips', to='lottery.lotterystation', verbose_name='Đài')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bet_slips', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Phiếu cược',
+                'verbose_name_plural': 'Các phiếu cược',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'id'], name='lottery_betslip_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:09
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0007_betslip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BetExposure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Ngày cược')),
+                ('bet_type', models.CharField(choices=[('DE', 'Đề (2 số cuối GĐB)'), ('LO', 'Lô (2 số cuối các giải)')], max_length=10, verbose_name='Loại cược')),
+                ('number', models.CharField(max_length=2)),
+                ('amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16, verbose_name='Tổng tiền cược')),
+                ('pending_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16, verbose_name='Tiền cược chưa tính thưởng')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exposures', to='lottery.lotterystation', verbose_name='Đài')),
+            ],
+            options={
+                'verbose_name': 'Mức rủi ro theo số',
+                'verbose_name_plural': 'Mức rủi ro theo số',
+                'ordering': ['date', 'station', 'bet_type', 'number'],
+                'unique_together': {('station', 'date', 'bet_type', 'number')},
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lottery', '0009_bet_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtractionCacheStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('hits', models.PositiveBigIntegerField(default=0)),
+                ('misses', models.PositiveBigIntegerField(default=0)),
+                ('evictions', models.PositiveBigIntegerField(default=0, help_text='Số ảnh bị xóa khỏi cache do vượt dung lượng')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Thống kê cache bóc tách',
+                'verbose_name_plural': 'Thống kê cache bóc tách',
+            },
+        ),
+        migrations.CreateModel(
+            name='ResultImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField(help_text='Dung lượng file (byte)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Ảnh kết quả',
+                'verbose_name_plural': 'Các ảnh kết quả',
+                'ordering': ['-last_used_at'],
+                'indexes': [models.Index(fields=['last_used_at'], name='lottery_resultimage_lru_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GeminiExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prize_count', models.PositiveIntegerField()),
+                ('prompt_version', models.CharField(max_length=100)),
+                ('prizes', models.JSONField()),
+                ('hit_count', models.PositiveIntegerField(default=0, help_text='Số lần được dùng lại thay vì gọi Gemini')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='extractions', to='lottery.resultimage')),
+            ],
+            options={
+                'verbose_name': 'Kết quả bóc tách Gemini',
+                'verbose_name_plural': 'Các kết quả bóc tách Gemini',
+                'ordering': ['-created_at'],
+                'unique_together': {('image', 'prize_count', 'prompt_version')},
+            },
+        ),
+    ]
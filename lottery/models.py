@@ -103,9 +103,268 @@ class Bet(models.Model):
     class Meta:
         ordering = ['-created_at']
         unique_together = ['user', 'bet_type', 'number', 'date', 'station']
+        indexes = [
+            # Tính thưởng: vé PENDING của một (ngày, đài), duyệt theo id
+            models.Index(fields=['date', 'station', 'status'], name='lottery_bet_settle_idx'),
+            # Trang đặt cược: vé của user theo ngày, mới nhất trước
+            models.Index(fields=['user', 'date'], name='lottery_bet_user_date_idx'),
+        ]
         verbose_name = "Vé cược"
         verbose_name_plural = "Các vé cược"
 
     def __str__(self):
         station_name = self.station.name if self.station else 'N/A'
-        return f"[{self.user.username}] cược {station_name} {self.number} - {self.amount}đ"
\ No newline at end of file
+        return f"[{self.user.username}] cược {station_name} {self.number} - {self.amount}đ"
+
+# --- 4. MODEL SỔ CÁI TÍNH THƯỞNG ---
+class SettlementRun(models.Model):
+    """
+    Sổ cái tính thưởng: MỘT bản ghi cho mỗi (đài, ngày).
+
+    - status = RUNNING đóng vai trò khóa: lượt chạy thứ hai cùng lúc sẽ
+      trả về ngay thay vì tranh chấp cùng các vé PENDING.
+    - Mỗi lô vé được commit cùng với checkpoint của nó (last_bet_id),
+      nên khi chạy lại sau sự cố sẽ tiếp tục từ lô cuối cùng đã commit.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Chưa chạy'),
+        ('RUNNING', 'Đang chạy'),
+        ('COMPLETED', 'Hoàn tất'),
+        ('FAILED', 'Lỗi'),
+    ]
+
+    station = models.ForeignKey(
+        LotteryStation,
+        on_delete=models.CASCADE,
+        related_name="settlement_runs",
+        verbose_name="Đài"
+    )
+    date = models.DateField(help_text="Ngày mở thưởng")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    started_at = models.DateTimeField(blank=True, null=True, help_text="Lần chạy gần nhất bắt đầu lúc")
+    finished_at = models.DateTimeField(blank=True, null=True, help_text="Lần chạy gần nhất kết thúc lúc")
+    error = models.TextField(blank=True, default='')
+
+    last_bet_id = models.PositiveBigIntegerField(default=0, help_text="ID vé cuối cùng của lô đã commit")
+    chunk_count = models.PositiveIntegerField(default=0, verbose_name="Số lô đã commit")
+    win_count = models.PositiveIntegerField(default=0, verbose_name="Số vé thắng")
+    lose_count = models.PositiveIntegerField(default=0, verbose_name="Số vé thua")
+    total_winnings = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'),
+                                         verbose_name="Tổng tiền thưởng")
+    # Được cập nhật sau mỗi lô -> dùng làm "nhịp tim" của khóa
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date', 'station']
+        unique_together = ['station', 'date']
+        verbose_name = "Lượt tính thưởng"
+        verbose_name_plural = "Các lượt tính thưởng"
+
+    def __str__(self):
+        return f"Tính thưởng đài #{self.station_id} ngày {self.date} ({self.get_status_display()})"
+
+    @property
+    def bet_count(self):
+        return self.win_count + self.lose_count
+
+
+# --- 5. LỊCH QUAY (bảng vật chất hóa từ schedule_days) ---
+class DrawCalendar(models.Model):
+    """
+    Mỗi dòng là một buổi quay: (đài, ngày quay, thời điểm chốt cược).
+
+    Được sinh trước cho N ngày tới từ LotteryStation.schedule_days, trừ đi
+    các ngày nghỉ (DrawClosure) - xem lottery/draw_calendar.py. Menu đài,
+    việc xác định ngày cược và kiểm tra giờ chốt đều tra bảng này theo index
+    thay vì so khớp chuỗi schedule_days.
+    """
+    station = models.ForeignKey(
+        LotteryStation,
+        on_delete=models.CASCADE,
+        related_name="draws",
+        verbose_name="Đài"
+    )
+    draw_date = models.DateField(verbose_name="Ngày quay")
+    cutoff_at = models.DateTimeField(verbose_name="Chốt cược lúc")
+
+    class Meta:
+        ordering = ['draw_date', 'station']
+        unique_together = ['station', 'draw_date']
+        indexes = [
+            models.Index(fields=['draw_date', 'cutoff_at'], name='lottery_draw_date_cutoff_idx'),
+        ]
+        verbose_name = "Buổi quay"
+        verbose_name_plural = "Lịch quay"
+
+    def __str__(self):
+        return f"Đài #{self.station_id} quay ngày {self.draw_date}"
+
+
+class DrawClosure(models.Model):
+    """Ngày nghỉ quay (ví dụ: Tết). Để trống đài = áp dụng cho tất cả các đài."""
+    station = models.ForeignKey(
+        LotteryStation,
+        on_delete=models.CASCADE,
+        related_name="closures",
+        verbose_name="Đài",
+        null=True,
+        blank=True,
+        help_text="Để trống nếu tất cả các đài cùng nghỉ"
+    )
+    start_date = models.DateField(verbose_name="Nghỉ từ ngày")
+    end_date = models.DateField(verbose_name="Đến hết ngày")
+    reason = models.CharField(max_length=200, blank=True, verbose_name="Lý do")
+
+    class Meta:
+        ordering = ['-start_date']
+        verbose_name = "Ngày nghỉ quay"
+        verbose_name_plural = "Các ngày nghỉ quay"
+
+    def __str__(self):
+        station_name = self.station.name if self.station else 'Tất cả các đài'
+        return f"{station_name} nghỉ {self.start_date} - {self.end_date}"
+
+
+# --- 6. HÀNG ĐỢI PHIẾU CƯỢC (chế độ nhận cược theo lô) ---
+class BetSlip(models.Model):
+    """
+    Phiếu cược đã được kiểm tra hợp lệ, chờ tiến trình ghi (lệnh
+    `drain_bet_slips`) ghi thành vé theo lô. Chỉ dùng khi
+    settings.LOTTERY_BET_INTAKE_MODE = 'queue'.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Đang chờ'),
+        ('ACCEPTED', 'Đã ghi'),
+        ('REJECTED', 'Bị từ chối'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='bet_slips'
+    )
+    station = models.ForeignKey(
+        LotteryStation,
+        on_delete=models.CASCADE,
+        related_name="bet_slips",
+        verbose_name="Đài"
+    )
+    bet_type = models.CharField(max_length=10, choices=Bet.BET_TYPES, verbose_name="Loại cược")
+    numbers = models.JSONField(help_text="Danh sách số cược")
+    amount_per_bet = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Tiền cược mỗi số")
+    bet_date = models.DateField(help_text="Cược cho ngày")
+    # Giờ chốt của buổi quay tại thời điểm nhận phiếu: phiếu nhận trước giờ
+    # chốt vẫn được ghi dù tiến trình ghi xử lý nó sau giờ chốt
+    cutoff_at = models.DateTimeField(verbose_name="Chốt cược lúc")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    result = models.JSONField(blank=True, null=True, help_text="Số cược mới / số được ghi thêm")
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'id'], name='lottery_betslip_queue_idx'),
+        ]
+        verbose_name = "Phiếu cược"
+        verbose_name_plural = "Các phiếu cược"
+
+    def __str__(self):
+        return f"Phiếu #{self.pk} ({self.get_status_display()})"
+
+
+# --- 7. MỨC RỦI RO THEO SỐ (cập nhật dần, xem lottery/exposure.py) ---
+class BetExposure(models.Model):
+    """
+    Tổng tiền cược theo (đài, ngày, loại cược, số). Được cập nhật trong cùng
+    transaction với việc đặt cược, hủy cược và tính thưởng, nên bản đồ rủi ro
+    100 số chỉ cần đọc tối đa 200 dòng thay vì gom cả bảng Bet.
+    """
+    station = models.ForeignKey(
+        LotteryStation,
+        on_delete=models.CASCADE,
+        related_name="exposures",
+        verbose_name="Đài"
+    )
+    date = models.DateField(help_text="Ngày cược")
+    bet_type = models.CharField(max_length=10, choices=Bet.BET_TYPES, verbose_name="Loại cược")
+    number = models.CharField(max_length=2)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'),
+                                 verbose_name="Tổng tiền cược")
+    pending_amount = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'),
+                                         verbose_name="Tiền cược chưa tính thưởng")
+
+    class Meta:
+        ordering = ['date', 'station', 'bet_type', 'number']
+        unique_together = ['station', 'date', 'bet_type', 'number']
+        verbose_name = "Mức rủi ro theo số"
+        verbose_name_plural = "Mức rủi ro theo số"
+
+    def __str__(self):
+        return f"Đài #{self.station_id} {self.date} {self.bet_type} {self.number}: {self.pending_amount}"
+
+
+# --- 8. CACHE BÓC TÁCH KẾT QUẢ BẰNG GEMINI (xem lottery/extraction_cache.py) ---
+class ResultImage(models.Model):
+    """
+    Ảnh kết quả đã upload, lưu theo nội dung: file nằm tại
+    LOTTERY_RESULT_IMAGE_DIR/<2 ký tự đầu của hash>/<sha256>, nên upload lại
+    cùng một ảnh không tạo file mới.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveIntegerField(help_text="Dung lượng file (byte)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_used_at']
+        indexes = [
+            # Dọn cache: ảnh lâu không dùng nhất trước
+            models.Index(fields=['last_used_at'], name='lottery_resultimage_lru_idx'),
+        ]
+        verbose_name = "Ảnh kết quả"
+        verbose_name_plural = "Các ảnh kết quả"
+
+    def __str__(self):
+        return f"{self.sha256[:12]}… ({self.size} byte)"
+
+
+class GeminiExtraction(models.Model):
+    """Danh sách giải Gemini đã bóc tách từ một ảnh, theo (ảnh, số giải, phiên bản prompt)."""
+    image = models.ForeignKey(
+        ResultImage,
+        on_delete=models.CASCADE,
+        related_name='extractions'
+    )
+    prize_count = models.PositiveIntegerField()
+    prompt_version = models.CharField(max_length=100)
+    prizes = models.JSONField()
+    hit_count = models.PositiveIntegerField(default=0, help_text="Số lần được dùng lại thay vì gọi Gemini")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['image', 'prize_count', 'prompt_version']
+        verbose_name = "Kết quả bóc tách Gemini"
+        verbose_name_plural = "Các kết quả bóc tách Gemini"
+
+    def __str__(self):
+        return f"{self.image.sha256[:12]}… [{self.prize_count} giải, {self.prompt_version}]"
+
+
+class ExtractionCacheStats(models.Model):
+    """Bộ đếm của cache bóc tách (một dòng cho mỗi cache, cộng bằng F())."""
+    name = models.CharField(max_length=50, unique=True)
+    hits = models.PositiveBigIntegerField(default=0)
+    misses = models.PositiveBigIntegerField(default=0)
+    evictions = models.PositiveBigIntegerField(default=0, help_text="Số ảnh bị xóa khỏi cache do vượt dung lượng")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Thống kê cache bóc tách"
+        verbose_name_plural = "Thống kê cache bóc tách"
+
+    def __str__(self):
+        return f"{self.name}: {self.hits} hit / {self.misses} miss"
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+# --- TỶ LỆ TRẢ THƯỞNG ---
+DE_RATE = Decimal('70.0')
+LO_RATE = Decimal('80.0') / Decimal('23.0')
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+class PayoutTable:
+    """
+    Bảng trả thưởng 100 ô, dựng MỘT lần cho mỗi LotteryResult.
+
+    - de_hits: mảng one-hot, de_hits[n] = 1 nếu n là 2 số cuối GĐB.
+    - lo_hits: mảng đếm, lo_hits[n] = số giải có 2 số cuối là n.
+
+    Sau khi dựng xong, chấm một vé chỉ còn là một phép tra mảng theo chỉ
+    số (thay cho việc so chuỗi và `lo_numbers.count()` cho từng vé).
+    """
+
+    def __init__(self, de_number, lo_numbers):
+        self.de_hits = [0] * 100
+        self.lo_hits = [0] * 100
+
+        if de_number:
+            self.de_hits[int(de_number)] = 1
+        for lo_number in lo_numbers or []:
+            self.lo_hits[int(lo_number)] += 1
+
+        self._hits = {'DE': self.de_hits, 'LO': self.lo_hits}
+        self._rates = {'DE': DE_RATE, 'LO': LO_RATE}
+
+    @classmethod
+    def from_result(cls, result):
+        return cls(result.de_number, result.lo_numbers)
+
+    def hits(self, bet_type, number):
+        return self._hits[bet_type][int(number)]
+
+    def score(self, bet_types, numbers, amounts):
+        """
+        Chấm cả lô vé theo cột (kiểu NumPy): ba danh sách cùng độ dài
+        (loại cược, số cược, tiền cược) -> danh sách tiền thắng đã làm
+        tròn đến đồng xu (0.00 nếu thua).
+        """
+        hits_tables = self._hits
+        rates = self._rates
+        winnings = []
+        append = winnings.append
+
+        for bet_type, number, amount in zip(bet_types, numbers, amounts):
+            hits = hits_tables[bet_type][int(number)]
+            if hits:
+                append(((amount * rates[bet_type]) * hits).quantize(CENT))
+            else:
+                append(ZERO)
+
+        return winnings
+
+    def score_bets(self, bets):
+        """Chấm một danh sách đối tượng Bet (chỉ cần bet_type, number, amount)."""
+        return self.score(
+            [bet.bet_type for bet in bets],
+            [bet.number for bet in bets],
+            [bet.amount for bet in bets],
+        )
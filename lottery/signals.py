@@ -0,0 +1,40 @@
+from django.db import transaction as db_transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_station_catalog
+from .draw_calendar import rebuild_future_calendar
+from .extraction_cache import image_path
+from .models import DrawClosure, LotteryStation, ResultImage
+
+
+@receiver(post_save, sender=LotteryStation)
+@receiver(post_delete, sender=LotteryStation)
+def refresh_station_catalog(sender, **kwargs):
+    """Đài thay đổi -> bỏ snapshot danh mục đài của tiến trình này."""
+    invalidate_station_catalog()
+
+
+@receiver(post_save, sender=LotteryStation)
+def refresh_station_calendar(sender, instance, raw=False, **kwargs):
+    """Lịch quay / giờ chốt của đài có thể đã đổi -> sinh lại lịch tương lai của đài."""
+    if not raw:
+        rebuild_future_calendar(station_ids=[instance.id])
+
+
+@receiver(post_save, sender=DrawClosure)
+@receiver(post_delete, sender=DrawClosure)
+def refresh_closure_calendar(sender, instance, raw=False, **kwargs):
+    """
+    Thêm/sửa/xóa ngày nghỉ -> sinh lại lịch tương lai của các đài bị ảnh hưởng
+    (cả khoảng ngày cũ nếu ngày nghỉ vừa bị dời, nên sinh lại toàn bộ horizon).
+    """
+    if not raw:
+        rebuild_future_calendar(station_ids=[instance.station_id] if instance.station_id else None)
+
+
+@receiver(post_delete, sender=ResultImage)
+def remove_result_image_file(sender, instance, **kwargs):
+    """Ảnh bị xóa khỏi cache (dọn theo dung lượng hoặc xóa trong admin) -> xóa file sau khi commit."""
+    path = image_path(instance.sha256)
+    db_transaction.on_commit(lambda: path.unlink(missing_ok=True))
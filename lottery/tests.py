@@ -1,3 +1,977 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import hashlib
+import json
+import random
+import re
+import tempfile
+import zlib
+from collections import defaultdict
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from DjangoProject import exports
+from DjangoProject.admin_utils import EstimatedCountPaginator
+from users.models import CustomUser
+from wallet.models import Transaction, Wallet
+from . import extraction_cache
+from .archive import (
+    COLUMNS, BetRecord, _encode as encode_records, archive_bets, archived_bet_totals, bet_history, bet_statistics,
+    compact_month, month_path, read_month, read_month_chunks, write_month,
+)
+from .benchmarks import (
+    PRIZE_DIGITS, create_bets, create_results, create_stations, create_users, full_table_scans, random_prizes,
+    run_settlement_benchmark,
+)
+from .catalog import get_station_catalog
+from .draw_calendar import build_draw_calendar, cutoff_datetime, open_stations
+from .exposure import exposure_grid, rebuild_exposure
+from .extraction_cache import cache_stats, image_path
+from .loadtest import percentile, run_load
+from .management.commands.calculate_wins import _settle_station as settle_station
+from .logic import (
+    calculate_winnings, drain_bet_slips, enqueue_bet_slip, get_results_from_gemini, place_bet_slip, settle_bet_chunk,
+    SettlementLocked, settle_lottery_result,
+)
+from .models import (
+    Bet, BetExposure, BetSlip, DrawCalendar, DrawClosure, GeminiExtraction, LotteryResult, LotteryStation, ResultImage,
+    SettlementRun,
+)
+from .payout import CENT, DE_RATE, LO_RATE, PayoutTable
+
+DRAW_DATE = datetime.date(2025, 1, 1)
+
+
+def make_station(identifier='dai-thu', name='Đài thử', **fields):
+    """Đài thử, mặc định nhận cược tới hết ngày (cutoff_hour=24)."""
+    return LotteryStation.objects.create(name=name, identifier=identifier, **{'cutoff_hour': 24, **fields})
+
+
+def make_customer(username='khach', balance=None):
+    """User đăng nhập được (mật khẩu '!') kèm ví đã nạp sẵn; `balance` ghi đè số dư của ví."""
+    user = CustomUser.objects.create_user(username=username, password='!')
+    if balance is not None:
+        Wallet.objects.filter(user=user).update(balance=balance)
+    return CustomUser.objects.select_related('wallet').get(pk=user.pk)
+
+
+def make_admin():
+    return CustomUser.objects.create_superuser(username='quantri', password='!', email='qt@example.com')
+
+
+def make_bets(station, date, tickets):
+    """Tạo các vé PENDING từ danh sách (user_id, loại cược, số, tiền cược)."""
+    return Bet.objects.bulk_create([
+        Bet(user_id=user_id, station=station, bet_type=bet_type, number=number, amount=Decimal(amount), date=date)
+        for user_id, bet_type, number, amount in tickets
+    ])
+
+
+def query_count(call):
+    """Số câu SQL mà `call()` chạy."""
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    return len(queries.captured_queries)
+
+
+class SettleBetChunkTests(TestCase):
+    """Chấm theo tập hợp phải ra đúng tiền của cách chấm từng vé (làm tròn tới xu)."""
+
+    def test_set_based_chunk_matches_per_bet_scoring(self):
+        user_ids = create_users(3)
+        station = create_stations(north=1, south=0)[0]
+        # GĐB ...45; lô 05 về hai lần, 77 về 24 lần
+        result = LotteryResult.objects.create(
+            station=station, date=DRAW_DATE, prizes=['12345', '00005', '10005'] + ['77777'] * 24,
+        )
+        tickets = [
+            (user_ids[0], 'DE', '45', '1000'),
+            (user_ids[0], 'LO', '05', '1000'),   # 1000 * 80/23 * 2 không chia hết -> làm tròn
+            (user_ids[1], 'LO', '05', '5000'),
+            (user_ids[1], 'LO', '77', '3000'),
+            (user_ids[2], 'LO', '99', '1000'),
+            (user_ids[2], 'DE', '00', '1000'),
+        ]
+        make_bets(station, DRAW_DATE, tickets)
+        balances = dict(Wallet.objects.values_list('user_id', 'balance'))
+
+        with transaction.atomic():
+            won, lost, total = settle_bet_chunk(result, list(Bet.objects.order_by('pk')))
+
+        expected_by_user = defaultdict(Decimal)
+        for bet in Bet.objects.all():
+            expected = calculate_winnings(bet.bet_type, bet.number, bet.amount, result).quantize(CENT)
+            self.assertEqual(bet.winnings, expected)
+            self.assertEqual(bet.status, 'WON' if expected else 'LOST')
+            expected_by_user[bet.user_id] += expected
+        self.assertEqual((won, lost), (4, 2))
+        self.assertEqual(total, sum(expected_by_user.values()))
+        for user_id, balance in Wallet.objects.values_list('user_id', 'balance'):
+            self.assertEqual(balance, balances[user_id] + expected_by_user[user_id])
+        self.assertEqual(
+            sorted(Transaction.objects.filter(transaction_type='WIN').values_list('amount', flat=True)),
+            sorted(bet.winnings for bet in Bet.objects.filter(status='WON')),
+        )
+
+    def test_stale_chunk_from_a_taken_over_run_is_not_paid_twice(self):
+        user_ids = create_users(2)
+        station = create_stations(north=1, south=0)[0]
+        result = create_results([station], DRAW_DATE, random.Random(5))[0]
+        make_bets(station, DRAW_DATE, [(user_id, 'DE', result.de_number, '1000') for user_id in user_ids])
+        # Lượt chạy cũ đã đọc lô này trước khi bị chiếm khóa
+        stale_bets = list(Bet.objects.order_by('pk'))
+        settle_lottery_result(result)
+        balance = Wallet.objects.aggregate(total=Sum('balance'))['total']
+
+        with self.assertRaises(SettlementLocked):
+            with transaction.atomic():
+                settle_bet_chunk(result, stale_bets)
+
+        self.assertEqual(Wallet.objects.aggregate(total=Sum('balance'))['total'], balance)
+        self.assertEqual(Transaction.objects.filter(transaction_type='WIN').count(), 2)
+
+
+class PayoutTableTests(TestCase):
+
+    def test_kernel_matches_per_bet_scoring(self):
+        rng = random.Random(86)
+        for prize_count in (18, 27):
+            prizes = random_prizes(prize_count, rng)
+            table = PayoutTable(prizes[0][-2:], [prize[-2:] for prize in prizes])
+            result = type('Result', (), {'de_number': prizes[0][-2:], 'lo_numbers': [p[-2:] for p in prizes]})
+
+            bet_types = [bet_type for bet_type in ('DE', 'LO') for _ in range(100)]
+            numbers = [f"{n:02d}" for n in range(100)] * 2
+            amounts = [Decimal('10000')] * 200
+
+            self.assertEqual(
+                table.score(bet_types, numbers, amounts),
+                [calculate_winnings(t, n, a, result).quantize(CENT) for t, n, a in zip(bet_types, numbers, amounts)],
+            )
+
+    def test_hit_tables_count_repeated_numbers(self):
+        result = SimpleNamespace(de_number='45', lo_numbers=['45', '05', '05', '77'])
+        table = PayoutTable.from_result(result)
+
+        self.assertEqual(table.de_hits.count(1), 1)
+        self.assertEqual((table.hits('DE', '45'), table.hits('LO', '05'), table.hits('LO', '99')), (1, 2, 0))
+
+        bets = [
+            SimpleNamespace(bet_type=bet_type, number=number, amount=Decimal(amount))
+            for bet_type, number, amount in (('DE', '45', '1000'), ('LO', '05', '1000'), ('DE', '05', '1000'))
+        ]
+        self.assertEqual(
+            table.score_bets(bets),
+            [Decimal('70000.00'), (Decimal('2000') * LO_RATE).quantize(CENT), Decimal('0.00')],
+        )
+
+
+class SyntheticDrawTests(TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(86)
+        self.user_ids = create_users(20)
+        self.stations = create_stations(north=1, south=2)
+
+    def test_generator_builds_realistic_draws(self):
+        results = create_results(self.stations, DRAW_DATE, self.rng)
+        created = create_bets(self.user_ids, self.stations, DRAW_DATE, 500, self.rng, batch_size=128)
+
+        self.assertEqual(created, 500)
+        self.assertEqual(Bet.objects.filter(date=DRAW_DATE, status='PENDING').count(), 500)
+        self.assertEqual(Wallet.objects.filter(user_id__in=self.user_ids).count(), 20)
+        self.assertEqual(sorted(len(result.prizes) for result in results), [18, 18, 27])
+        for result in results:
+            self.assertEqual([len(prize) for prize in result.prizes], PRIZE_DIGITS[len(result.prizes)])
+            self.assertEqual(result.de_number, result.prizes[0][-2:])
+
+    def test_settlement_matches_per_bet_scoring(self):
+        results = create_results(self.stations, DRAW_DATE, self.rng)
+        create_bets(self.user_ids, self.stations, DRAW_DATE, 800, self.rng)
+        balance_before = Wallet.objects.aggregate(total=Sum('balance'))['total']
+
+        expected = Decimal('0.00')
+        for result in results:
+            for bet in Bet.objects.filter(station=result.station, date=DRAW_DATE):
+                expected += calculate_winnings(bet.bet_type, bet.number, bet.amount, result).quantize(CENT)
+
+        for result in results:
+            settle_lottery_result(result, chunk_size=100)
+
+        self.assertFalse(Bet.objects.filter(status='PENDING').exists())
+        self.assertEqual(Bet.objects.aggregate(total=Sum('winnings'))['total'], expected)
+        self.assertEqual(Wallet.objects.aggregate(total=Sum('balance'))['total'], balance_before + expected)
+        self.assertEqual(
+            Transaction.objects.filter(transaction_type='WIN').count(),
+            Bet.objects.filter(status='WON').count(),
+        )
+        self.assertEqual(SettlementRun.objects.filter(status='COMPLETED').count(), len(results))
+
+    def test_failed_chunk_resumes_from_checkpoint_without_paying_twice(self):
+        result = create_results(self.stations[:1], DRAW_DATE, self.rng)[0]
+        create_bets(self.user_ids, self.stations[:1], DRAW_DATE, 500, self.rng)
+        balance_before = Wallet.objects.aggregate(total=Sum('balance'))['total']
+        bets = list(Bet.objects.filter(date=DRAW_DATE).order_by('pk'))
+        expected = [calculate_winnings(bet.bet_type, bet.number, bet.amount, result).quantize(CENT) for bet in bets]
+
+        chunk_starts = []
+        crash = {'at_chunk': 3}
+
+        def settle_or_crash(result, chunk, payout_table):
+            chunk_starts.append(chunk[0].pk)
+            if len(chunk_starts) == crash['at_chunk']:
+                raise RuntimeError("mất kết nối")
+            return settle_bet_chunk(result, chunk, payout_table)
+
+        with patch('lottery.logic.settle_bet_chunk', side_effect=settle_or_crash):
+            with self.assertRaisesMessage(RuntimeError, "mất kết nối"):
+                settle_lottery_result(result, chunk_size=100)
+
+            run = SettlementRun.objects.get(station=result.station, date=DRAW_DATE)
+            self.assertEqual((run.status, run.chunk_count, run.last_bet_id), ('FAILED', 2, bets[199].pk))
+            self.assertEqual(Bet.objects.filter(status='PENDING').count(), 300)
+
+            chunk_starts.clear()
+            crash['at_chunk'] = None
+            stats = settle_lottery_result(result, chunk_size=100)
+
+        # Chạy lại bắt đầu ngay sau checkpoint và chỉ chấm phần còn lại
+        self.assertEqual(chunk_starts, [bet.pk for bet in bets[200::100]])
+        self.assertEqual(stats['bet_count'], 300)
+        run.refresh_from_db()
+        won_count = sum(1 for amount in expected if amount)
+        self.assertEqual(
+            (run.status, run.chunk_count, run.win_count, run.lose_count, run.total_winnings),
+            ('COMPLETED', 5, won_count, 500 - won_count, sum(expected)),
+        )
+        # Không vé thắng nào được cộng tiền hai lần
+        self.assertEqual(Transaction.objects.filter(transaction_type='WIN').count(), won_count)
+        self.assertEqual(Wallet.objects.aggregate(total=Sum('balance'))['total'], balance_before + sum(expected))
+
+    def test_query_count_does_not_grow_with_ticket_count(self):
+        results = create_results(self.stations[:1], DRAW_DATE, self.rng)
+        small_date = DRAW_DATE + datetime.timedelta(days=1)
+        small_results = create_results(self.stations[:1], small_date, self.rng)
+        create_bets(self.user_ids, self.stations[:1], DRAW_DATE, 240, self.rng)
+        create_bets(self.user_ids, self.stations[:1], small_date, 24, self.rng)
+        # Mỗi buổi có ít nhất một vé thắng, để cả hai đều đi qua bước cộng ví
+        winner = create_users(1, prefix='winner')[0]
+        for result in results + small_results:
+            make_bets(result.station, result.date, [(winner, 'DE', result.de_number, '1000')])
+
+        # Cả hai đều nằm gọn trong một lô -> cùng số câu SQL dù số vé (và số
+        # mức tiền thắng / số ví thắng) gấp 10
+        large = query_count(lambda: settle_lottery_result(results[0], chunk_size=250))
+        small = query_count(lambda: settle_lottery_result(small_results[0], chunk_size=250))
+
+        self.assertGreater(
+            Bet.objects.filter(date=DRAW_DATE, status='WON').values('user_id').distinct().count(),
+            Bet.objects.filter(date=small_date, status='WON').values('user_id').distinct().count(),
+        )
+        self.assertEqual(large, small)
+
+    def test_benchmark_report_is_json(self):
+        report = run_settlement_benchmark(300, self.user_ids, self.stations, DRAW_DATE, self.rng)
+
+        self.assertEqual(report['bets'], 300)
+        self.assertEqual(len(report['stations']), 3)
+        self.assertGreater(report['queries'], 0)
+        self.assertGreater(report['peak_memory_bytes'], 0)
+        json.dumps(report)
+
+
+class CalculateWinsCommandTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(86)
+        self.stations = create_stations(north=1, south=1)
+        self.results = create_results(self.stations, DRAW_DATE, rng)
+        create_bets(create_users(5), self.stations, DRAW_DATE, 100, rng)
+
+    def test_settles_every_station_of_the_date_and_reports_throughput(self):
+        stdout = StringIO()
+        call_command('calculate_wins', date=str(DRAW_DATE), stdout=stdout, stderr=StringIO())
+
+        self.assertFalse(Bet.objects.filter(status='PENDING').exists())
+        self.assertIn("2 đài thành công, 0 đài bỏ qua, 0 đài lỗi", stdout.getvalue())
+        self.assertIn("vé/giây", stdout.getvalue())
+
+    def test_result_deleted_before_dispatch_fails_only_its_station(self):
+        deleted_id = self.results[0].id
+
+        def delete_then_settle(result_id):
+            # Kết quả bị xóa sau khi lệnh đã lấy danh sách id
+            LotteryResult.objects.filter(pk=deleted_id).delete()
+            return settle_station(result_id)
+
+        stdout, stderr = StringIO(), StringIO()
+        with patch('lottery.management.commands.calculate_wins._settle_station', side_effect=delete_then_settle):
+            with self.assertRaisesMessage(CommandError, "1 đài tính thưởng thất bại"):
+                call_command('calculate_wins', date=str(DRAW_DATE), stdout=stdout, stderr=stderr)
+
+        self.assertIn(f"LỖI Kết quả #{deleted_id}: Không tìm thấy kết quả xổ số", stderr.getvalue())
+        self.assertFalse(Bet.objects.filter(station=self.stations[1], status='PENDING').exists())
+        self.assertIn("1 đài thành công, 0 đài bỏ qua, 1 đài lỗi", stdout.getvalue())
+
+
+class CalculateWinsPoolTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Cần DB test dạng file để nhiều tiến trình cùng kết nối.")
+
+    def test_process_pool_settles_each_station_once(self):
+        rng = random.Random(86)
+        stations = create_stations(north=1, south=2, prefix='pool')
+        create_results(stations, DRAW_DATE, rng)
+        create_bets(create_users(5, prefix='pool'), stations, DRAW_DATE, 150, rng)
+        stdout = StringIO()
+
+        call_command('calculate_wins', date=str(DRAW_DATE), workers=2, stdout=stdout, stderr=StringIO())
+
+        self.assertFalse(Bet.objects.filter(status='PENDING').exists())
+        self.assertEqual(SettlementRun.objects.filter(status='COMPLETED', chunk_count__gte=1).count(), 3)
+        self.assertEqual(
+            Transaction.objects.filter(transaction_type='WIN').count(), Bet.objects.filter(status='WON').count()
+        )
+        self.assertIn("3 đài thành công", stdout.getvalue())
+
+
+class DrawCalendarTests(TestCase):
+
+    def setUp(self):
+        # Quay T2 và T5 (0=T2, 6=CN)
+        self.station = make_station(region='SOUTH', prize_count=18, cutoff_hour=16, schedule_days='0,3')
+        self.today = timezone.localdate()
+
+    def draw_dates(self):
+        return set(DrawCalendar.objects.filter(station=self.station).values_list('draw_date', flat=True))
+
+    def test_calendar_follows_schedule_days(self):
+        dates = self.draw_dates()
+
+        self.assertTrue(dates)
+        self.assertEqual({day.weekday() for day in dates}, {0, 3})
+        self.assertGreaterEqual(min(dates), self.today)
+        draw = DrawCalendar.objects.filter(station=self.station).first()
+        self.assertEqual(draw.cutoff_at, cutoff_datetime(draw.draw_date, 16))
+
+    def test_closure_removes_and_restores_draws(self):
+        closed_day = min(self.draw_dates())
+        closure = DrawClosure.objects.create(start_date=closed_day, end_date=closed_day, reason='Tết')
+        self.assertNotIn(closed_day, self.draw_dates())
+
+        closure.delete()
+        self.assertIn(closed_day, self.draw_dates())
+
+    def test_rebuild_is_idempotent(self):
+        end = self.today + datetime.timedelta(days=13)
+        build_draw_calendar(self.today, end)
+        count = DrawCalendar.objects.count()
+
+        self.assertEqual(build_draw_calendar(self.today, end), (4, 0))
+        self.assertEqual(DrawCalendar.objects.count(), count)
+
+    def test_open_stations_respects_cutoff(self):
+        draw_date = min(self.draw_dates())
+        before = cutoff_datetime(draw_date, 15)
+        after = cutoff_datetime(draw_date, 16)
+
+        self.assertEqual([s.id for s in open_stations([draw_date], now=before)[draw_date]], [self.station.id])
+        self.assertEqual(open_stations([draw_date], now=after)[draw_date], [])
+
+    def test_open_stations_reads_station_missing_from_catalog(self):
+        # Snapshot danh mục có trước khi đài mới được thêm (bulk_create không bắn signal,
+        # giống đài vừa thêm ở tiến trình khác)
+        get_station_catalog()
+        new_station, = LotteryStation.objects.bulk_create([
+            LotteryStation(name='Đài mới', identifier='dai-moi', cutoff_hour=16, schedule_days='0,3'),
+        ])
+        draw_date = min(self.draw_dates())
+        build_draw_calendar(draw_date, draw_date, station_ids=[new_station.id])
+
+        opened = open_stations([draw_date], now=cutoff_datetime(draw_date, 15))[draw_date]
+        self.assertEqual([s.id for s in opened], [self.station.id, new_station.id])
+
+    def test_open_stations_remembers_calendar_horizon(self):
+        draw_date = min(self.draw_dates())
+        open_stations([draw_date])
+
+        # Lần sau chỉ còn truy vấn lịch, không chạy lại MAX(draw_date)
+        self.assertEqual(query_count(lambda: open_stations([draw_date])), 1)
+
+
+class PlaceBetPageTests(TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(86)
+        self.stations = [make_station(f"dai-{i}", f"Đài {i}") for i in range(2)]
+        self.today = timezone.localdate()
+
+    def page_queries(self, bets_per_day):
+        user = make_customer(f"khach{bets_per_day}")
+        for day in (self.today, self.today + datetime.timedelta(days=1)):
+            create_bets([user.id], self.stations, day, bets_per_day, self.rng)
+
+        client = Client()
+        client.force_login(user)
+        client.get('/dat-cuoc/')  # nạp danh mục đài
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/dat-cuoc/')
+        self.assertEqual(response.status_code, 200)
+        return client, response, len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_ticket_count(self):
+        _, _, few = self.page_queries(5)
+        _, response, many = self.page_queries(300)
+
+        self.assertEqual(few, many)
+        self.assertEqual(len(response.context['today_bets']), 50)
+        self.assertEqual(sum(row['bet_count'] for row in response.context['today_summary']), 300)
+
+    def test_cursor_pages_cover_every_bet_once(self):
+        client, response, _ = self.page_queries(120)
+        seen = [bet.id for bet in response.context['today_bets']]
+        while response.context['today_next']:
+            response = client.get('/dat-cuoc/', {'hom_nay': response.context['today_next']})
+            seen.extend(bet.id for bet in response.context['today_bets'])
+
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(set(seen), set(Bet.objects.filter(date=self.today).values_list('id', flat=True)))
+
+    def test_slip_query_count_does_not_grow_with_number_count(self):
+        user = make_customer(balance=Decimal('10000000'))
+
+        def slip_queries(station, numbers):
+            def place():
+                with transaction.atomic():
+                    place_bet_slip(user, station, 'LO', numbers, Decimal('1000'), self.today)
+            return query_count(place)
+
+        many_numbers = [f"{n:02d}" for n in range(40)]
+        # Lần đầu: tạo vé mới; lần hai: cộng dồn vào vé PENDING đã có
+        for _ in range(2):
+            self.assertEqual(slip_queries(self.stations[0], ['00']), slip_queries(self.stations[1], many_numbers))
+        self.assertEqual(
+            set(Bet.objects.filter(user=user, station=self.stations[1]).values_list('number', 'amount')),
+            {(number, Decimal('2000')) for number in many_numbers},
+        )
+
+    def test_delete_bet_of_station_missing_from_catalog_snapshot(self):
+        user = make_customer(balance=Decimal('5000'))
+        get_station_catalog()
+        # bulk_create không gửi post_save: giống đài vừa được thêm ở tiến trình khác
+        station = LotteryStation.objects.bulk_create([
+            LotteryStation(name='Đài mới', identifier='dai-moi', cutoff_hour=24),
+        ])[0]
+        self.assertIsNone(get_station_catalog().get(station.id))
+        bets = (make_bets(station, self.today, [(user.id, 'LO', '12', '1000')])
+                + make_bets(None, self.today, [(user.id, 'LO', '34', '1000')]))
+        self.client.force_login(user)
+
+        response = self.client.get(f"/xoa-cuoc/{bets[0].id}/", follow=True)
+        self.assertContains(response, "Đã xóa cược Đài mới LO 12")
+        self.assertFalse(Bet.objects.filter(pk=bets[0].id).exists())
+        self.assertEqual(Wallet.objects.get(user=user).balance, Decimal('6000.00'))
+
+        response = self.client.get(f"/xoa-cuoc/{bets[1].id}/", follow=True)
+        self.assertContains(response, "Không tìm thấy đài của vé cược này.")
+        self.assertTrue(Bet.objects.filter(pk=bets[1].id).exists())
+
+
+@override_settings(LOTTERY_BET_INTAKE_MODE='queue')
+class BetIntakeQueueTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station()
+        self.user = make_customer()
+        self.client.force_login(self.user)
+        self.today = timezone.localdate()
+
+    def test_slip_is_queued_then_written_by_the_drainer(self):
+        response = self.client.post('/dat-cuoc/', {
+            'station': self.station.id, 'bet_type': 'LO', 'number': '1234', 'amount': '1000',
+        })
+        self.assertEqual(response.status_code, 302)
+        slip = BetSlip.objects.get()
+        self.assertEqual((slip.status, sorted(slip.numbers)), ('QUEUED', ['12', '34']))
+        self.assertFalse(Bet.objects.exists())
+
+        self.assertEqual(drain_bet_slips(), (1, 0))
+
+        self.assertEqual(Bet.objects.filter(user=self.user, date=self.today).count(), 2)
+        status = self.client.get(f'/phieu-cuoc/{slip.id}/').json()
+        self.assertEqual(status['status'], 'ACCEPTED')
+        self.assertEqual(sorted(status['result']['new_numbers']), ['12', '34'])
+
+    def test_rejected_slip_does_not_roll_back_its_batch(self):
+        cutoff = timezone.now() + datetime.timedelta(hours=1)
+        ok = enqueue_bet_slip(self.user, self.station, 'DE', ['01'], Decimal('1000'), self.today, cutoff)
+        too_big = enqueue_bet_slip(self.user, self.station, 'DE', ['02'], Decimal('5000000'), self.today, cutoff)
+        late = enqueue_bet_slip(self.user, self.station, 'DE', ['03'], Decimal('1000'), self.today,
+                                timezone.now() - datetime.timedelta(minutes=1))
+
+        self.assertEqual(drain_bet_slips(), (1, 2))
+
+        statuses = dict(BetSlip.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {ok.id: 'ACCEPTED', too_big.id: 'REJECTED', late.id: 'REJECTED'})
+        self.assertEqual(list(Bet.objects.values_list('number', flat=True)), ['01'])
+        self.user.wallet.refresh_from_db()
+        self.assertEqual(self.user.wallet.balance, Decimal('999000.00'))
+        self.assertEqual(self.client.get(f'/phieu-cuoc/{too_big.id}/').json()['status'], 'REJECTED')
+
+    def test_drainer_accepts_station_added_after_its_catalog_snapshot(self):
+        get_station_catalog()
+        # bulk_create không gửi post_save: tiến trình ghi không biết có đài mới
+        station = LotteryStation.objects.bulk_create([
+            LotteryStation(name='Đài mới', identifier='dai-moi', cutoff_hour=24),
+        ])[0]
+        cutoff = timezone.now() + datetime.timedelta(hours=1)
+        slip = enqueue_bet_slip(self.user, station, 'LO', ['12'], Decimal('1000'), self.today, cutoff)
+
+        self.assertEqual(drain_bet_slips(), (1, 0))
+
+        slip.refresh_from_db()
+        self.assertEqual((slip.status, slip.error), ('ACCEPTED', ''))
+        self.assertTrue(Bet.objects.filter(station=station, number='12').exists())
+
+
+class BetExposureTests(TestCase):
+
+    def setUp(self):
+        self.station = make_station(prize_count=18)
+        self.user = make_customer()
+        self.today = timezone.localdate()
+
+    def exposures(self):
+        return {
+            (row.bet_type, row.number): (row.amount, row.pending_amount)
+            for row in BetExposure.objects.filter(station=self.station, date=self.today)
+        }
+
+    def test_placement_deletion_and_settlement_keep_table_in_sync(self):
+        place_bet_slip(self.user, self.station, 'LO', ['12', '34'], Decimal('1000'), self.today)
+        place_bet_slip(self.user, self.station, 'LO', ['12'], Decimal('2000'), self.today)
+        place_bet_slip(self.user, self.station, 'DE', ['12', '56'], Decimal('5000'), self.today)
+        self.assertEqual(self.exposures()[('LO', '12')], (Decimal('3000.00'), Decimal('3000.00')))
+
+        self.client.force_login(self.user)
+        self.client.get(f"/xoa-cuoc/{Bet.objects.get(bet_type='DE', number='56').id}/")
+        self.assertEqual(self.exposures()[('DE', '56')], (Decimal('0.00'), Decimal('0.00')))
+
+        incremental = self.exposures()
+        rebuild_exposure(self.station.id, self.today)
+        self.assertEqual(
+            {key: value for key, value in incremental.items() if value[0]},
+            self.exposures(),
+        )
+
+        result = LotteryResult.objects.create(station=self.station, date=self.today, prizes=random_prizes(18, random.Random(86)))
+        settle_lottery_result(result)
+        self.assertEqual({pending for _, pending in self.exposures().values()}, {Decimal('0.00')})
+
+    def test_grid_worst_case_payout(self):
+        place_bet_slip(self.user, self.station, 'DE', ['07'], Decimal('10000'), self.today)
+        place_bet_slip(self.user, self.station, 'LO', ['07'], Decimal('2300'), self.today)
+        place_bet_slip(self.user, self.station, 'LO', ['99'], Decimal('23000'), self.today)
+
+        with CaptureQueriesContext(connection) as queries:
+            grid = exposure_grid(self.station, self.today)
+
+        self.assertEqual(len(queries.captured_queries), 1)
+        self.assertEqual(grid['de'][7], Decimal('10000.00'))
+        self.assertEqual(grid['lo'][99], Decimal('23000.00'))
+        # GĐB số 07 (đề + 1 giải lô) và 17 giải còn lại đều là 99
+        expected = Decimal('10000') * DE_RATE + Decimal('2300') * LO_RATE + 17 * Decimal('23000') * LO_RATE
+        self.assertEqual(grid['worst_number'], '07')
+        self.assertEqual(grid['worst_case_payout'], expected.quantize(CENT))
+
+    def test_rebuild_command_skips_bets_without_station(self):
+        make_bets(self.station, self.today, [(self.user.id, 'LO', '12', '1000')])
+        # Vé cũ trước khi có cột đài
+        make_bets(None, self.today, [(self.user.id, 'LO', '34', '2000')])
+
+        out = StringIO()
+        call_command('rebuild_exposure', stdout=out)
+
+        self.assertIn("Đã tính lại mức rủi ro cho 1 đài.", out.getvalue())
+        self.assertEqual(self.exposures(), {('LO', '12'): (Decimal('1000.00'), Decimal('1000.00'))})
+        self.assertFalse(BetExposure.objects.filter(station__isnull=True).exists())
+
+
+class BetArchiveTests(TestCase):
+
+    def setUp(self):
+        self.archive_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(LOTTERY_ARCHIVE_DIR=self.archive_dir))
+        rng = random.Random(86)
+        self.user_ids = create_users(5)
+        self.stations = create_stations(north=1, south=1)
+        self.old_days = [datetime.date(2024, 1, 31), datetime.date(2024, 2, 1)]
+        self.recent_day = datetime.date(2024, 3, 1)
+        for day in self.old_days + [self.recent_day]:
+            create_bets(self.user_ids, self.stations, day, 60, rng)
+        bets = Bet.objects.order_by('id')
+        Bet.objects.filter(id__in=bets.values('id')[:100]).update(status='WON', winnings=Decimal('99000.00'))
+        Bet.objects.filter(id__in=bets.values('id')[100:110]).update(status='LOST')
+        # 10 vé cũ vẫn PENDING (chưa có kết quả): không được lưu trữ
+
+    def test_archive_moves_settled_bets_and_reads_still_see_them(self):
+        stats_before = bet_statistics(self.old_days[0], self.recent_day)
+        history_before = [bet.id for bet in Bet.objects.filter(user_id=self.user_ids[0]).order_by('-date', '-id')]
+        first = BetRecord(*Bet.objects.order_by('id').values_list(*COLUMNS).first())
+
+        archived = archive_bets(before=self.recent_day)
+
+        self.assertEqual(archived, {'2024-01': 60, '2024-02': 50})
+        self.assertEqual(
+            sorted(path.name for path in self.archive_dir.iterdir()), ['bets-2024-01.json.gz', 'bets-2024-02.json.gz']
+        )
+        self.assertFalse(Bet.objects.filter(date__lt=self.recent_day, status__in=['WON', 'LOST']).exists())
+        self.assertEqual(Bet.objects.filter(date__lt=self.recent_day).count(), 10)
+
+        self.assertEqual(bet_statistics(self.old_days[0], self.recent_day), stats_before)
+        self.assertEqual([bet.id for bet in bet_history(self.user_ids[0])], history_before)
+        self.assertEqual(next(read_month(2024, 1)), first)
+
+    def test_rerun_after_interrupted_delete_does_not_duplicate(self):
+        expected = bet_statistics(self.old_days[0], self.old_days[1])
+        records = [BetRecord(*row) for row in Bet.objects.filter(date=self.old_days[0]).values_list(*COLUMNS)]
+        write_month(2024, 1, records)  # file đã ghi nhưng vé chưa bị xóa
+
+        self.assertEqual(bet_statistics(self.old_days[0], self.old_days[1]), expected)
+        self.assertEqual(archived_bet_totals(), {})
+        archive_bets(before=self.recent_day)
+        self.assertEqual(len(list(read_month(2024, 1))), 60)
+        self.assertEqual(bet_statistics(self.old_days[0], self.old_days[1]), expected)
+
+        records = [*read_month(2024, 1), *read_month(2024, 2)]
+        totals = archived_bet_totals()
+        self.assertEqual(sum(staked for staked, _ in totals.values()), sum(record.amount for record in records))
+        self.assertEqual(sum(won for _, won in totals.values()), sum(record.winnings for record in records))
+        self.assertEqual(archived_bet_totals(self.user_ids[:1]).keys(), {self.user_ids[0]})
+
+    def test_bet_reopened_after_interrupted_run_is_counted_once(self):
+        january = Bet.objects.filter(date=self.old_days[0], status__in=['WON', 'LOST']).order_by('id')
+        write_month(2024, 1, [BetRecord(*row) for row in january.values_list(*COLUMNS)])  # dừng trước khi xóa
+        reopened = january.first()
+        Bet.objects.filter(pk=reopened.pk).update(status='PENDING', winnings=Decimal('0.00'))
+        expected = bet_statistics(self.old_days[0], self.old_days[1])
+
+        archive_bets(before=self.recent_day)
+
+        self.assertEqual(Bet.objects.get(pk=reopened.pk).status, 'PENDING')
+        archived_ids = [record.id for record in read_month(2024, 1)]
+        self.assertNotIn(reopened.pk, archived_ids)
+        self.assertEqual(len(archived_ids), len(set(archived_ids)))
+        self.assertEqual(bet_statistics(self.old_days[0], self.old_days[1]), expected)
+        self.assertEqual(
+            sum(staked for staked, _ in archived_bet_totals().values()),
+            sum(record.amount for month in ((2024, 1), (2024, 2)) for record in read_month(*month)),
+        )
+
+    def test_months_are_written_and_read_in_chunks(self):
+        # File kiểu cũ: cả tháng là một khối JSON, không có dấu xuống dòng
+        old = [BetRecord(*row) for row in Bet.objects.filter(date=self.old_days[0]).values_list(*COLUMNS)[:5]]
+        month_path(2024, 1).parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(month_path(2024, 1), 'wt', encoding='utf-8') as f:
+            json.dump(encode_records(old), f, separators=(',', ':'))
+        Bet.objects.filter(pk__in=[record.id for record in old]).delete()
+
+        archive_bets(before=self.recent_day, chunk_size=20)
+        # Khối cuối ghi dở (tiến trình dừng khi đang ghi): bị bỏ qua khi đọc
+        with open(month_path(2024, 1), 'ab') as f:
+            f.write(gzip.compress(b'\n{"version":1}\n')[:-12])
+
+        self.assertEqual([len(chunk) for chunk in read_month_chunks(2024, 1)], [5, 20, 20, 15])
+        self.assertEqual([record.id for record in read_month(2024, 1)][:5], [record.id for record in old])
+        self.assertEqual(sum(len(chunk) for chunk in read_month_chunks(2024, 1)), 60)
+
+        # Lần chạy sau bỏ khối ghi dở trước khi ghi thêm vào file
+        self.assertEqual(compact_month(2024, 1), 0)
+        with gzip.open(month_path(2024, 1), 'rb') as f:
+            self.assertEqual(f.read().count(b'\n{'), 4)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN là cú pháp của SQLite")
+class QueryPlanTests(TestCase):
+    """Các truy vấn nóng trên Bet phải đi qua index, không quét toàn bảng."""
+
+    HOT_TABLES = {'lottery_bet', 'wallet_transaction'}
+
+    def setUp(self):
+        rng = random.Random(86)
+        self.user_ids = create_users(20)
+        self.stations = create_stations(north=1, south=1)
+        self.today = timezone.localdate()
+        create_bets(self.user_ids, self.stations, self.today, 400, rng)
+        create_bets(self.user_ids, self.stations, self.today + datetime.timedelta(days=1), 200, rng)
+        self.results = create_results(self.stations, self.today, rng)
+
+    def assertNoFullScans(self, queries):
+        self.assertEqual(full_table_scans(queries, self.HOT_TABLES), [])
+
+    def test_settlement(self):
+        with CaptureQueriesContext(connection) as queries:
+            for result in self.results:
+                settle_lottery_result(result, chunk_size=100)
+        self.assertNoFullScans(queries.captured_queries)
+
+    def test_place_bet_listing_and_slip(self):
+        client = Client()
+        client.force_login(CustomUser.objects.get(pk=self.user_ids[0]))
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/dat-cuoc/')
+            client.post('/dat-cuoc/', {
+                'station': self.stations[1].id, 'bet_type': 'LO', 'number': '010203', 'amount': '1000',
+            })
+        self.assertNoFullScans(queries.captured_queries)
+
+
+class BetAdminChangelistTests(TestCase):
+    """Trang danh sách vé trong admin: số truy vấn cố định, không đếm toàn bảng."""
+
+    def setUp(self):
+        self.rng = random.Random(23)
+        self.user_ids = create_users(10)
+        self.stations = create_stations(north=1, south=1)
+        self.today = timezone.localdate()
+        create_bets(self.user_ids, self.stations, self.today, 100, self.rng)
+        self.client.force_login(make_admin())
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/lottery/bet/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'], len(queries.captured_queries)
+
+    def test_query_count_does_not_grow_with_bet_count(self):
+        _, small = self.changelist()
+        create_bets(self.user_ids, self.stations, self.today - datetime.timedelta(days=1), 500, self.rng)
+        _, large = self.changelist()
+        self.assertEqual(small, large)
+
+    def test_count_is_capped(self):
+        with patch.object(EstimatedCountPaginator, 'count_limit', 50):
+            cl, _ = self.changelist(status__exact='PENDING')
+            self.assertEqual(cl.result_count, 50)
+            cl, _ = self.changelist()
+            self.assertGreaterEqual(cl.result_count, Bet.objects.count())
+
+    def test_number_is_exact_and_username_is_prefix(self):
+        cl, _ = self.changelist(q='07')
+        self.assertEqual(
+            set(cl.result_list.values_list('pk', flat=True)),
+            set(Bet.objects.filter(number='07').values_list('pk', flat=True)),
+        )
+        username = CustomUser.objects.get(pk=self.user_ids[3]).username
+        cl, _ = self.changelist(q=username[:-1])
+        self.assertIn(self.user_ids[3], {bet.user_id for bet in cl.result_list})
+        cl, _ = self.changelist(q=username[1:])
+        self.assertEqual(cl.result_count, 0)
+
+    def test_station_identifier_search(self):
+        station = self.stations[1]
+        cl, _ = self.changelist(q=f'dai:{station.identifier}')
+        self.assertEqual(
+            set(cl.result_list.values_list('pk', flat=True)),
+            set(Bet.objects.filter(station=station).values_list('pk', flat=True)),
+        )
+        cl, _ = self.changelist(q=f'dai:{station.identifier[:-1]}')
+        self.assertEqual(cl.result_count, 0)
+
+
+class BetExportTests(TestCase):
+    """Xuất vé theo luồng: từng khối theo id, nén gzip, chạy tiếp bằng --after-id."""
+
+    def setUp(self):
+        rng = random.Random(24)
+        self.user_ids = create_users(10)
+        self.stations = create_stations(north=1, south=1)
+        self.today = timezone.localdate()
+        create_bets(self.user_ids, self.stations, self.today, 300, rng)
+        create_bets(self.user_ids, self.stations, self.today - datetime.timedelta(days=1), 100, rng)
+        self.tmp = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def export(self, name, **options):
+        call_command('export_bets', output=str(self.tmp / name), stderr=StringIO(), **options)
+        return self.tmp / name
+
+    def test_gzip_csv_in_chunks_and_resume_by_id(self):
+        expected = list(Bet.objects.filter(date=self.today).order_by('pk').values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            path = self.export('ve.csv.gz', gzip=True, chunk_size=50, from_date=str(self.today))
+        self.assertGreaterEqual(len(queries.captured_queries), len(expected) // 50)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([int(row['id']) for row in rows], expected)
+        bet = Bet.objects.select_related('user', 'station').get(pk=rows[0]['id'])
+        self.assertEqual(
+            (rows[0]['username'], rows[0]['station'], Decimal(rows[0]['amount'])),
+            (bet.user.username, bet.station.identifier, bet.amount),
+        )
+
+        # Chạy tiếp sau id thứ 100, dạng JSON Lines, lọc theo đài
+        station = self.stations[0]
+        path = self.export('tiep.jsonl', format='jsonl', after_id=expected[99], station=station.identifier,
+                           from_date=str(self.today))
+        ids = [json.loads(line)['id'] for line in path.read_text(encoding='utf-8').splitlines()]
+        self.assertEqual(ids, [pk for pk in expected[100:] if Bet.objects.get(pk=pk).station_id == station.id])
+
+    def test_interrupted_gzip_export_reports_rows_actually_written(self):
+        expected = list(Bet.objects.filter(date=self.today).order_by('pk').values_list('pk', flat=True))
+        real_iter_chunks = exports.iter_chunks
+
+        def interrupted(*args, **kwargs):
+            for index, rows in enumerate(real_iter_chunks(*args, **kwargs)):
+                if index == 5:
+                    raise KeyboardInterrupt
+                yield rows
+
+        stderr = StringIO()
+        with patch('DjangoProject.exports.iter_chunks', interrupted), self.assertRaises(KeyboardInterrupt):
+            call_command('export_bets', output=str(self.tmp / 've.csv.gz'), gzip=True, chunk_size=20, stderr=stderr)
+        after_id = int(re.search(r'--after-id (\d+)', stderr.getvalue()).group(1))
+
+        # File bị cắt ngang (chưa có phần cuối gzip) vẫn giải nén được tới khối cuối đã báo
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress((self.tmp / 've.csv.gz').read_bytes())
+        written = [int(row['id']) for row in csv.DictReader(StringIO(data.decode('utf-8')))]
+        self.assertEqual(written, expected[:100])
+        self.assertEqual(after_id, written[-1])
+
+        path = self.export('tiep.csv.gz', gzip=True, after_id=after_id)
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            self.assertEqual(written + [int(row['id']) for row in csv.DictReader(f)], expected)
+
+    def test_admin_action_streams_the_filtered_changelist(self):
+        self.client.force_login(make_admin())
+        response = self.client.post(f'/admin/lottery/bet/?date__gte={self.today}', {
+            'action': 'export_jsonl_gzip', 'select_across': '1', 'index': '0', '_selected_action': ['1'],
+        })
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), Bet.objects.filter(date__gte=self.today).count())
+
+
+class ExtractionCacheTests(TestCase):
+    """Ảnh kết quả lưu theo SHA-256; upload lại / thử lại không gọi Gemini."""
+
+    PRIZES = [f"{n:05d}" for n in range(18)]
+
+    def setUp(self):
+        self.image_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(LOTTERY_RESULT_IMAGE_DIR=self.image_dir))
+        self.gemini = self.enterContext(patch('lottery.logic.extract_prizes_with_gemini', return_value=self.PRIZES))
+
+    def upload(self, content, prize_count=18):
+        return get_results_from_gemini(SimpleUploadedFile('kq.png', content), prize_count)
+
+    def test_reupload_and_retry_do_not_call_the_model(self):
+        self.assertEqual(self.upload(b'anh-1'), self.PRIZES)
+        self.assertEqual(self.upload(b'anh-1'), self.PRIZES)
+        self.assertEqual(self.gemini.call_count, 1)
+        self.assertEqual(self.gemini.call_args.args[0], image_path(hashlib.sha256(b'anh-1').hexdigest()))
+
+        # Số giải khác là một khóa cache khác
+        self.upload(b'anh-1', prize_count=27)
+        self.assertEqual(self.gemini.call_count, 2)
+
+        # Kết quả lỗi không được cache: lần thử lại vẫn gọi Gemini
+        self.gemini.side_effect = [ValueError("Gemini chỉ trả về 3 giải (cần 18)."), self.PRIZES]
+        with self.assertRaises(ValueError):
+            self.upload(b'anh-2')
+        self.upload(b'anh-2')
+        self.assertEqual(self.gemini.call_count, 4)
+
+        self.assertEqual(ResultImage.objects.count(), 2)
+        self.assertEqual(len(list(self.image_dir.glob('*/*'))), 2)
+        stats = cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 4))
+        self.assertEqual(GeminiExtraction.objects.get(image__sha256=hashlib.sha256(b'anh-1').hexdigest(),
+                                                      prize_count=18).hit_count, 1)
+
+    def test_least_recently_used_images_are_evicted_over_the_size_cap(self):
+        with override_settings(LOTTERY_EXTRACTION_CACHE_MAX_BYTES=250):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.upload(b'a' * 100)
+                self.upload(b'b' * 100)
+                self.upload(b'a' * 100)  # a vừa được dùng lại, b là ảnh cũ nhất
+                self.upload(b'c' * 100)
+        kept = set(ResultImage.objects.values_list('sha256', flat=True))
+        self.assertEqual(kept, {hashlib.sha256(b'a' * 100).hexdigest(), hashlib.sha256(b'c' * 100).hexdigest()})
+        self.assertEqual({path.name for path in self.image_dir.glob('*/*')}, kept)
+        self.assertEqual(cache_stats()['evictions'], 1)
+
+        # Ảnh đã bị xóa phải được bóc tách lại
+        calls = self.gemini.call_count
+        self.upload(b'b' * 100)
+        self.assertEqual(self.gemini.call_count, calls + 1)
+
+    def test_image_reused_during_eviction_is_kept(self):
+        self.upload(b'a' * 100)
+        self.upload(b'b' * 100)
+        candidates = extraction_cache._eviction_candidates
+        reused = []
+
+        def reuse_oldest(keep):
+            victims = candidates(keep)
+            if not reused:
+                # Request khác upload lại ảnh a sau khi lượt dọn đã chọn nó
+                reused.append(self.upload(b'a' * 100))
+            return victims
+
+        with override_settings(LOTTERY_EXTRACTION_CACHE_MAX_BYTES=250):
+            with patch('lottery.extraction_cache._eviction_candidates', side_effect=reuse_oldest):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.upload(b'c' * 100)
+
+        kept = set(ResultImage.objects.values_list('sha256', flat=True))
+        self.assertEqual(kept, {hashlib.sha256(b'a' * 100).hexdigest(), hashlib.sha256(b'c' * 100).hexdigest()})
+        self.assertEqual({path.name for path in self.image_dir.glob('*/*')}, kept)
+        self.assertEqual(cache_stats()['evictions'], 1)
+
+    def test_admin_shows_counters(self):
+        self.upload(b'anh-1')
+        self.upload(b'anh-1')
+        self.client.force_login(make_admin())
+        response = self.client.get('/admin/lottery/extractioncachestats/')
+        self.assertContains(response, '50.0%')
+
+
+class LoadTestHarnessTests(TransactionTestCase):
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Cần DB test dạng file để nhiều luồng cùng kết nối.")
+
+    def test_report_covers_every_request(self):
+        users = list(CustomUser.objects.filter(id__in=create_users(3, prefix='tai')))
+        stations = create_stations(north=1, south=1, prefix='tai')
+
+        report = run_load(users, [station.id for station in stations], 4, slip_sizes=[1, 3])
+
+        self.assertEqual(report['harness_errors'], [])
+        self.assertEqual(report['overall']['requests'], 12)
+        self.assertEqual(sum(endpoint['requests'] for endpoint in report['endpoints'].values()), 12)
+        self.assertGreater(report['overall']['queries_per_request'], 0)
+        json.dumps(report)
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertIsNone(percentile([], 0.95))
@@ -5,6 +5,8 @@ urlpatterns = [
     path('', views.home_view, name='home'),
     path('dat-cuoc/', views.place_bet_view, name='place_bet'),
     path('xoa-cuoc/<int:bet_id>/', views.delete_bet_view, name='delete_bet'),
+    path('phieu-cuoc/<int:slip_id>/', views.bet_slip_status_view, name='bet_slip_status'),
     # (Chúng ta dùng 'admin-tools' để tránh xung đột)
     path('admin-tools/upload-ket-qua/', views.admin_upload_result_view, name='admin_upload_result'),
+    path('admin-tools/rui-ro/', views.admin_exposure_view, name='admin_exposure'),
 ]
\ No newline at end of file
@@ -1,13 +1,20 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.conf import settings
 from django.db import transaction as db_transaction, IntegrityError  # 1. Sửa lỗi trùng tên
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
+from django.http import JsonResponse
 from django.utils import timezone
-from .models import Bet, LotteryStation, LotteryResult  # 2. Sửa import
-from wallet.models import Transaction  # 3. Sửa import
+from .models import Bet, BetSlip, LotteryResult  # 2. Sửa import
+from wallet.logic import InsufficientBalance, credit_wallet  # 3. Sửa import
+from .catalog import get_station, get_station_catalog
+from .draw_calendar import cutoff_datetime, draw_cutoff, open_stations
+from .exposure import exposure_grid, release_exposure
 from .forms import BetForm, ImageUploadForm
-from .logic import get_results_from_gemini, process_lottery_results
+from .logic import (
+    bet_intake_mode, enqueue_bet_slip, get_results_from_gemini, place_bet_slip, process_lottery_results,
+)
 import datetime
 
 
@@ -32,6 +39,37 @@ def is_admin(user):
     return user.is_authenticated and user.is_superuser
 
 
+# --- DANH SÁCH CƯỢC (trang đặt cược) ---
+def bet_summary(bets):
+    """Tổng hợp vé theo (ngày, đài): số vé, tổng tiền cược, tổng thưởng - tính trong SQL."""
+    return (
+        bets.values('date', 'station_id', 'station__name')
+        .annotate(
+            bet_count=Count('id'),
+            pending_count=Count('id', filter=Q(status='PENDING')),
+            total_amount=Sum('amount'),
+            total_winnings=Sum('winnings'),
+        )
+        .order_by('date', 'station__name')
+    )
+
+
+def bet_page(bets, cursor, page_size=None):
+    """
+    Một trang vé, mới nhất trước, phân trang theo con trỏ (id < cursor) thay
+    vì OFFSET. Trả về (danh sách vé, con trỏ trang sau hoặc None).
+    """
+    page_size = page_size or getattr(settings, 'LOTTERY_BET_PAGE_SIZE', 50)
+    bets = bets.select_related('station').order_by('-id')
+    if cursor and str(cursor).isdigit():
+        bets = bets.filter(id__lt=int(cursor))
+
+    rows = list(bets[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], rows[page_size - 1].id
+    return rows, None
+
+
 # --- VIEW ĐẶT CƯỢC (ĐÃ SỬA LỖI LOGIC LỌC ĐÀI) ---
 @login_required
 def place_bet_view(request):
@@ -39,23 +77,18 @@ def place_bet_view(request):
     today_date = local_now.date()
     tomorrow_date = today_date + datetime.timedelta(days=1)
 
-    # --- LỌC ĐÀI (LOGIC MỚI) ---
-    today_day_of_week = str(today_date.weekday())
-    tomorrow_day_of_week = str(tomorrow_date.weekday())
+    # --- LỌC ĐÀI (một truy vấn trên lịch quay DrawCalendar) ---
+    catalog = get_station_catalog()
+    open_by_date = open_stations([today_date, tomorrow_date], now=local_now)
 
-    # 1. Lấy các đài CÓ LỊCH quay hôm nay VÀ CHƯA TỚI GIỜ CHỐT
-    stations_today_open = LotteryStation.objects.filter(
-        (Q(schedule_days="ALL") | Q(schedule_days__contains=today_day_of_week)) &
-        Q(cutoff_hour__gt=local_now.hour)  # Lớn hơn giờ hiện tại
-    )
+    # 1. Các đài CÓ LỊCH quay hôm nay VÀ CHƯA TỚI GIỜ CHỐT
+    stations_today_open = open_by_date[today_date]
 
-    # 2. Lấy các đài CÓ LỊCH quay ngày mai
-    stations_tomorrow = LotteryStation.objects.filter(
-        Q(schedule_days="ALL") | Q(schedule_days__contains=tomorrow_day_of_week)
-    )
+    # 2. Các đài CÓ LỊCH quay ngày mai
+    stations_tomorrow = open_by_date[tomorrow_date]
 
     if request.method == 'POST':
-        # Truyền queryset vào form
+        # Truyền danh sách đài vào form
         form = BetForm(
             request.POST,
             stations_today=stations_today_open,
@@ -65,10 +98,8 @@ def place_bet_view(request):
         if form.is_valid():
             data = form.cleaned_data
 
-            station_id = data['station']
-            try:
-                selected_station = LotteryStation.objects.get(id=station_id)
-            except LotteryStation.DoesNotExist:
+            selected_station = catalog.get(int(data['station']))
+            if selected_station is None:
                 messages.error(request, "Đài bạn chọn không hợp lệ.")
                 return redirect('place_bet')
 
@@ -92,47 +123,37 @@ def place_bet_view(request):
                 messages.error(request, f"Số dư không đủ. Cần {total_amount_needed:,.0f}đ.")
                 return redirect('place_bet')
 
+            # --- CHẾ ĐỘ HÀNG ĐỢI: chỉ ghi phiếu, tiến trình drain_bet_slips sẽ ghi vé ---
+            if bet_intake_mode() == 'queue':
+                cutoff_at = (draw_cutoff(selected_station.id, bet_date)
+                             or cutoff_datetime(bet_date, selected_station.cutoff_hour))
+                slip = enqueue_bet_slip(
+                    request.user, selected_station, bet_type,
+                    number_list, amount_per_bet, bet_date, cutoff_at
+                )
+                messages.info(request, f"Đã nhận phiếu cược #{slip.id} ({len(number_list)} số, đài "
+                                       f"{selected_station.name}, ngày {bet_date}). Phiếu đang được xử lý.")
+                return redirect('place_bet')
+
             new_bet_messages = []
             updated_bets_messages = []
 
             try:
                 # Dùng db_transaction (đã sửa)
                 with db_transaction.atomic():
-                    user_wallet.balance -= total_amount_needed
-                    user_wallet.save()
-
-                    for number in number_list:
-                        Transaction.objects.create(  # Model
-                            wallet=user_wallet,
-                            amount=amount_per_bet,
-                            transaction_type='BET',
-                            description=f"Cược {bet_type} {selected_station.name} số {number} ngày {bet_date}"
-                        )
-
-                        existing_bet = Bet.objects.filter(
-                            user=request.user, station=selected_station,
-                            bet_type=bet_type, number=number,
-                            date=bet_date, status='PENDING'
-                        ).first()
-
-                        formatted_amount = f"{amount_per_bet:,.0f}đ"
-
-                        if existing_bet:
-                            existing_bet.amount += amount_per_bet
-                            existing_bet.save()
-                            formatted_total_bet = f"{existing_bet.amount:,.0f}đ"
-                            msg = f"Ghi thêm {bet_type} {selected_station.name} {number} (ngày {bet_date}) là: {formatted_total_bet}"
-                            updated_bets_messages.append(msg)
-
-                        else:
-                            Bet.objects.create(
-                                user=request.user, station=selected_station,
-                                bet_type=bet_type, number=number,
-                                amount=amount_per_bet, date=bet_date,
-                                status='PENDING'
-                            )
-                            msg = f"Cược mới {bet_type} {selected_station.name} số: {number} (ngày {bet_date}) là: {formatted_amount}"
-                            new_bet_messages.append(msg)
+                    new_numbers, updated_bets = place_bet_slip(
+                        request.user, selected_station, bet_type,
+                        number_list, amount_per_bet, bet_date
+                    )
+
+                formatted_amount = f"{amount_per_bet:,.0f}đ"
+                for number in new_numbers:
+                    msg = f"Cược mới {bet_type} {selected_station.name} số: {number} (ngày {bet_date}) là: {formatted_amount}"
+                    new_bet_messages.append(msg)
+                for number, total_bet in updated_bets:
+                    formatted_total_bet = f"{total_bet:,.0f}đ"
+                    msg = f"Ghi thêm {bet_type} {selected_station.name} {number} (ngày {bet_date}) là: {formatted_total_bet}"
+                    updated_bets_messages.append(msg)
 
                 # Gửi tin nhắn
                 for msg in new_bet_messages: messages.success(request, msg)
@@ -141,6 +162,8 @@ def place_bet_view(request):
                 messages.info(request, f"Tổng tiền vừa cược {selected_station.name}: {formatted_total}")
                 return redirect('place_bet')
 
+            except InsufficientBalance as e:
+                messages.error(request, str(e))
             except IntegrityError:
                 messages.error(request,
                                f"Lỗi: Một trong các số cược (ngày {bet_date}, đài {selected_station.name}) đã được xử lý.")
@@ -148,19 +171,31 @@ def place_bet_view(request):
                 messages.error(request, f"Có lỗi xảy ra: {e}")
 
     else:
-        # Khi GET, truyền 2 queryset vào form
+        # Khi GET, truyền 2 danh sách đài vào form
         form = BetForm(
             stations_today=stations_today_open,
             stations_tomorrow=stations_tomorrow
         )
 
-    today_bets = Bet.objects.filter(user=request.user, date=today_date)
-    tomorrow_bets = Bet.objects.filter(user=request.user, date=tomorrow_date)
+    # --- DANH SÁCH CƯỢC: tổng hợp theo đài bằng SQL + chi tiết phân trang theo con trỏ ---
+    user_bets = Bet.objects.filter(user=request.user)
+    summaries = {today_date: [], tomorrow_date: []}
+    for row in bet_summary(user_bets.filter(date__in=[today_date, tomorrow_date])):
+        summaries[row['date']].append(row)
+
+    today_bets, today_next = bet_page(user_bets.filter(date=today_date), request.GET.get('hom_nay'))
+    tomorrow_bets, tomorrow_next = bet_page(user_bets.filter(date=tomorrow_date), request.GET.get('ngay_mai'))
 
     return render(request, 'lottery/place_bet.html', {
         'form': form,
         'today_bets': today_bets,
         'tomorrow_bets': tomorrow_bets,
+        'today_summary': summaries[today_date],
+        'tomorrow_summary': summaries[tomorrow_date],
+        'today_next': today_next,
+        'tomorrow_next': tomorrow_next,
+        'today_cursor': request.GET.get('hom_nay', ''),
+        'tomorrow_cursor': request.GET.get('ngay_mai', ''),
         'tomorrow_date_for_display': tomorrow_date,
         'today_date_for_display': today_date,
     })
@@ -175,29 +210,38 @@ def delete_bet_view(request, bet_id):
         messages.error(request, "Không thể xóa cược đã xử lý.")
         return redirect('place_bet')
 
-    cutoff_hour = bet.station.cutoff_hour
+    station = get_station(bet.station_id)
+    if station is None:
+        messages.error(request, "Không tìm thấy đài của vé cược này.")
+        return redirect('place_bet')
     local_now = get_local_now()
 
-    if bet.date == local_now.date():
-        if local_now.hour >= cutoff_hour:
-            messages.error(request, f"Đã qua giờ chốt cược ({cutoff_hour}h00) của đài {bet.station.name}.")
-            return redirect('place_bet')
+    # Giờ chốt lấy từ lịch quay; vé của ngày không còn trong lịch (ví dụ
+    # ngày nghỉ vừa được thêm) thì dùng giờ chốt mặc định của đài
+    cutoff_at = draw_cutoff(bet.station_id, bet.date) or cutoff_datetime(bet.date, station.cutoff_hour)
+    if local_now >= cutoff_at:
+        cutoff_local = cutoff_at.astimezone(local_now.tzinfo)
+        messages.error(request, f"Đã qua giờ chốt cược ({cutoff_local:%Hh%M} ngày {bet.date}) của đài {station.name}.")
+        return redirect('place_bet')
 
     try:
         with db_transaction.atomic():  # Sửa lỗi
-            wallet = request.user.wallet
-            wallet.balance += bet.amount
-            wallet.save()
-
-            Transaction.objects.create(  # Sửa lỗi
-                wallet=wallet,
-                amount=bet.amount,
-                transaction_type='REFUND',
-                description=f"Hoàn tiền (hủy cược {bet.station.name} {bet.bet_type} {bet.number})"
-            )
-            bet_info = f"{bet.station.name} {bet.bet_type} {bet.number}"
+            # Đọc lại vé trong transaction: hai request xóa cùng lúc chỉ một
+            # request được hoàn tiền
+            bet = Bet.objects.select_for_update().filter(
+                id=bet.id, status='PENDING'
+            ).first()
+            if bet is None:
+                raise ValueError("Vé cược đã được xử lý hoặc đã bị xóa.")
+
+            bet_info = f"{station.name} {bet.bet_type} {bet.number}"
             bet_amount = bet.amount
             bet.delete()
+            release_exposure(bet.station_id, bet.date, bet.bet_type, bet.number, bet_amount)
+
+            credit_wallet(request.user.wallet.pk, 'REFUND', [
+                (bet_amount, f"Hoàn tiền (hủy cược {bet_info})")
+            ])
         messages.success(request, f"Đã xóa cược {bet_info} và hoàn {bet_amount:,.0f}đ vào ví.")
     except Exception as e:
         messages.error(request, f"Lỗi khi xóa cược: {e}")
@@ -205,6 +249,60 @@ def delete_bet_view(request, bet_id):
     return redirect('place_bet')
 
 
+# --- TRẠNG THÁI PHIẾU CƯỢC (client hỏi lại sau khi phiếu vào hàng đợi) ---
+@login_required
+def bet_slip_status_view(request, slip_id):
+    slip = get_object_or_404(BetSlip, id=slip_id, user=request.user)
+    return JsonResponse({
+        'id': slip.id,
+        'status': slip.status,
+        'status_display': slip.get_status_display(),
+        'station_id': slip.station_id,
+        'bet_type': slip.bet_type,
+        'numbers': slip.numbers,
+        'amount_per_bet': str(slip.amount_per_bet),
+        'bet_date': slip.bet_date.isoformat(),
+        'cutoff_at': slip.cutoff_at.isoformat(),
+        'result': slip.result,
+        'error': slip.error,
+        'processed_at': slip.processed_at.isoformat() if slip.processed_at else None,
+    })
+
+
+# --- BẢN ĐỒ RỦI RO 100 SỐ (ADMIN) ---
+@user_passes_test(is_admin)
+def admin_exposure_view(request):
+    catalog = get_station_catalog()
+    stations = catalog.stations
+    station = catalog.get(int(request.GET['station'])) if request.GET.get('station', '').isdigit() else None
+    station = station or (stations[0] if stations else None)
+
+    try:
+        exposure_date = datetime.date.fromisoformat(request.GET.get('date', ''))
+    except ValueError:
+        exposure_date = get_local_now().date()
+
+    context = {'stations': stations, 'station': station, 'exposure_date': exposure_date}
+    if station is not None:
+        grid = exposure_grid(station, exposure_date)
+        # Tiền phải trả nếu GĐB rơi vào số n (đề + một giải lô của n)
+        payouts = [de + lo for de, lo in zip(grid['de_payout'], grid['lo_payout'])]
+        top = max(payouts) or 1
+        cells = [
+            {
+                'number': f"{n:02d}",
+                'de': grid['de'][n],
+                'lo': grid['lo'][n],
+                'payout': payouts[n],
+                'heat': int(payouts[n] * 99 / top),  # độ đậm màu 0..99
+            }
+            for n in range(100)
+        ]
+        context.update(grid=grid, rows=[cells[i:i + 10] for i in range(0, 100, 10)])
+
+    return render(request, 'lottery/admin_exposure.html', context)
+
+
 # --- VIEW UPLOAD ADMIN (Đã sửa lỗi import) ---
 @user_passes_test(is_admin)
 def admin_upload_result_view(request):
@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
+from django.utils.html import format_html_join
 from .models import CustomUser
-from wallet.models import Wallet  # Import từ app wallet
+from wallet.models import Transaction, Wallet  # Import từ app wallet
+from wallet.rollups import wallet_totals
 
 
 # Định nghĩa một "Inline" để hiển thị Wallet NGAY BÊN TRONG trang CustomUser
@@ -10,7 +13,20 @@ class WalletInline(admin.StackedInline):
     can_delete = False  # Không cho phép xóa ví từ trang user
     verbose_name_plural = 'Ví tiền của người dùng'
     # Bạn có thể làm cho số dư chỉ được đọc
-    readonly_fields = ('balance',)
+    readonly_fields = ('balance', 'month_summary')
+
+    @admin.display(description='Tháng này')
+    def month_summary(self, wallet):
+        # Đọc từ bảng tổng hợp theo ngày, không quét toàn bộ giao dịch của ví
+        today = timezone.localdate()
+        totals = wallet_totals(wallet.pk, today.replace(day=1), today)
+        return format_html_join(
+            ' | ', '{}: {}đ ({} GD)',
+            (
+                (label, f"{totals[code]['total']:,.0f}", totals[code]['count'])
+                for code, label in Transaction.TRANSACTION_TYPES if code in totals
+            ),
+        ) or '-'
 
 
 @admin.register(CustomUser)
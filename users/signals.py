@@ -4,10 +4,14 @@ from .models import CustomUser
 from wallet.models import Wallet  # Đảm bảo import từ app wallet
 from decimal import Decimal
 
+# Tiền tặng khi đăng ký (không có Transaction tương ứng; wallet.reconcile cần biết)
+SIGNUP_BONUS = Decimal('1000000.00')
+
+
 @receiver(post_save, sender=CustomUser)
 def create_user_wallet(sender, instance, created, **kwargs):
     """
     Tự động tạo một đối tượng Wallet khi một CustomUser mới được tạo.
     """
     if created:
-        Wallet.objects.create(user=instance, balance=Decimal('1000000.00'))
\ No newline at end of file
+        Wallet.objects.create(user=instance, balance=SIGNUP_BONUS)
\ No newline at end of file
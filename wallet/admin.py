@@ -1,9 +1,15 @@
+import uuid
+
 from django.contrib import admin, messages
-from django.db import transaction
+from django.contrib.admin import helpers
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django import forms
-from .models import Wallet, Transaction, DepositRequest, WithdrawalRequest
+from django.db.models import Sum
+from DjangoProject.admin_utils import EstimatedCountPaginator, IndexedSearchMixin, StreamingExportMixin
+from DjangoProject.exports import TRANSACTION_EXPORT_FIELDS
+from .models import Wallet, Transaction, DepositRequest, WithdrawalRequest, WalletCheckpoint, WalletDailyRollup
+from .logic import ApprovalInterrupted, approve_deposit_requests, approve_withdrawal_requests, bulk_deposit
 from decimal import Decimal
 from django.utils import timezone
 #from django.utils.html import format_html
@@ -41,70 +47,99 @@ class WalletAdmin(admin.ModelAdmin):
     def deposit_funds(self, request, queryset):
         """
         Đây là Action tùy chỉnh để nạp tiền.
-        Nó sẽ hiển thị một trang trung gian để nhập số tiền.
+        Trang trung gian chỉ hiển thị số ví và tổng tiền (không liệt kê từng
+        ví), hỗ trợ cả "chọn tất cả" (select_across) cho hàng nghìn ví.
         """
-        form = None
-
-        # Bước 3: Admin đã nhập số tiền và bấm "Xác nhận"
-        if 'apply' in request.POST:
-            form = DepositForm(request.POST)
-
-            if form.is_valid():
-                amount = form.cleaned_data['amount']
-                description = form.cleaned_data['description']
-
-                count = 0
+        form = DepositForm(request.POST) if ('preview' in request.POST or 'apply' in request.POST) else DepositForm()
+        select_across = request.POST.get('select_across') == '1'
+        wallet_count = queryset.count()
+        confirm = None
+
+        if form.is_bound and form.is_valid():
+            amount = form.cleaned_data['amount']
+            description = form.cleaned_data['description']
+            # Mã đợt nạp: bấm xác nhận hai lần cũng không nạp trùng
+            campaign = request.POST.get('campaign') or f"admin-{uuid.uuid4().hex[:12]}"
+
+            # Bước 3: Admin đã xem tổng tiền và bấm "Xác nhận"
+            if 'apply' in request.POST:
                 try:
-                    # Dùng transaction để đảm bảo an toàn tuyệt đối
-                    with transaction.atomic():
-                        for wallet in queryset:
-                            # 1. Cộng tiền vào ví
-                            wallet.balance += amount
-                            wallet.save()
-
-                            # 2. Tạo lịch sử giao dịch
-                            Transaction.objects.create(
-                                wallet=wallet,
-                                amount=amount,  # Số tiền CỘNG vào
-                                transaction_type='DEPOSIT',
-                                description=f"Admin nạp: {description}"
-                            )
-                            count += 1
-
-                    # Thông báo thành công
-                    self.message_user(request, f"Đã nạp {amount}đ thành công cho {count} ví.", messages.SUCCESS)
+                    count, total = bulk_deposit(queryset, amount, f"Admin nạp: {description}", campaign)
+                    self.message_user(request, f"Đã nạp {amount:,.0f}đ cho {count} ví (tổng {total:,.0f}đ).",
+                                      messages.SUCCESS)
                     return HttpResponseRedirect(request.get_full_path())
-
                 except Exception as e:
                     self.message_user(request, f"Gặp lỗi khi nạp tiền: {e}", messages.ERROR)
 
-        # Bước 2: Admin vừa chọn action, hiển thị form để nhập số tiền
-        if not form:
-            form = DepositForm()
+            # Bước 2b: hiển thị số ví và tổng tiền để xác nhận
+            confirm = {'amount': amount, 'total': amount * wallet_count, 'campaign': campaign}
 
-        # Render trang trung gian
+        # Bước 2: Admin vừa chọn action, hiển thị form để nhập số tiền
         return render(request, 'admin/deposit_intermediate.html', {
-            'wallets': queryset,
             'form': form,
+            'confirm': confirm,
+            'wallet_count': wallet_count,
+            'balance_total': queryset.aggregate(total=Sum('balance'))['total'] or Decimal('0.00'),
+            'select_across': select_across,
+            # Khi "chọn tất cả", Django tự dựng lại queryset từ bộ lọc hiện tại
+            'selected_ids': [] if select_across else request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
             'title': 'Nạp tiền vào ví'
         })
 
 
 # --- 3. (Nên làm) Đăng ký Transaction Admin để xem lịch sử ---
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
+class TransactionAdmin(IndexedSearchMixin, StreamingExportMixin, admin.ModelAdmin):
     list_display = ('wallet', 'amount', 'transaction_type', 'timestamp', 'description')
-    list_filter = ('transaction_type', 'timestamp')
-    search_fields = ('wallet__user__username',)
-    readonly_fields = ('wallet', 'amount', 'transaction_type', 'description', 'external_id')
+    list_filter = ('transaction_type',)
+    list_select_related = ('wallet__user',)
+    date_hierarchy = 'timestamp'
+    # Bảng lớn: sắp theo id, không đếm toàn bảng
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    indexed_search_fields = (('wallet__user__username', 'prefix', None),)
+    readonly_fields = ('wallet', 'amount', 'transaction_type', 'description', 'external_id', 'campaign')
+    export_fields = TRANSACTION_EXPORT_FIELDS
+    actions = StreamingExportMixin.export_actions
+
+
+# Số yêu cầu bị từ chối/bỏ qua được báo chi tiết (duyệt hàng nghìn yêu cầu một lần)
+MAX_OUTCOME_MESSAGES = 20
+
+
+def report_outcomes(model_admin, request, outcomes, kind):
+    """Báo kết quả duyệt theo lô: tổng số theo trạng thái + chi tiết các yêu cầu không được duyệt."""
+    approved = sum(1 for _, _, status, _ in outcomes if status == 'APPROVED')
+    failed = [outcome for outcome in outcomes if outcome[2] != 'APPROVED']
+
+    if approved or not failed:
+        model_admin.message_user(request, f"Đã duyệt thành công {approved} yêu cầu {kind}.", messages.SUCCESS)
+    for request_id, username, status, note in failed[:MAX_OUTCOME_MESSAGES]:
+        label = "Từ chối" if status == 'REJECTED' else "Bỏ qua"
+        model_admin.message_user(request, f"{label} YC #{request_id} của {username}: {note}", messages.ERROR)
+    if len(failed) > MAX_OUTCOME_MESSAGES:
+        model_admin.message_user(
+            request, f"... và {len(failed) - MAX_OUTCOME_MESSAGES} yêu cầu khác không được duyệt.", messages.WARNING
+        )
 
 
 # === THÊM ADMIN CHO DEPOSIT REQUEST ===
 @admin.register(DepositRequest)
-class DepositRequestAdmin(admin.ModelAdmin):
+class DepositRequestAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('user', 'amount', 'status', 'transaction_code', 'created_at')
-    list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'transaction_code')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    # Không đếm toàn bảng khi đang lọc (chỉ cần số yêu cầu khớp bộ lọc)
+    show_full_result_count = False
+    # "ma:<mã giao dịch>" -> theo đầu mã giao dịch ngân hàng, còn lại -> theo đầu username
+    indexed_search_fields = (
+        ('transaction_code', 'prefix', r'ma:\s*(?P<term>.+)'),
+        ('user__username', 'prefix', None),
+    )
 
     # Chỉ cho admin xem, không cho sửa
     readonly_fields = ('user', 'amount', 'transaction_code', 'created_at', 'processed_at')
@@ -114,50 +149,23 @@ class DepositRequestAdmin(admin.ModelAdmin):
 
     @admin.action(description="Duyệt các yêu cầu nạp tiền đã chọn")
     def approve_deposits(self, request, queryset):
-        # Lọc ra các yêu cầu đang chờ
-        pending_requests = queryset.filter(status='PENDING')
-
-        count = 0
+        # Duyệt theo lô: khóa ví, cộng tiền, ghi giao dịch và đổi trạng thái bằng vài câu SQL mỗi lô
         try:
-            with transaction.atomic():
-                for req in pending_requests:
-                    wallet = req.user.wallet
-
-                    # 1. Cộng tiền vào ví
-                    wallet.balance += req.amount
-                    wallet.save()
-
-                    # 2. Tạo lịch sử giao dịch
-                    Transaction.objects.create(
-                        wallet=wallet,
-                        amount=req.amount,
-                        transaction_type='DEPOSIT',
-                        description=f"Admin duyệt yêu cầu nạp tiền #{req.id}"
-                    )
-
-                    # 3. Cập nhật trạng thái yêu cầu
-                    req.status = 'APPROVED'
-                    req.processed_at = timezone.now()
-                    req.save()
-
-                    count += 1
-
-            self.message_user(request, f"Đã duyệt thành công {count} yêu cầu nạp tiền.", messages.SUCCESS)
+            outcomes = approve_deposit_requests(queryset)
+        except ApprovalInterrupted as e:
+            # Các lô trước lô lỗi đã được commit: vẫn báo kết quả của chúng
+            if e.outcomes:
+                report_outcomes(self, request, e.outcomes, "nạp tiền")
+            self.message_user(request, f"Gặp lỗi khi duyệt, các yêu cầu còn lại chưa được xử lý: {e}",
+                              messages.ERROR)
+            return
 
-        except Exception as e:
-            self.message_user(request, f"Gặp lỗi khi duyệt: {e}", messages.ERROR)
+        report_outcomes(self, request, outcomes, "nạp tiền")
 
     @admin.action(description="Từ chối các yêu cầu nạp tiền đã chọn")
     def reject_deposits(self, request, queryset):
-        # Lọc ra các yêu cầu đang chờ
-        pending_requests = queryset.filter(status='PENDING')
-
-        count = 0
-        for req in pending_requests:
-            req.status = 'REJECTED'
-            req.processed_at = timezone.now()
-            req.save()
-            count += 1
+        # Lọc ra các yêu cầu đang chờ, từ chối bằng một câu UPDATE
+        count = queryset.filter(status='PENDING').update(status='REJECTED', processed_at=timezone.now())
 
         self.message_user(request, f"Đã từ chối {count} yêu cầu nạp tiền.", messages.INFO)
 
@@ -165,7 +173,7 @@ class DepositRequestAdmin(admin.ModelAdmin):
 # ... (Giữ nguyên các Admin khác) ...
 
 @admin.register(WithdrawalRequest)
-class WithdrawalRequestAdmin(admin.ModelAdmin):
+class WithdrawalRequestAdmin(IndexedSearchMixin, admin.ModelAdmin):
     # ... (Giữ nguyên list_display, list_filter, search_fields, readonly_fields) ...
     list_display = (
         'user',
@@ -176,8 +184,17 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
         'bank_name',
         'account_number',
     )
-    list_filter = ('status', 'created_at')
-    search_fields = ('user__username', 'account_number', 'full_name_cccd')
+    list_filter = ('status',)
+    list_select_related = ('user',)
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    # "stk:<số tài khoản>" -> theo số tài khoản nhận, còn lại -> theo đầu username
+    indexed_search_fields = (
+        ('account_number', 'exact', r'stk:\s*(?P<term>\S+)'),
+        ('user__username', 'prefix', None),
+    )
     readonly_fields = (
         'user',
         'amount',
@@ -194,68 +211,50 @@ class WithdrawalRequestAdmin(admin.ModelAdmin):
     def approve_withdrawals(self, request, queryset):
         # Admin phải TỰ CHUYỂN TIỀN TRƯỚC khi bấm nút này
 
-        pending_requests = queryset.filter(status='PENDING')
-        success_count = 0
-        fail_count = 0
-
+        # Số dư được đọc khi ví đã bị khóa; yêu cầu vượt số dư còn lại bị tự động từ chối
         try:
-            # Dùng transaction để đảm bảo an toàn
-            with transaction.atomic():
-                for req in pending_requests:
-                    wallet = req.user.wallet
-
-                    # 1. Kiểm tra lại xem user CÒN đủ tiền không
-                    if wallet.balance >= req.amount:
-                        # 2. TRỪ TIỀN (Chuyển logic về đây)
-                        wallet.balance -= req.amount
-                        wallet.save()
-
-                        # 3. Tạo giao dịch 'WITHDRAW'
-                        Transaction.objects.create(
-                            wallet=wallet,
-                            amount=req.amount,
-                            transaction_type='WITHDRAW',
-                            description=f"Admin duyệt yêu cầu rút tiền #{req.id}"
-                        )
-
-                        # 4. Cập nhật trạng thái yêu cầu
-                        req.status = 'APPROVED'
-                        req.processed_at = timezone.now()
-                        req.save()
-
-                        success_count += 1
-                    else:
-                        # Nếu user không còn đủ tiền (ví dụ: đã cược thua)
-                        fail_count += 1
-                        req.status = 'REJECTED'  # Tự động từ chối
-                        req.processed_at = timezone.now()
-                        req.save()
-                        # Báo lỗi cụ thể cho admin
-                        self.message_user(request,
-                                          f"Từ chối YC #{req.id} của {req.user.username}: Không đủ số dư (cần {req.amount}, có {wallet.balance}).",
-                                          messages.ERROR)
-
-            if success_count > 0:
-                self.message_user(request, f"Đã duyệt và trừ tiền thành công {success_count} yêu cầu.",
-                                  messages.SUCCESS)
-            if fail_count > 0:
-                self.message_user(request, f"Đã từ chối {fail_count} yêu cầu do không đủ số dư.", messages.WARNING)
-
-        except Exception as e:
-            self.message_user(request, f"Gặp lỗi nghiêm trọng khi duyệt: {e}", messages.ERROR)
+            outcomes = approve_withdrawal_requests(queryset)
+        except ApprovalInterrupted as e:
+            if e.outcomes:
+                report_outcomes(self, request, e.outcomes, "rút tiền")
+            self.message_user(request, f"Gặp lỗi nghiêm trọng khi duyệt, các yêu cầu còn lại chưa được xử lý: {e}",
+                              messages.ERROR)
+            return
+
+        report_outcomes(self, request, outcomes, "rút tiền")
 
     @admin.action(description="Từ chối các yêu cầu RÚT tiền")
     def reject_withdrawals(self, request, queryset):
-        pending_requests = queryset.filter(status='PENDING')
-
-        # --- ĐƠN GIẢN HÓA LOGIC ---
-        # Không cần hoàn tiền nữa, vì tiền chưa bao giờ bị trừ
-        count = 0
-        for req in pending_requests:
-            req.status = 'REJECTED'
-            req.processed_at = timezone.now()
-            req.save()
-            count += 1
-        # --- KẾT THÚC ---
-
-        self.message_user(request, f"Đã từ chối {count} yêu cầu rút tiền.", messages.INFO)
\ No newline at end of file
+        # Không cần hoàn tiền, vì tiền chưa bao giờ bị trừ
+        count = queryset.filter(status='PENDING').update(status='REJECTED', processed_at=timezone.now())
+
+        self.message_user(request, f"Đã từ chối {count} yêu cầu rút tiền.", messages.INFO)
+
+
+@admin.register(WalletCheckpoint)
+class WalletCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'taken_at', 'balance', 'derived_balance', 'drift', 'last_transaction_id')
+    list_filter = ('taken_at',)
+    search_fields = ('wallet__user__username',)
+
+    # Checkpoint chỉ do lệnh checkpoint_wallets ghi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WalletDailyRollup)
+class WalletDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('wallet', 'day', 'transaction_type', 'total', 'count')
+    list_filter = ('transaction_type', 'day')
+    search_fields = ('wallet__user__username',)
+    list_select_related = ('wallet__user',)
+
+    # Bảng tổng hợp chỉ do lệnh rollup_transactions ghi
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,5 +1,5 @@
 from django import forms
-from .models import DepositRequest, WithdrawalRequest
+from .models import DepositRequest, Transaction, WithdrawalRequest
 
 class DepositRequestForm(forms.ModelForm):
     class Meta:
@@ -42,4 +42,21 @@ class WithdrawalRequestForm(forms.ModelForm):
             raise forms.ValidationError(f"Số dư không đủ. Bạn chỉ có {self.wallet.balance}đ.")
         if amount <= 0:
             raise forms.ValidationError("Số tiền rút phải lớn hơn 0.")
-        return amount
\ No newline at end of file
+        return amount
+
+class StatementFilterForm(forms.Form):
+    """Bộ lọc sao kê (GET): loại giao dịch và khoảng ngày (giờ địa phương)."""
+    transaction_type = forms.ChoiceField(
+        label='Loại giao dịch',
+        choices=[('', 'Tất cả')] + Transaction.TRANSACTION_TYPES,
+        required=False,
+    )
+    date_from = forms.DateField(label='Từ ngày', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(label='Đến ngày', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("'Từ ngày' phải trước hoặc bằng 'Đến ngày'.")
+        return cleaned_data
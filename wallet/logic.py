@@ -0,0 +1,399 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DepositRequest, Transaction, Wallet, WalletCheckpoint, WithdrawalRequest
+
+
+# --- API THAO TÁC VÍ ---
+# Mọi thay đổi số dư đều đi qua các hàm dưới đây: số dư được cập nhật bằng
+# biểu thức F() ngay trong câu UPDATE (không đọc-sửa-ghi trong Python, nên
+# không mất cập nhật khi có request đồng thời), và giao dịch tương ứng được
+# ghi trong cùng transaction.
+#
+# `entries` là danh sách (số tiền, mô tả): mỗi phần tử thành một dòng
+# Transaction, còn ví chỉ bị cập nhật MỘT lần với tổng số tiền.
+
+class InsufficientBalance(Exception):
+    """Số dư ví không đủ cho giao dịch trừ tiền."""
+
+
+class ApprovalInterrupted(Exception):
+    """
+    Một lô duyệt yêu cầu bị lỗi (đã rollback). `outcomes` là kết quả của các
+    lô trước đó, đã được commit.
+    """
+
+    def __init__(self, error, outcomes):
+        super().__init__(str(error))
+        self.outcomes = outcomes
+
+
+def debit_wallet(wallet_id, transaction_type, entries):
+    """
+    Trừ tiền có điều kiện: UPDATE ... WHERE balance >= tổng tiền.
+    Ném InsufficientBalance nếu số dư không đủ (không có gì bị ghi).
+    """
+    total = sum((amount for amount, _ in entries), Decimal('0.00'))
+
+    with db_transaction.atomic():
+        updated = Wallet.objects.filter(pk=wallet_id, balance__gte=total).update(
+            balance=F('balance') - total,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise InsufficientBalance(f"Số dư không đủ. Cần {total:,.0f}đ.")
+
+        _create_transactions(transaction_type, [(wallet_id, amount, description) for amount, description in entries])
+
+    return total
+
+
+def credit_wallet(wallet_id, transaction_type, entries):
+    """Cộng tiền vào một ví và ghi giao dịch."""
+    total = sum((amount for amount, _ in entries), Decimal('0.00'))
+
+    with db_transaction.atomic():
+        updated = Wallet.objects.filter(pk=wallet_id).update(
+            balance=F('balance') + total,
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            raise Wallet.DoesNotExist(f"Không tìm thấy ví #{wallet_id}.")
+
+        _create_transactions(transaction_type, [(wallet_id, amount, description) for amount, description in entries])
+
+    return total
+
+
+def credit_wallets(transaction_type, entries_by_wallet):
+    """
+    Cộng tiền cho nhiều ví cùng lúc: {wallet_id: [(số tiền, mô tả), ...]}.
+    MỘT UPDATE cho mọi ví (CASE theo tổng tiền của từng ví), và toàn bộ
+    giao dịch được ghi bằng một bulk_create.
+    """
+    totals = _wallet_totals(entries_by_wallet)
+
+    with db_transaction.atomic():
+        updated = Wallet.objects.filter(pk__in=totals).update(
+            balance=F('balance') + _amount_case(totals),
+            updated_at=timezone.now(),
+        )
+        if updated != len(entries_by_wallet):
+            raise Wallet.DoesNotExist(f"Chỉ tìm thấy {updated}/{len(entries_by_wallet)} ví.")
+
+        _create_transactions(transaction_type, [
+            (wallet_id, amount, description)
+            for wallet_id, entries in entries_by_wallet.items()
+            for amount, description in entries
+        ])
+
+
+def _wallet_totals(entries_by_wallet):
+    return {
+        wallet_id: sum((amount for amount, _ in entries), Decimal('0.00'))
+        for wallet_id, entries in entries_by_wallet.items()
+    }
+
+
+def _amount_case(totals):
+    """CASE pk: tổng tiền của từng ví; các ví cùng tổng tiền dùng chung một nhánh WHEN."""
+    wallet_ids_by_total = defaultdict(list)
+    for wallet_id, total in totals.items():
+        wallet_ids_by_total[total].append(wallet_id)
+    return Case(
+        *[When(pk__in=wallet_ids, then=Value(total)) for total, wallet_ids in wallet_ids_by_total.items()],
+        default=Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+BULK_DEPOSIT_CHUNK_SIZE = 2000
+
+
+def bulk_deposit(wallets, amount, description, campaign, chunk_size=BULK_DEPOSIT_CHUNK_SIZE):
+    """
+    Nạp cùng một số tiền cho mọi ví trong queryset `wallets` (ví dụ: khuyến
+    mãi cho tất cả user). Mỗi lô `chunk_size` ví là một transaction gồm MỘT
+    UPDATE số dư và MỘT bulk_create giao dịch DEPOSIT.
+
+    Giao dịch được gắn mã đợt `campaign` (cột riêng, duy nhất theo ví) và mã
+    tham chiếu riêng external_id = "<campaign>:<wallet id>"; ví đã có giao
+    dịch của đợt bị bỏ qua, nên chạy lại sau sự cố (hoặc bấm xác nhận hai
+    lần) không nạp trùng. Trả về (số ví đã nạp, tổng tiền).
+    """
+    pending = wallets.filter(
+        ~Exists(Transaction.objects.filter(wallet=OuterRef('pk'), campaign=campaign))
+    ).order_by('pk').values_list('pk', flat=True)
+
+    credited = 0
+    cursor = 0
+    while True:
+        with db_transaction.atomic():
+            wallet_ids = list(pending.filter(pk__gt=cursor)[:chunk_size])
+            if not wallet_ids:
+                break
+            Wallet.objects.filter(pk__in=wallet_ids).update(
+                balance=F('balance') + amount,
+                updated_at=timezone.now(),
+            )
+            Transaction.objects.bulk_create([
+                Transaction(wallet_id=wallet_id, amount=amount, transaction_type='DEPOSIT', description=description,
+                            campaign=campaign, external_id=f"{campaign}:{wallet_id}")
+                for wallet_id in wallet_ids
+            ])
+        cursor = wallet_ids[-1]
+        credited += len(wallet_ids)
+
+    return credited, amount * credited
+
+
+def _create_transactions(transaction_type, rows):
+    Transaction.objects.bulk_create([
+        Transaction(wallet_id=wallet_id, amount=amount, transaction_type=transaction_type, description=description)
+        for wallet_id, amount, description in rows
+    ])
+
+
+# --- DUYỆT YÊU CẦU NẠP / RÚT THEO LÔ ---
+# Mỗi lô yêu cầu là một transaction: khóa và đọc mọi ví liên quan bằng MỘT
+# câu SELECT, cập nhật số dư của mọi ví bằng MỘT câu UPDATE (CASE theo tổng
+# tiền của từng ví; rút tiền thêm điều kiện balance >= tổng), ghi giao dịch
+# bằng bulk_create và đổi trạng thái yêu cầu bằng một UPDATE cho mỗi trạng thái.
+#
+# Kết quả trả về là danh sách (id yêu cầu, username, trạng thái, ghi chú)
+# cho từng yêu cầu đã xử lý. Lô bị lỗi thì ném ApprovalInterrupted kèm kết
+# quả của các lô đã commit trước nó.
+APPROVAL_BATCH_SIZE = 500
+
+
+def approve_deposit_requests(requests, batch_size=APPROVAL_BATCH_SIZE):
+    """Duyệt các yêu cầu nạp PENDING trong queryset `requests`."""
+
+    def process(rows, wallet_by_user):
+        outcomes = []
+        entries_by_wallet = defaultdict(list)
+        approved_ids = []
+        for request_id, user_id, username, amount in rows:
+            if user_id not in wallet_by_user:
+                outcomes.append((request_id, username, 'SKIPPED', "Không tìm thấy ví."))
+                continue
+            entries_by_wallet[wallet_by_user[user_id][0]].append(
+                (amount, f"Admin duyệt yêu cầu nạp tiền #{request_id}")
+            )
+            approved_ids.append(request_id)
+            outcomes.append((request_id, username, 'APPROVED', f"+{amount:,.0f}đ"))
+
+        if entries_by_wallet:
+            credit_wallets('DEPOSIT', entries_by_wallet)
+        _mark_requests(DepositRequest, approved_ids, 'APPROVED')
+        return outcomes
+
+    return _process_request_batches(DepositRequest, requests, batch_size, process)
+
+
+def approve_withdrawal_requests(requests, batch_size=APPROVAL_BATCH_SIZE):
+    """
+    Duyệt các yêu cầu rút PENDING trong queryset `requests` (admin đã chuyển
+    tiền). Số dư được đọc khi ví đang bị khóa; các yêu cầu của cùng một ví
+    được xét theo thứ tự id, yêu cầu nào vượt số dư còn lại thì bị từ chối.
+    """
+
+    def process(rows, wallet_by_user):
+        outcomes = []
+        remaining = {user_id: balance for user_id, (_, balance) in wallet_by_user.items()}
+        entries_by_wallet = defaultdict(list)
+        approved_ids, rejected_ids = [], []
+        for request_id, user_id, username, amount in rows:
+            if user_id not in wallet_by_user:
+                outcomes.append((request_id, username, 'SKIPPED', "Không tìm thấy ví."))
+                continue
+            if remaining[user_id] < amount:
+                rejected_ids.append(request_id)
+                outcomes.append((request_id, username, 'REJECTED',
+                                 f"Không đủ số dư (cần {amount:,.0f}đ, có {remaining[user_id]:,.0f}đ)."))
+                continue
+            remaining[user_id] -= amount
+            entries_by_wallet[wallet_by_user[user_id][0]].append(
+                (amount, f"Admin duyệt yêu cầu rút tiền #{request_id}")
+            )
+            approved_ids.append(request_id)
+            outcomes.append((request_id, username, 'APPROVED', f"-{amount:,.0f}đ"))
+
+        _debit_wallets('WITHDRAW', entries_by_wallet)
+        _mark_requests(WithdrawalRequest, approved_ids, 'APPROVED')
+        _mark_requests(WithdrawalRequest, rejected_ids, 'REJECTED')
+        return outcomes
+
+    return _process_request_batches(WithdrawalRequest, requests, batch_size, process)
+
+
+def _process_request_batches(model, requests, batch_size, process):
+    """
+    Gọi process(các dòng yêu cầu PENDING, {user_id: (wallet_id, số dư)}) cho
+    từng lô `batch_size` yêu cầu. Mỗi lô là một transaction; yêu cầu và ví bị
+    khóa (SELECT ... FOR UPDATE) cho tới khi lô xong. Lô bị lỗi được
+    rollback và ném ApprovalInterrupted kèm kết quả của các lô đã commit.
+    """
+    pending = requests.filter(status='PENDING').order_by('pk')
+    outcomes = []
+    cursor = 0
+    while True:
+        try:
+            with db_transaction.atomic():
+                request_ids = list(pending.filter(pk__gt=cursor).values_list('pk', flat=True)[:batch_size])
+                if not request_ids:
+                    return outcomes
+                # Đọc lại trạng thái khi đã khóa: yêu cầu có thể vừa được xử lý ở nơi khác
+                rows = list(
+                    model.objects.select_for_update()
+                    .filter(pk__in=request_ids, status='PENDING')
+                    .order_by('pk')
+                    .values_list('pk', 'user_id', 'user__username', 'amount')
+                )
+                wallet_by_user = {
+                    user_id: (wallet_id, balance)
+                    for user_id, wallet_id, balance in Wallet.objects.select_for_update()
+                    .filter(user_id__in={row[1] for row in rows})
+                    .values_list('user_id', 'pk', 'balance')
+                }
+                batch_outcomes = process(rows, wallet_by_user)
+        except Exception as e:
+            raise ApprovalInterrupted(e, outcomes) from e
+        outcomes.extend(batch_outcomes)
+        cursor = request_ids[-1]
+
+
+def _debit_wallets(transaction_type, entries_by_wallet):
+    """
+    Trừ tiền nhiều ví bằng MỘT câu UPDATE ... WHERE balance >= tổng của từng
+    ví (CASE như credit_wallets). Ném InsufficientBalance (hủy cả lô) nếu có
+    ví không đủ số dư.
+    """
+    totals = _wallet_totals(entries_by_wallet)
+    if not totals:
+        return
+
+    amount = _amount_case(totals)
+    updated = Wallet.objects.filter(pk__in=totals, balance__gte=amount).update(
+        balance=F('balance') - amount, updated_at=timezone.now(),
+    )
+    if updated != len(totals):
+        raise InsufficientBalance(f"{len(totals) - updated}/{len(totals)} ví không đủ số dư.")
+
+    _create_transactions(transaction_type, [
+        (wallet_id, amount, description)
+        for wallet_id, entries in entries_by_wallet.items()
+        for amount, description in entries
+    ])
+
+
+def _mark_requests(model, request_ids, status):
+    if request_ids:
+        model.objects.filter(pk__in=request_ids).update(status=status, processed_at=timezone.now())
+
+
+# --- CHECKPOINT SỐ DƯ ---
+# Số dư tại một thời điểm được suy ra từ checkpoint gần nhất cộng một đoạn
+# giao dịch ngắn, thay vì cộng toàn bộ lịch sử của ví.
+CHECKPOINT_BATCH_SIZE = 1000
+
+
+def signed_amount():
+    """Biểu thức SQL: +amount với giao dịch cộng tiền, -amount với giao dịch trừ tiền."""
+    return Case(
+        When(transaction_type__in=Transaction.DEBIT_TYPES, then=-F('amount')),
+        default=F('amount'),
+        output_field=DecimalField(max_digits=16, decimal_places=2),
+    )
+
+
+def _signed_total(transactions):
+    return transactions.aggregate(total=Sum(signed_amount()))['total'] or Decimal('0.00')
+
+
+def balance_as_of(wallet_id, at):
+    """
+    Số dư của ví tại thời điểm `at`:
+    - có checkpoint trước `at`: checkpoint đó + giao dịch sau nó tới `at`;
+    - không có: lùi từ checkpoint đầu tiên sau `at` (hoặc số dư hiện tại
+      nếu ví chưa có checkpoint) trừ các giao dịch sau `at`.
+    """
+    transactions = Transaction.objects.filter(wallet_id=wallet_id)
+    checkpoints = WalletCheckpoint.objects.filter(wallet_id=wallet_id)
+
+    before = checkpoints.filter(taken_at__lte=at).order_by('-taken_at', '-id').first()
+    if before is not None:
+        return before.balance + _signed_total(
+            transactions.filter(id__gt=before.last_transaction_id, timestamp__lte=at)
+        )
+
+    after = checkpoints.filter(taken_at__gt=at).order_by('taken_at', 'id').first()
+    if after is not None:
+        return after.balance - _signed_total(
+            transactions.filter(id__lte=after.last_transaction_id, timestamp__gt=at)
+        )
+
+    balance = Wallet.objects.filter(pk=wallet_id).values_list('balance', flat=True).get()
+    return balance - _signed_total(transactions.filter(timestamp__gt=at))
+
+
+def write_checkpoints(batch_size=CHECKPOINT_BATCH_SIZE):
+    """
+    Ghi checkpoint cho mọi ví đã thay đổi kể từ checkpoint gần nhất của nó
+    (có giao dịch mới hoặc updated_at mới hơn), theo từng lô pk. Mỗi lô
+    đọc số dư và ID giao dịch cuối trong cùng một transaction nên ảnh chụp
+    nhất quán. Trả về (số ví đã xét, số checkpoint đã ghi, số ví lệch sổ).
+    """
+    latest = WalletCheckpoint.objects.filter(wallet=OuterRef('pk')).order_by('-taken_at', '-id')
+    wallets = Wallet.objects.annotate(
+        checkpoint_tx=Subquery(latest.values('last_transaction_id')[:1]),
+        checkpoint_balance=Subquery(latest.values('balance')[:1]),
+        checkpoint_at=Subquery(latest.values('taken_at')[:1]),
+        last_tx=Coalesce(Subquery(
+            Transaction.objects.filter(wallet=OuterRef('pk')).order_by('-id').values('id')[:1]
+        ), 0),
+        tail=Subquery(
+            Transaction.objects.filter(wallet=OuterRef('pk'), id__gt=OuterRef('checkpoint_tx'))
+            .order_by().values('wallet').annotate(total=Sum(signed_amount())).values('total')
+        ),
+    ).order_by('pk')
+
+    scanned = written = drifted = 0
+    cursor = 0
+    while True:
+        with db_transaction.atomic():
+            batch = list(
+                wallets.filter(pk__gt=cursor).values(
+                    'pk', 'balance', 'updated_at', 'checkpoint_tx', 'checkpoint_balance', 'checkpoint_at',
+                    'last_tx', 'tail',
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            cursor = batch[-1]['pk']
+            now = timezone.now()
+
+            checkpoints = []
+            for row in batch:
+                first = row['checkpoint_at'] is None
+                if not first and row['last_tx'] == row['checkpoint_tx'] and row['updated_at'] <= row['checkpoint_at']:
+                    continue
+
+                derived = None if first else row['checkpoint_balance'] + (row['tail'] or Decimal('0.00'))
+                if derived is not None and derived != row['balance']:
+                    drifted += 1
+                checkpoints.append(WalletCheckpoint(
+                    wallet_id=row['pk'], balance=row['balance'], last_transaction_id=row['last_tx'],
+                    derived_balance=derived, taken_at=now,
+                ))
+            WalletCheckpoint.objects.bulk_create(checkpoints)
+
+        scanned += len(batch)
+        written += len(checkpoints)
+
+    return scanned, written, drifted
@@ -0,0 +1,60 @@
+import time
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from wallet.logic import BULK_DEPOSIT_CHUNK_SIZE, bulk_deposit
+from wallet.models import Transaction, Wallet
+
+
+class Command(BaseCommand):
+    help = ("Nạp cùng một số tiền cho TẤT CẢ ví (khuyến mãi). Chạy lại với cùng --campaign "
+            "sẽ bỏ qua các ví đã được nạp.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--amount', required=True, help="Số tiền nạp cho mỗi ví.")
+        parser.add_argument('--description', default='Khuyến mãi', help="Nội dung giao dịch.")
+        parser.add_argument(
+            '--campaign',
+            help="Mã đợt nạp (tối đa 80 ký tự, lưu vào cột campaign). Mặc định: sinh ngẫu nhiên.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BULK_DEPOSIT_CHUNK_SIZE,
+            help=f"Số ví mỗi transaction. Mặc định: {BULK_DEPOSIT_CHUNK_SIZE}.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Chỉ in số ví và tổng tiền, không nạp.")
+
+    def handle(self, *args, **options):
+        try:
+            amount = Decimal(options['amount'])
+        except InvalidOperation:
+            raise CommandError("--amount không hợp lệ.")
+        if amount <= 0:
+            raise CommandError("--amount phải > 0.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size phải >= 1.")
+
+        campaign = options['campaign'] or f"campaign-{uuid.uuid4().hex[:12]}"
+        if len(campaign) > Transaction._meta.get_field('campaign').max_length:
+            raise CommandError("--campaign quá dài (tối đa 80 ký tự).")
+        wallets = Wallet.objects.all()
+
+        if options['dry_run']:
+            count = wallets.count()
+            balance_total = wallets.aggregate(total=Sum('balance'))['total'] or Decimal('0.00')
+            self.stdout.write(
+                f"{count} ví (tổng số dư {balance_total:,.0f}đ) x {amount:,.0f}đ = {amount * count:,.0f}đ."
+            )
+            return
+
+        started = time.perf_counter()
+        count, total = bulk_deposit(wallets, amount, options['description'], campaign, options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đợt {campaign}: đã nạp {amount:,.0f}đ cho {count} ví, tổng {total:,.0f}đ ({elapsed:.2f}s)."
+        ))
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.logic import CHECKPOINT_BATCH_SIZE, write_checkpoints
+
+
+class Command(BaseCommand):
+    help = ("Ghi checkpoint số dư (số dư + ID giao dịch cuối) cho mọi ví đã thay đổi kể từ "
+            "checkpoint trước. Nên chạy định kỳ (cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=CHECKPOINT_BATCH_SIZE,
+            help=f"Số ví mỗi transaction. Mặc định: {CHECKPOINT_BATCH_SIZE}.",
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size phải >= 1.")
+
+        started = time.perf_counter()
+        scanned, written, drifted = write_checkpoints(options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xét {scanned} ví, ghi {written} checkpoint ({elapsed:.2f}s)."
+        ))
+        if drifted:
+            self.stdout.write(self.style.WARNING(
+                f"{drifted} ví có số dư lệch với sổ giao dịch (xem derived_balance trong admin)."
+            ))
@@ -0,0 +1,45 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from DjangoProject.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, TRANSACTION_EXPORT_FIELDS, write_export
+from wallet.models import Transaction
+
+
+class Command(BaseCommand):
+    help = ("Xuất giao dịch ví ra CSV hoặc JSON Lines (tùy chọn nén gzip), đọc từng khối theo id nên bộ nhớ "
+            "không đổi. Bị dừng giữa chừng thì chạy lại với --after-id.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-date', type=str, help="Ngày đầu (YYYY-MM-DD, giờ địa phương). Mặc định: hôm nay.")
+        parser.add_argument('--to-date', type=str, help="Ngày cuối (YYYY-MM-DD). Mặc định: bằng --from-date.")
+        parser.add_argument('--type', choices=[code for code, _ in Transaction.TRANSACTION_TYPES])
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true', help="Nén gzip ngay khi ghi.")
+        parser.add_argument('--output', '-o', type=str, help="File đích. Mặc định: stdout.")
+        parser.add_argument('--after-id', type=int, default=0, help="Chỉ xuất giao dịch có id lớn hơn (chạy tiếp).")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            date_from = (datetime.datetime.strptime(options['from_date'], '%Y-%m-%d').date()
+                         if options['from_date'] else timezone.localdate())
+            date_to = (datetime.datetime.strptime(options['to_date'], '%Y-%m-%d').date()
+                       if options['to_date'] else date_from)
+        except ValueError:
+            raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        if date_from > date_to:
+            raise CommandError("--from-date phải trước hoặc bằng --to-date.")
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size phải >= 1.")
+
+        # Khoảng [00:00 ngày đầu, 00:00 ngày sau ngày cuối) theo giờ địa phương
+        tz = timezone.get_current_timezone()
+        start = datetime.datetime.combine(date_from, datetime.time.min, tzinfo=tz)
+        end = datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz)
+        transactions = Transaction.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        if options['type']:
+            transactions = transactions.filter(transaction_type=options['type'])
+
+        write_export(transactions, TRANSACTION_EXPORT_FIELDS, options, self.stderr)
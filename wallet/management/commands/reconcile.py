@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from lottery.archive import archived_bet_totals
+from wallet.reconcile import format_diff, reconcile_range, split_archived_totals, wallet_id_ranges
+
+
+def _init_worker():
+    # Tiến trình con (fork) không được dùng lại kết nối DB của tiến trình cha;
+    # với 'spawn' thì cần setup Django trước.
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    connections.close_all()
+
+
+def _reconcile_range(bounds, max_diffs, archived):
+    """Đối soát một khoảng wallet id (chạy trong tiến trình worker)."""
+    started = time.perf_counter()
+    stats = reconcile_range(*bounds, max_diffs=max_diffs, archived=archived)
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+class Command(BaseCommand):
+    help = ("Đối soát toàn bộ ví với sổ giao dịch, vé cược và yêu cầu nạp/rút trong một lượt đọc "
+            "theo luồng; các khoảng wallet id được chia cho nhiều tiến trình.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Số tiến trình đối soát song song')
+        parser.add_argument('--parts', type=int, default=None,
+                            help='Số khoảng wallet id (mặc định: 4 x số worker)')
+        parser.add_argument('--max-diffs', type=int, default=50,
+                            help='Số ví lệch tối đa được in ra (mỗi khoảng)')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        parts = options['parts'] or workers * 4
+        if parts < 1:
+            raise CommandError("--parts phải >= 1.")
+
+        ranges = wallet_id_ranges(parts)
+        if not ranges:
+            self.stdout.write(self.style.WARNING("Chưa có ví nào."))
+            return
+
+        started = time.perf_counter()
+        # Đọc lưu trữ vé MỘT lần (mỗi file tháng một lần), rồi mỗi khoảng chỉ
+        # nhận tổng của các user trong khoảng (không gửi cả dict cho mọi worker)
+        archived = split_archived_totals(archived_bet_totals(), ranges)
+        if workers == 1:
+            results = [
+                _reconcile_range(bounds, options['max_diffs'], part) for bounds, part in zip(ranges, archived)
+            ]
+        else:
+            # Đóng kết nối trước khi fork để tiến trình con tự mở kết nối riêng
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                results = list(pool.map(
+                    _reconcile_range, ranges, [options['max_diffs']] * len(ranges), archived,
+                ))
+        elapsed = time.perf_counter() - started
+
+        totals = {key: sum(result[key] for result in results)
+                  for key in ('wallets', 'transactions', 'bets', 'mismatched_wallets', 'orphan_groups')}
+        rows = totals['wallets'] + totals['transactions'] + totals['bets']
+
+        for result in results:
+            for diff in result['diffs']:
+                self.stdout.write(format_diff(diff))
+
+        self.stdout.write(
+            f"Đã đối soát {totals['wallets']} ví, {totals['transactions']} giao dịch, {totals['bets']} vé "
+            f"trong {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} dòng/giây, "
+            f"{len(ranges)} khoảng, {workers} worker)."
+        )
+        if totals['orphan_groups']:
+            self.stdout.write(self.style.WARNING(
+                f"{totals['orphan_groups']} nhóm dòng không thuộc ví nào trong khoảng đối soát."
+            ))
+        if totals['mismatched_wallets']:
+            raise CommandError(f"{totals['mismatched_wallets']} ví không khớp.")
+        self.stdout.write(self.style.SUCCESS("Không có sai lệch."))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wallet.rollups import ROLLUP_BATCH_SIZE, roll_up_transactions
+
+
+class Command(BaseCommand):
+    help = ("Cộng các giao dịch mới (sau mốc) vào bảng tổng hợp theo ngày WalletDailyRollup. "
+            "Nên chạy định kỳ (cron).")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ROLLUP_BATCH_SIZE,
+            help=f"Số giao dịch mỗi transaction. Mặc định: {ROLLUP_BATCH_SIZE}.",
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size phải >= 1.")
+
+        started = time.perf_counter()
+        processed, written, mark = roll_up_transactions(options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã cộng {processed} giao dịch vào {written} dòng tổng hợp, mốc mới: GD #{mark} ({elapsed:.2f}s)."
+        ))
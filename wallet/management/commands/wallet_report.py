@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from wallet.models import Transaction
+from wallet.rollups import daily_totals
+
+
+class Command(BaseCommand):
+    help = "Báo cáo vận hành: tổng nạp/cược/thắng/rút/hoàn theo ngày, đọc từ bảng tổng hợp theo ngày."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-date', type=str, help="Ngày đầu (YYYY-MM-DD). Mặc định: đầu tháng này.")
+        parser.add_argument('--to-date', type=str, help="Ngày cuối (YYYY-MM-DD). Mặc định: hôm nay.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            date_from = (datetime.datetime.strptime(options['from_date'], '%Y-%m-%d').date()
+                         if options['from_date'] else today.replace(day=1))
+            date_to = (datetime.datetime.strptime(options['to_date'], '%Y-%m-%d').date()
+                       if options['to_date'] else today)
+        except ValueError:
+            raise CommandError("Định dạng ngày không hợp lệ. Phải là YYYY-MM-DD.")
+        if date_from > date_to:
+            raise CommandError("--from-date phải trước hoặc bằng --to-date.")
+
+        types = [code for code, _ in Transaction.TRANSACTION_TYPES]
+        totals = daily_totals(date_from, date_to)
+
+        self.stdout.write("Ngày        " + "".join(f"{code:>18}" for code in types))
+        for day in sorted({day for day, _ in totals}):
+            cells = [totals.get((day, code), {}).get('total') for code in types]
+            self.stdout.write(f"{day}  " + "".join(f"{cell:>18,.0f}" if cell is not None else f"{'-':>18}" for cell in cells))
+
+        grand = {code: sum((entry['total'] for (_, t), entry in totals.items() if t == code), 0) for code in types}
+        self.stdout.write("Tổng        " + "".join(f"{grand[code]:>18,.0f}" for code in types))
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:13
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0003_withdrawalrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('last_transaction_id', models.PositiveBigIntegerField(default=0)),
+                ('derived_balance', models.DecimalField(blank=True, decimal_places=2, help_text='Số dư suy ra từ checkpoint trước và sổ giao dịch (trống ở checkpoint đầu tiên)', max_digits=12, null=True)),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='wallet.wallet')),
+            ],
+            options={
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['wallet', 'taken_at'], name='wallet_checkpoint_taken_idx')],
+            },
+        ),
+    ]
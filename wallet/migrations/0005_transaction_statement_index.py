@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0004_walletcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'timestamp', 'id'], name='wallet_tx_statement_idx'),
+        ),
+    ]
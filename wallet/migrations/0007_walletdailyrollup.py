@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:25
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0006_request_status_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_transaction_id', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='WalletDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('DEPOSIT', 'Nạp tiền'), ('WITHDRAW', 'Rút tiền'), ('BET', 'Đặt cược'), ('WIN', 'Thắng cược'), ('REFUND', 'Hoàn tiền')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='wallet.wallet')),
+            ],
+            options={
+                'ordering': ['-day', 'transaction_type'],
+                'indexes': [models.Index(fields=['day', 'transaction_type'], name='wallet_rollup_day_idx')],
+                'unique_together': {('wallet', 'day', 'transaction_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:01
+
+from django.db import migrations, models
+from django.db.models import CharField, F, Value
+from django.db.models.functions import Cast, Concat, Length
+
+
+def move_campaign_tags(apps, schema_editor):
+    """
+    bulk_deposit từng ghi mã đợt vào external_id (giao dịch DEPOSIT duy nhất
+    có external_id): chuyển sang cột campaign, external_id = "<đợt>:<ví>".
+    """
+    Transaction = apps.get_model('wallet', 'Transaction')
+    Transaction.objects.annotate(tag_length=Length('external_id')).filter(
+        transaction_type='DEPOSIT', external_id__isnull=False, campaign__isnull=True, tag_length__lte=80,
+    ).update(
+        campaign=F('external_id'),
+        external_id=Concat(F('external_id'), Value(':'), Cast('wallet_id', CharField())),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0008_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='campaign',
+            field=models.CharField(blank=True, max_length=80, null=True, verbose_name='Đợt nạp'),
+        ),
+        migrations.RunPython(move_campaign_tags, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='transaction',
+            unique_together={('wallet', 'campaign')},
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0009_transaction_campaign'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='depositrequest',
+            name='transaction_code',
+            field=models.CharField(blank=True, db_index=True, help_text='Nhập mã giao dịch ngân hàng hoặc nội dung chuyển khoản', max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='withdrawalrequest',
+            name='account_number',
+            field=models.CharField(db_index=True, max_length=50, verbose_name='Số tài khoản'),
+        ),
+    ]
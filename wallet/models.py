@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from decimal import Decimal
 
 class Wallet(models.Model):
@@ -34,6 +35,9 @@ class Transaction(models.Model):
         ('WIN', 'Thắng cược'),
         ('REFUND', 'Hoàn tiền'),
     ]
+    # Số tiền luôn được ghi dương; chiều cộng/trừ suy ra từ loại giao dịch
+    CREDIT_TYPES = ('DEPOSIT', 'WIN', 'REFUND')
+    DEBIT_TYPES = ('WITHDRAW', 'BET')
 
     wallet = models.ForeignKey(
         Wallet,
@@ -46,14 +50,99 @@ class Transaction(models.Model):
     description = models.CharField(max_length=255, blank=True, null=True)
     # Mã giao dịch từ bên thứ 3 (cổng thanh toán, nhà cung cấp game)
     external_id = models.CharField(max_length=100, blank=True, null=True, db_index=True)
+    # Mã đợt nạp hàng loạt (khuyến mãi): mỗi ví nhận tối đa một giao dịch mỗi đợt
+    campaign = models.CharField(max_length=80, blank=True, null=True, verbose_name="Đợt nạp")
 
     class Meta:
         ordering = ['-timestamp']
+        unique_together = ['wallet', 'campaign']
+        indexes = [
+            # Sao kê: phân trang theo con trỏ (timestamp, id) trong một ví
+            models.Index(fields=['wallet', 'timestamp', 'id'], name='wallet_tx_statement_idx'),
+            # Admin: date_hierarchy (MIN/MAX, lọc theo khoảng thời gian)
+            models.Index(fields=['timestamp'], name='wallet_tx_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.transaction_type}] {self.amount} cho {self.wallet.user.username}"
 
 
+class WalletCheckpoint(models.Model):
+    """
+    Ảnh chụp số dư của một ví tại một thời điểm, kèm ID giao dịch cuối cùng
+    đã nằm trong số dư đó. Số dư tại thời điểm bất kỳ = checkpoint gần nhất
+    + các giao dịch sau nó (xem wallet.logic.balance_as_of).
+
+    derived_balance = checkpoint trước + các giao dịch ở giữa; nếu khác
+    balance thì số dư ví đã bị đổi ngoài sổ giao dịch.
+    """
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name='checkpoints'
+    )
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    last_transaction_id = models.PositiveBigIntegerField(default=0)
+    derived_balance = models.DecimalField(
+        max_digits=12, decimal_places=2, blank=True, null=True,
+        help_text="Số dư suy ra từ checkpoint trước và sổ giao dịch (trống ở checkpoint đầu tiên)"
+    )
+    taken_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['wallet', 'taken_at'], name='wallet_checkpoint_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"Checkpoint ví #{self.wallet_id} lúc {self.taken_at}: {self.balance}"
+
+    @property
+    def drift(self):
+        if self.derived_balance is None:
+            return None
+        return self.balance - self.derived_balance
+
+
+class WalletDailyRollup(models.Model):
+    """
+    Tổng giao dịch của một ví trong một ngày (giờ địa phương) theo loại giao
+    dịch. Do lệnh `rollup_transactions` cộng dồn từ các giao dịch sau mốc
+    RollupWatermark (xem wallet.rollups).
+    """
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name='daily_rollups'
+    )
+    day = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'transaction_type']
+        unique_together = ['wallet', 'day', 'transaction_type']
+        indexes = [
+            # Báo cáo vận hành: mọi ví trong một khoảng ngày
+            models.Index(fields=['day', 'transaction_type'], name='wallet_rollup_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"Ví #{self.wallet_id} ngày {self.day} [{self.transaction_type}]: {self.total} ({self.count} GD)"
+
+
+class RollupWatermark(models.Model):
+    """Mốc của một bảng tổng hợp: mọi giao dịch có id <= last_transaction_id đã được cộng."""
+    name = models.CharField(max_length=50, unique=True)
+    last_transaction_id = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: GD #{self.last_transaction_id}"
+
+
 # ... (Giữ nguyên model Wallet và Transaction) ...
 
 class DepositRequest(models.Model):
@@ -79,6 +168,7 @@ class DepositRequest(models.Model):
         max_length=100,
         blank=True,
         null=True,
+        db_index=True,  # Admin: tìm theo mã giao dịch
         help_text="Nhập mã giao dịch ngân hàng hoặc nội dung chuyển khoản"
     )
 
@@ -88,6 +178,11 @@ class DepositRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Admin: lọc theo trạng thái (PENDING), mới nhất trước
+            models.Index(fields=['status', 'created_at'], name='wallet_deposit_status_idx'),
+            models.Index(fields=['created_at'], name='wallet_deposit_created_idx'),
+        ]
 
     def __str__(self):
         return f"[Yêu cầu] {self.user.username} - {self.amount}đ - {self.get_status_display()}"
@@ -116,6 +211,7 @@ class WithdrawalRequest(models.Model):
     )
     account_number = models.CharField(
         max_length=50,
+        db_index=True,  # Admin: tìm theo số tài khoản
         verbose_name="Số tài khoản"
     )
     # --- KẾT THÚC ---
@@ -130,6 +226,10 @@ class WithdrawalRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='wallet_withdraw_status_idx'),
+            models.Index(fields=['created_at'], name='wallet_withdraw_created_idx'),
+        ]
 
     def __str__(self):
         return f"[Yêu cầu Rút] {self.user.username} - {self.amount}đ - {self.get_status_display()}"
\ No newline at end of file
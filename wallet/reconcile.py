@@ -0,0 +1,200 @@
+"""
+Đối soát ví / vé cược / giao dịch theo luồng (streaming merge).
+
+Với một khoảng wallet id, năm luồng dữ liệu được đọc theo thứ tự wallet id
+bằng iterator phía server (không nạp cả bảng vào bộ nhớ): Wallet,
+WalletCheckpoint, Transaction, Bet, DepositRequest/WithdrawalRequest. Các
+luồng được ghép theo wallet id trong MỘT lượt, mỗi lúc chỉ giữ dữ liệu của
+một ví, nên bộ nhớ không phụ thuộc số dòng.
+
+Với mỗi ví, kiểm tra:
+- số dư = số dư mở đầu + tổng giao dịch có dấu (số dư mở đầu là checkpoint
+  đầu tiên của ví, hoặc tiền tặng khi đăng ký nếu ví chưa có checkpoint);
+- BET - REFUND = tổng tiền các vé của user; WIN = tổng tiền thắng các vé WON
+  (giao dịch không có khóa ngoại tới vé nên đối chiếu theo tổng của ví),
+  tính cả vé đã chuyển sang lưu trữ (lottery.archive). Tổng theo user của
+  lưu trữ được tính một lần cho cả lượt chạy (archived_bet_totals) rồi
+  chia theo khoảng, mỗi khoảng chỉ nhận tổng của các user trong khoảng;
+- WITHDRAW = tổng yêu cầu rút đã duyệt; DEPOSIT >= tổng yêu cầu nạp đã duyệt
+  (admin có thể nạp tay không qua yêu cầu).
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from decimal import Decimal
+from itertools import groupby
+
+from django.db.models import F, Q
+
+from lottery.archive import archived_bet_totals
+from lottery.models import Bet
+from users.signals import SIGNUP_BONUS
+from .models import DepositRequest, Transaction, Wallet, WalletCheckpoint, WithdrawalRequest
+
+STREAM_CHUNK_SIZE = 5000
+ZERO = Decimal('0.00')
+
+
+def wallet_id_ranges(parts):
+    """Chia [min id, max id] của Wallet thành `parts` khoảng [lo, hi] liên tiếp."""
+    ids = Wallet.objects.order_by('pk').values_list('pk', flat=True)
+    first, last = ids.first(), ids.last()
+    if first is None:
+        return []
+    step = max(1, -(-(last - first + 1) // parts))
+    return [(lo, min(lo + step - 1, last)) for lo in range(first, last + 1, step)]
+
+
+def split_archived_totals(archived, ranges):
+    """
+    Chia kết quả archived_bet_totals() theo các khoảng wallet id [lo, hi] (đã
+    sắp xếp, liên tiếp): trả về một dict cho mỗi khoảng, chỉ gồm các user có
+    ví trong khoảng, để mỗi worker chỉ nhận phần của mình.
+    """
+    parts = [{} for _ in ranges]
+    if not archived:
+        return parts
+    highs = [hi for _, hi in ranges]
+    wallets = Wallet.objects.filter(
+        pk__gte=ranges[0][0], pk__lte=ranges[-1][1],
+    ).values_list('pk', 'user_id').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    for wallet_id, user_id in wallets:
+        if user_id in archived:
+            parts[bisect_left(highs, wallet_id)][user_id] = archived[user_id]
+    return parts
+
+
+def _stream(queryset, key_field, *fields):
+    """Các dòng (khóa, ...) theo thứ tự khóa, gom nhóm theo khóa."""
+    rows = queryset.order_by(key_field, 'pk').values_list(key_field, *fields).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    return groupby(rows, key=lambda row: row[0])
+
+
+class _Cursor:
+    """Con trỏ trên một luồng đã gom nhóm: lấy nhóm của khóa `key` nếu có."""
+
+    def __init__(self, groups):
+        self._groups = groups
+        self._current = next(self._groups, None)
+        self.orphans = 0
+
+    def take(self, key):
+        # Bỏ qua (và đếm) các nhóm có khóa không tồn tại trong luồng Wallet
+        while self._current is not None and self._current[0] < key:
+            self.orphans += 1
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != key:
+            return []
+        rows = list(self._current[1])
+        self._current = next(self._groups, None)
+        return rows
+
+
+def reconcile_range(lo, hi, max_diffs=50, archived=None):
+    """
+    Đối soát các ví có id trong [lo, hi]. Trả về dict thống kê + danh sách lệch.
+    `archived` là tổng lưu trữ của các user trong khoảng (phần của khoảng này
+    trong split_archived_totals()); None thì tự đọc lưu trữ cho các user
+    trong khoảng.
+    """
+    in_range = {'user__wallet__id__gte': lo, 'user__wallet__id__lte': hi}
+
+    wallets = Wallet.objects.filter(pk__gte=lo, pk__lte=hi).order_by('pk').values_list(
+        'pk', 'user_id', 'user__username', 'balance'
+    ).iterator(chunk_size=STREAM_CHUNK_SIZE)
+    if archived is None:
+        archived = archived_bet_totals(
+            Wallet.objects.filter(pk__gte=lo, pk__lte=hi).values_list('user_id', flat=True)
+        )
+    checkpoints = _Cursor(_stream(
+        WalletCheckpoint.objects.filter(wallet_id__gte=lo, wallet_id__lte=hi),
+        'wallet_id', 'balance', 'last_transaction_id', 'taken_at',
+    ))
+    transactions = _Cursor(_stream(
+        Transaction.objects.filter(wallet_id__gte=lo, wallet_id__lte=hi),
+        'wallet_id', 'id', 'transaction_type', 'amount',
+    ))
+    bets = _Cursor(_stream(
+        Bet.objects.filter(**in_range).annotate(wallet_id=F('user__wallet__id')),
+        'wallet_id', 'amount', 'winnings', 'status',
+    ))
+    deposits = _Cursor(_stream(
+        DepositRequest.objects.filter(Q(status='APPROVED'), **in_range).annotate(wallet_id=F('user__wallet__id')),
+        'wallet_id', 'amount',
+    ))
+    withdrawals = _Cursor(_stream(
+        WithdrawalRequest.objects.filter(Q(status='APPROVED'), **in_range).annotate(wallet_id=F('user__wallet__id')),
+        'wallet_id', 'amount',
+    ))
+
+    stats = {'range': [lo, hi], 'wallets': 0, 'transactions': 0, 'bets': 0, 'mismatched_wallets': 0}
+    diffs = []
+
+    for wallet_id, user_id, username, balance in wallets:
+        wallet_checkpoints = checkpoints.take(wallet_id)
+        wallet_transactions = transactions.take(wallet_id)
+        wallet_bets = bets.take(wallet_id)
+
+        problems = check_wallet(
+            balance, wallet_checkpoints, wallet_transactions, wallet_bets,
+            deposits.take(wallet_id), withdrawals.take(wallet_id),
+            archived.get(user_id, (ZERO, ZERO)),
+        )
+
+        stats['wallets'] += 1
+        stats['transactions'] += len(wallet_transactions)
+        stats['bets'] += len(wallet_bets)
+        if problems:
+            stats['mismatched_wallets'] += 1
+            if len(diffs) < max_diffs:
+                diffs.append({'wallet_id': wallet_id, 'username': username, 'problems': problems})
+
+    stats['orphan_groups'] = sum(cursor.orphans for cursor in (checkpoints, transactions, bets))
+    stats['diffs'] = diffs
+    return stats
+
+
+def check_wallet(balance, checkpoints, transactions, bets, deposits, withdrawals, archived=(ZERO, ZERO)):
+    """
+    Các điểm lệch của một ví: danh sách (tên kiểm tra, thực tế, kỳ vọng).
+    `archived` là (tổng tiền cược, tổng tiền thắng) của các vé đã lưu trữ.
+    """
+    totals = defaultdict(lambda: ZERO)
+    for _, _, transaction_type, amount in transactions:
+        totals[transaction_type] += amount
+
+    # Số dư mở đầu: checkpoint đầu tiên (cộng các giao dịch sau nó), hoặc tiền tặng khi đăng ký
+    if checkpoints:
+        _, opening, opening_tx, _ = min(checkpoints, key=lambda row: (row[3], row[2]))
+    else:
+        opening, opening_tx = SIGNUP_BONUS, 0
+    expected_balance = opening
+    for _, transaction_id, transaction_type, amount in transactions:
+        if transaction_id > opening_tx:
+            expected_balance += -amount if transaction_type in Transaction.DEBIT_TYPES else amount
+
+    staked = sum((amount for _, amount, _, _ in bets), archived[0])
+    won = sum((winnings for _, _, winnings, status in bets if status == 'WON'), archived[1])
+    approved_deposits = sum((amount for _, amount in deposits), ZERO)
+    approved_withdrawals = sum((amount for _, amount in withdrawals), ZERO)
+
+    problems = []
+    for name, actual, expected, ok in (
+        ('balance', balance, expected_balance, balance == expected_balance),
+        ('bet_minus_refund', totals['BET'] - totals['REFUND'], staked, totals['BET'] - totals['REFUND'] == staked),
+        ('win', totals['WIN'], won, totals['WIN'] == won),
+        ('withdraw', totals['WITHDRAW'], approved_withdrawals, totals['WITHDRAW'] == approved_withdrawals),
+        ('deposit', totals['DEPOSIT'], approved_deposits, totals['DEPOSIT'] >= approved_deposits),
+    ):
+        if not ok:
+            problems.append({'check': name, 'actual': str(actual), 'expected': str(expected)})
+    return problems
+
+
+def format_diff(diff):
+    """Một dòng diff gọn cho một ví lệch."""
+    parts = [
+        f"{problem['check']}: {Decimal(problem['actual']):,.2f} != {Decimal(problem['expected']):,.2f} "
+        f"(Δ {Decimal(problem['actual']) - Decimal(problem['expected']):+,.2f})"
+        for problem in diff['problems']
+    ]
+    return f"ví #{diff['wallet_id']} ({diff['username']}): " + "; ".join(parts)
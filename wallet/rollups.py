@@ -0,0 +1,171 @@
+"""
+Bảng tổng hợp giao dịch theo ngày: WalletDailyRollup (ví, ngày, loại GD).
+
+`roll_up_transactions` cộng dồn các giao dịch có id lớn hơn mốc
+RollupWatermark, từng lô một, và dời mốc trong cùng transaction. Giao dịch
+mới hơn LAG giây chưa được cộng (giao dịch id nhỏ hơn có thể chưa commit
+xong), nên mốc chỉ tiến tới giao dịch cuối cùng đã đủ cũ.
+
+Các hàm đọc (wallet_totals, daily_totals) cộng bảng tổng hợp với "đuôi"
+giao dịch sau mốc, nên số liệu luôn chính xác tới giao dịch mới nhất mà
+không phải quét toàn bộ lịch sử.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import RollupWatermark, Transaction, WalletDailyRollup
+
+ROLLUP_NAME = 'wallet_daily'
+ROLLUP_BATCH_SIZE = 5000
+ZERO = Decimal('0.00')
+
+
+def rollup_lag():
+    return datetime.timedelta(seconds=getattr(settings, 'WALLET_ROLLUP_LAG_SECONDS', 60))
+
+
+def watermark():
+    """ID giao dịch cuối cùng đã nằm trong bảng tổng hợp."""
+    return (
+        RollupWatermark.objects.filter(name=ROLLUP_NAME).values_list('last_transaction_id', flat=True).first() or 0
+    )
+
+
+def roll_up_transactions(batch_size=ROLLUP_BATCH_SIZE, now=None):
+    """
+    Cộng các giao dịch mới vào WalletDailyRollup. Mỗi lô: một SELECT gom
+    nhóm theo (ví, ngày, loại), một SELECT các dòng tổng hợp hiện có, một
+    bulk upsert và một UPDATE mốc. Trả về (số giao dịch, số lần ghi (upsert)
+    dòng tổng hợp, mốc mới).
+    """
+    cutoff = (now or timezone.now()) - rollup_lag()
+    RollupWatermark.objects.get_or_create(name=ROLLUP_NAME)
+    processed = written = 0
+
+    while True:
+        with db_transaction.atomic():
+            mark = RollupWatermark.objects.select_for_update().get(name=ROLLUP_NAME)
+            candidates = list(
+                Transaction.objects.filter(id__gt=mark.last_transaction_id)
+                .order_by('id').values_list('id', 'timestamp')[:batch_size]
+            )
+            # Dừng ở giao dịch đầu tiên còn quá mới: mốc không được vượt qua nó
+            ready = 0
+            for _, timestamp in candidates:
+                if timestamp >= cutoff:
+                    break
+                ready += 1
+            if not ready:
+                return processed, written, mark.last_transaction_id
+            upper = candidates[ready - 1][0]
+
+            groups = (
+                Transaction.objects.filter(id__gt=mark.last_transaction_id, id__lte=upper)
+                .annotate(day=TruncDate('timestamp'))
+                .values('wallet_id', 'day', 'transaction_type')
+                .annotate(total=Sum('amount'), count=Count('id'))
+                .order_by()
+            )
+            increments = {(row['wallet_id'], row['day'], row['transaction_type']): row for row in groups}
+
+            existing = {
+                (row.wallet_id, row.day, row.transaction_type): row
+                for row in WalletDailyRollup.objects.filter(
+                    wallet_id__in={key[0] for key in increments},
+                    day__in={key[1] for key in increments},
+                )
+            }
+            rows = []
+            for key, increment in increments.items():
+                current = existing.get(key)
+                rows.append(WalletDailyRollup(
+                    wallet_id=key[0], day=key[1], transaction_type=key[2],
+                    total=(current.total if current else ZERO) + increment['total'],
+                    count=(current.count if current else 0) + increment['count'],
+                ))
+            WalletDailyRollup.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=['wallet', 'day', 'transaction_type'],
+                update_fields=['total', 'count'],
+            )
+
+            mark.last_transaction_id = upper
+            mark.save(update_fields=['last_transaction_id', 'updated_at'])
+
+        processed += ready
+        written += len(rows)
+        if ready < len(candidates) or len(candidates) < batch_size:
+            return processed, written, upper
+
+
+def _local_bounds(date_from, date_to):
+    tz = timezone.get_current_timezone()
+    start = datetime.datetime.combine(date_from, datetime.time.min, tzinfo=tz)
+    end = datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min, tzinfo=tz)
+    return start, end
+
+
+def wallet_totals(wallet_id, date_from, date_to):
+    """
+    {loại GD: {'total', 'count'}} của một ví trong [date_from, date_to]:
+    tối đa (số ngày x 5) dòng tổng hợp + các giao dịch sau mốc.
+    """
+    totals = defaultdict(lambda: {'total': ZERO, 'count': 0})
+    mark = watermark()
+
+    rolled = (
+        WalletDailyRollup.objects.filter(wallet_id=wallet_id, day__gte=date_from, day__lte=date_to)
+        .values('transaction_type').annotate(total_sum=Sum('total'), count_sum=Sum('count')).order_by()
+    )
+    start, end = _local_bounds(date_from, date_to)
+    tail = (
+        Transaction.objects.filter(wallet_id=wallet_id, timestamp__gte=start, timestamp__lt=end, id__gt=mark)
+        .values('transaction_type').annotate(total_sum=Sum('amount'), count_sum=Count('id')).order_by()
+    )
+    for row in list(rolled) + list(tail):
+        entry = totals[row['transaction_type']]
+        entry['total'] += row['total_sum']
+        entry['count'] += row['count_sum']
+    return dict(totals)
+
+
+def daily_totals(date_from, date_to):
+    """
+    Báo cáo vận hành: {(ngày, loại GD): {'total', 'count', 'wallets'}} trên
+    mọi ví. 'wallets' là số ví có giao dịch loại đó trong ngày (tính trên
+    bảng tổng hợp; giao dịch đuôi chỉ cộng vào total/count).
+    """
+    totals = defaultdict(lambda: {'total': ZERO, 'count': 0, 'wallets': 0})
+    mark = watermark()
+
+    rolled = (
+        WalletDailyRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+        .values('day', 'transaction_type')
+        .annotate(total_sum=Sum('total'), count_sum=Sum('count'), wallets=Count('wallet_id'))
+        .order_by()
+    )
+    for row in rolled:
+        entry = totals[(row['day'], row['transaction_type'])]
+        entry['total'] += row['total_sum']
+        entry['count'] += row['count_sum']
+        entry['wallets'] += row['wallets']
+
+    start, end = _local_bounds(date_from, date_to)
+    tail = (
+        Transaction.objects.filter(id__gt=mark, timestamp__gte=start, timestamp__lt=end)
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', 'transaction_type').annotate(total_sum=Sum('amount'), count_sum=Count('id')).order_by()
+    )
+    for row in tail:
+        entry = totals[(row['day'], row['transaction_type'])]
+        entry['total'] += row['total_sum']
+        entry['count'] += row['count_sum']
+    return dict(sorted(totals.items()))
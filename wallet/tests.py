@@ -1,3 +1,562 @@
-from django.test import TestCase
+import csv
+import datetime
+import tempfile
+import threading
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from lottery.archive import archive_bets, read_month_chunks
+from lottery.benchmarks import full_table_scans
+from lottery.logic import place_bet_slip, settle_lottery_result
+from lottery.models import Bet, LotteryResult, LotteryStation
+from users.models import CustomUser
+from .logic import (
+    ApprovalInterrupted, InsufficientBalance, approve_deposit_requests, approve_withdrawal_requests, balance_as_of, bulk_deposit,
+    credit_wallet, credit_wallets, debit_wallet, write_checkpoints,
+)
+from .models import DepositRequest, Transaction, Wallet, WalletCheckpoint, WalletDailyRollup, WithdrawalRequest
+from .reconcile import reconcile_range, split_archived_totals, wallet_id_ranges
+from .rollups import daily_totals, roll_up_transactions, wallet_totals
+
+
+class WalletOperationsTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='vi')
+        self.wallet = self.user.wallet  # signal tạo ví 1,000,000đ
+
+    def test_debit_writes_one_transaction_per_entry(self):
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('1000'), 'số 01'), (Decimal('2000'), 'số 02')])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('997000.00'))
+        self.assertEqual(
+            list(self.wallet.transactions.order_by('amount').values_list('amount', 'transaction_type')),
+            [(Decimal('1000.00'), 'BET'), (Decimal('2000.00'), 'BET')],
+        )
+
+    def test_debit_refuses_overdraft(self):
+        with self.assertRaises(InsufficientBalance):
+            debit_wallet(self.wallet.pk, 'WITHDRAW', [(Decimal('1000000.01'), 'rút quá số dư')])
+
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('1000000.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_credit_wallets_in_bulk(self):
+        other = CustomUser.objects.create(username='vi2').wallet
+        credit_wallets('WIN', {
+            self.wallet.pk: [(Decimal('70000'), 'ĐB'), (Decimal('3478.26'), 'lô')],
+            other.pk: [(Decimal('70000'), 'ĐB')],
+        })
+
+        self.wallet.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('1073478.26'))
+        self.assertEqual(other.balance, Decimal('1070000.00'))
+        self.assertEqual(Transaction.objects.filter(transaction_type='WIN').count(), 3)
+
+    def test_bulk_deposit_in_chunks_is_idempotent_per_campaign(self):
+        for i in range(4):
+            CustomUser.objects.create(username=f'km{i}')
+        wallets = Wallet.objects.all()
+
+        credited, total = bulk_deposit(wallets, Decimal('5000'), 'khuyến mãi', 'km-2024', chunk_size=2)
+        self.assertEqual((credited, total), (5, Decimal('25000')))
+        self.assertEqual(set(wallets.values_list('balance', flat=True)), {Decimal('1005000.00')})
+        deposits = Transaction.objects.filter(transaction_type='DEPOSIT', campaign='km-2024')
+        self.assertEqual(
+            sorted(deposits.values_list('external_id', flat=True)),
+            sorted(f"km-2024:{wallet_id}" for wallet_id in wallets.values_list('pk', flat=True)),
+        )
+
+        # Chạy lại cùng campaign: không nạp trùng
+        self.assertEqual(bulk_deposit(wallets, Decimal('5000'), 'khuyến mãi', 'km-2024', chunk_size=2), (0, 0))
+        self.assertEqual(set(wallets.values_list('balance', flat=True)), {Decimal('1005000.00')})
+
+        # Giao dịch có external_id trùng mã đợt (ví dụ từ cổng thanh toán) không chặn đợt nạp
+        Transaction.objects.create(wallet=self.wallet, amount=Decimal('1'), transaction_type='DEPOSIT',
+                                   external_id='km-2025')
+        self.assertEqual(bulk_deposit(wallets, Decimal('5000'), 'khuyến mãi', 'km-2025')[0], 5)
+
+
+class RequestApprovalTests(TestCase):
+
+    def setUp(self):
+        self.rich = CustomUser.objects.create(username='giau')
+        self.poor = CustomUser.objects.create(username='ngheo')
+        Wallet.objects.filter(user=self.poor).update(balance=Decimal('150000.00'))
+
+    def test_deposits_are_approved_in_batches(self):
+        for user in (self.rich, self.poor, self.rich):
+            DepositRequest.objects.create(user=user, amount=Decimal('50000'))
+        DepositRequest.objects.create(user=self.poor, amount=Decimal('70000'), status='REJECTED')
+
+        outcomes = approve_deposit_requests(DepositRequest.objects.all(), batch_size=2)
+
+        self.assertEqual([status for _, _, status, _ in outcomes], ['APPROVED'] * 3)
+        self.assertEqual(Wallet.objects.get(user=self.rich).balance, Decimal('1100000.00'))
+        self.assertEqual(Wallet.objects.get(user=self.poor).balance, Decimal('200000.00'))
+        self.assertEqual(Transaction.objects.filter(transaction_type='DEPOSIT').count(), 3)
+        self.assertFalse(DepositRequest.objects.filter(status='APPROVED', processed_at__isnull=True).exists())
+        self.assertEqual(DepositRequest.objects.filter(status='REJECTED').count(), 1)
+
+    def test_withdrawals_are_checked_against_the_locked_balance(self):
+        first = WithdrawalRequest.objects.create(user=self.poor, amount=Decimal('100000'))
+        second = WithdrawalRequest.objects.create(user=self.poor, amount=Decimal('100000'))
+        third = WithdrawalRequest.objects.create(user=self.rich, amount=Decimal('100000'))
+
+        outcomes = approve_withdrawal_requests(WithdrawalRequest.objects.all())
+
+        self.assertEqual(
+            [(request_id, status) for request_id, _, status, _ in outcomes],
+            [(first.id, 'APPROVED'), (second.id, 'REJECTED'), (third.id, 'APPROVED')],
+        )
+        self.assertEqual(Wallet.objects.get(user=self.poor).balance, Decimal('50000.00'))
+        self.assertEqual(Wallet.objects.get(user=self.rich).balance, Decimal('900000.00'))
+        self.assertEqual(Transaction.objects.filter(transaction_type='WITHDRAW').count(), 2)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'REJECTED')
+        self.assertIsNotNone(second.processed_at)
+
+    def test_withdrawal_batch_debits_every_wallet_in_one_update(self):
+        users = [CustomUser.objects.create(username=f'rut{i}') for i in range(5)]
+        for i, user in enumerate(users):
+            WithdrawalRequest.objects.create(user=user, amount=Decimal(10000 + i))
+
+        with CaptureQueriesContext(connection) as queries:
+            approve_withdrawal_requests(WithdrawalRequest.objects.all())
+
+        wallet_updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE "wallet_wallet"')]
+        self.assertEqual(len(wallet_updates), 1)
+        self.assertEqual(
+            sorted(Wallet.objects.filter(user__in=users).values_list('balance', flat=True)),
+            [Decimal(1000000 - 10000 - i) for i in reversed(range(5))],
+        )
+
+    def test_failed_batch_keeps_outcomes_of_committed_batches(self):
+        requests = [DepositRequest.objects.create(user=user, amount=Decimal('50000'))
+                    for user in (self.rich, self.poor, self.rich)]
+        real_credit_wallets = credit_wallets
+        calls = []
+
+        def credit_then_fail(*args):
+            calls.append(args)
+            if len(calls) > 1:
+                raise RuntimeError("mất kết nối")
+            return real_credit_wallets(*args)
+
+        with patch('wallet.logic.credit_wallets', side_effect=credit_then_fail):
+            with self.assertRaisesMessage(ApprovalInterrupted, "mất kết nối") as raised:
+                approve_deposit_requests(DepositRequest.objects.all(), batch_size=2)
+
+        self.assertEqual(
+            [(request_id, status) for request_id, _, status, _ in raised.exception.outcomes],
+            [(requests[0].id, 'APPROVED'), (requests[1].id, 'APPROVED')],
+        )
+        self.assertEqual(
+            list(DepositRequest.objects.order_by('pk').values_list('status', flat=True)),
+            ['APPROVED', 'APPROVED', 'PENDING'],
+        )
+        self.assertEqual(Wallet.objects.get(user=self.rich).balance, Decimal('1050000.00'))
+
+        # Trang admin báo cả kết quả của lô đã commit lẫn lỗi
+        self.client.force_login(
+            CustomUser.objects.create_superuser(username='quantri', password='!', email='qt@example.com')
+        )
+        with patch('wallet.admin.approve_deposit_requests', side_effect=raised.exception):
+            response = self.client.post('/admin/wallet/depositrequest/', {
+                'action': 'approve_deposits', 'select_across': '1', 'index': '0', '_selected_action': ['1'],
+            }, follow=True)
+        self.assertEqual(
+            [str(message) for message in response.context['messages']],
+            ["Đã duyệt thành công 2 yêu cầu nạp tiền.",
+             "Gặp lỗi khi duyệt, các yêu cầu còn lại chưa được xử lý: mất kết nối"],
+        )
+
+
+class StatementTests(TestCase):
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='saoke', password='!')
+        self.wallet = self.user.wallet
+        credit_wallets('DEPOSIT', {self.wallet.pk: [(Decimal(i + 1), f"nạp {i}") for i in range(90)]})
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('1'), f"cược {i}") for i in range(30)])
+        # Nhiều giao dịch cùng timestamp: con trỏ phải phân định bằng id
+        Transaction.objects.filter(id__in=Transaction.objects.order_by('id').values('id')[40:80]).update(
+            timestamp=timezone.now()
+        )
+        CustomUser.objects.create(username='khac').wallet.transactions.create(amount=1, transaction_type='DEPOSIT')
+        self.client.force_login(self.user)
+
+    def pages(self, **params):
+        seen, query_counts, cursor = [], [], None
+        while True:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/vi-tien/sao-ke/json/', {**params, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            query_counts.append(len(queries.captured_queries))
+            seen.extend(row['id'] for row in response.json()['results'])
+            cursor = response.json()['next_cursor']
+            if not cursor:
+                return seen, query_counts
+
+    def test_cursor_pages_cover_every_transaction_once_in_order(self):
+        seen, query_counts = self.pages()
+
+        expected = list(self.wallet.transactions.order_by('-timestamp', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(seen), 120)
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_filters_by_type_and_date(self):
+        self.assertEqual(len(self.pages(transaction_type='BET')[0]), 30)
+
+        today = timezone.localdate()
+        self.assertEqual(len(self.pages(date_from=today, date_to=today)[0]), 120)
+        self.assertEqual(self.pages(date_to=today - datetime.timedelta(days=1))[0], [])
+
+        response = self.client.get('/vi-tien/sao-ke/json/', {'date_from': today, 'date_to': today - datetime.timedelta(days=1)})
+        self.assertEqual(response.status_code, 400)
+
+    def test_html_page(self):
+        response = self.client.get('/vi-tien/sao-ke/', {'transaction_type': 'DEPOSIT'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['transactions']), 50)
+        self.assertContains(response, 'transaction_type=DEPOSIT&amp;cursor=')
+
+    def test_out_of_range_cursor_is_treated_as_invalid(self):
+        first_page = self.client.get('/vi-tien/sao-ke/json/').json()['results']
+        for cursor in ('999999999999999999999_1', '1_99999999999999999999999', '253402300800000000_1'):
+            response = self.client.get('/vi-tien/sao-ke/json/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], first_page)
+            self.assertEqual(self.client.get('/vi-tien/sao-ke/', {'cursor': cursor}).status_code, 200)
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN là cú pháp của SQLite")
+class QueryPlanTests(TestCase):
+    """Sao kê và các bộ lọc/thao tác duyệt yêu cầu của admin không quét toàn bảng."""
+
+    HOT_TABLES = {'wallet_transaction', 'wallet_depositrequest', 'wallet_withdrawalrequest'}
+
+    def setUp(self):
+        self.users = [CustomUser.objects.create(username=f'kh{i}') for i in range(10)]
+        for user in self.users:
+            credit_wallet(user.wallet.pk, 'DEPOSIT', [(Decimal('1000'), 'nạp')] * 5)
+            DepositRequest.objects.create(user=user, amount=Decimal('50000'))
+            WithdrawalRequest.objects.create(user=user, amount=Decimal('50000'))
+        self.admin = CustomUser.objects.create_superuser(username='quantri', password='!', email='qt@example.com')
+
+    def assertNoFullScans(self, queries):
+        self.assertEqual(full_table_scans(queries, self.HOT_TABLES), [])
+
+    def test_statement(self):
+        credit_wallet(self.users[0].wallet.pk, 'WIN', [(Decimal('1000'), 'thắng')] * 60)
+        self.client.force_login(self.users[0])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/vi-tien/sao-ke/json/', {'transaction_type': 'WIN'})
+            self.client.get('/vi-tien/sao-ke/', {'cursor': response.json()['next_cursor']})
+        self.assertNoFullScans(queries.captured_queries)
+
+    def test_admin_approval_filters_and_actions(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            for model, action in (('depositrequest', 'approve_deposits'), ('withdrawalrequest', 'approve_withdrawals')):
+                url = f'/admin/wallet/{model}/?status__exact=PENDING'
+                self.assertEqual(self.client.get(url).status_code, 200)
+                self.client.post(url, {'action': action, 'select_across': '1', 'index': '0', '_selected_action': ['1']})
+        self.assertNoFullScans(queries.captured_queries)
+        self.assertFalse(DepositRequest.objects.filter(status='PENDING').exists())
+        self.assertFalse(WithdrawalRequest.objects.filter(status='PENDING').exists())
+
+
+class AdminChangelistTests(TestCase):
+    """Trang danh sách giao dịch/yêu cầu trong admin: số truy vấn cố định khi bảng lớn dần."""
+
+    URLS = ('/admin/wallet/transaction/', '/admin/wallet/depositrequest/', '/admin/wallet/withdrawalrequest/')
+
+    def setUp(self):
+        self.client.force_login(
+            CustomUser.objects.create_superuser(username='quantri', password='!', email='qt@example.com')
+        )
+
+    def add_customers(self, count):
+        start = CustomUser.objects.count()
+        for i in range(start, start + count):
+            user = CustomUser.objects.create(username=f'kh{i}')
+            credit_wallet(user.wallet.pk, 'DEPOSIT', [(Decimal('1000'), 'nạp')] * 3)
+            DepositRequest.objects.create(user=user, amount=Decimal('50000'))
+            WithdrawalRequest.objects.create(user=user, amount=Decimal('50000'))
+
+    def query_counts(self, **params):
+        counts = []
+        for url in self.URLS:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+            counts.append(len(queries.captured_queries))
+        return counts
+
+    def test_query_count_does_not_grow_with_row_count(self):
+        self.add_customers(3)
+        small = self.query_counts()
+        self.add_customers(30)
+        self.assertEqual(self.query_counts(), small)
+        self.assertEqual(self.query_counts(q='kh1'), self.query_counts(q='kh2'))
+
+    def test_username_prefix_search(self):
+        self.add_customers(12)
+        response = self.client.get('/admin/wallet/transaction/', {'q': 'kh1'})
+        usernames = {tx.wallet.user.username for tx in response.context['cl'].result_list}
+        self.assertEqual(usernames, {'kh1', 'kh10', 'kh11', 'kh12'})
+        response = self.client.get('/admin/wallet/depositrequest/', {'q': 'h1'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+    def test_transaction_code_and_account_number_search(self):
+        self.add_customers(3)
+        DepositRequest.objects.filter(user__username='kh1').update(transaction_code='VCB 123456')
+        WithdrawalRequest.objects.filter(user__username='kh2').update(account_number='0071000')
+
+        response = self.client.get('/admin/wallet/depositrequest/', {'q': 'ma:VCB 12'})
+        self.assertEqual([request.user.username for request in response.context['cl'].result_list], ['kh1'])
+        response = self.client.get('/admin/wallet/withdrawalrequest/', {'q': 'stk: 0071000'})
+        self.assertEqual([request.user.username for request in response.context['cl'].result_list], ['kh2'])
+        response = self.client.get('/admin/wallet/withdrawalrequest/', {'q': 'stk:007'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+
+class TransactionExportTests(TestCase):
+
+    def test_export_by_local_day_and_type(self):
+        wallet = CustomUser.objects.create(username='kh').wallet
+        credit_wallet(wallet.pk, 'DEPOSIT', [(Decimal('1000'), 'nạp')] * 3)
+        credit_wallet(wallet.pk, 'WIN', [(Decimal('500'), 'thắng')] * 2)
+        today = timezone.localdate()
+        # 23:30 hôm qua giờ địa phương: không thuộc ngày hôm nay
+        midnight = timezone.make_aware(datetime.datetime.combine(today, datetime.time.min))
+        first_deposit = Transaction.objects.filter(transaction_type='DEPOSIT').order_by('pk').first()
+        Transaction.objects.filter(pk=first_deposit.pk).update(timestamp=midnight - datetime.timedelta(minutes=30))
+
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / 'gd.csv'
+        call_command('export_transactions', type='DEPOSIT', output=str(path), stderr=StringIO())
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual({row['username'] for row in rows}, {'kh'})
+        self.assertEqual({row['amount'] for row in rows}, {'1000.00'})
+
+
+class WalletCheckpointTests(TestCase):
+
+    def setUp(self):
+        self.wallet = CustomUser.objects.create(username='vi').wallet
+        self.idle = CustomUser.objects.create(username='vi2').wallet
+
+    def test_only_changed_wallets_get_new_checkpoints(self):
+        self.assertEqual(write_checkpoints(), (2, 2, 0))
+        self.assertEqual(write_checkpoints(), (2, 0, 0))
+
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('1000'), 'số 01')])
+        credit_wallet(self.wallet.pk, 'WIN', [(Decimal('70000'), 'số 01')])
+        self.assertEqual(write_checkpoints(batch_size=1), (2, 1, 0))
+
+        checkpoint = self.wallet.checkpoints.order_by('-id').first()
+        self.assertEqual(checkpoint.balance, Decimal('1069000.00'))
+        self.assertEqual(checkpoint.derived_balance, checkpoint.balance)
+        self.assertEqual(checkpoint.last_transaction_id, Transaction.objects.latest('id').id)
+
+    def test_balance_edited_outside_the_ledger_is_flagged(self):
+        write_checkpoints()
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=Decimal('5.00'), updated_at=timezone.now())
+
+        self.assertEqual(write_checkpoints(), (2, 1, 1))
+        self.assertEqual(self.wallet.checkpoints.order_by('-id').first().drift, Decimal('-999995.00'))
+
+    def test_balance_as_of_any_time(self):
+        start = timezone.now()
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('1000'), 'a')])
+        after_bet = timezone.now()
+        write_checkpoints()
+        credit_wallet(self.wallet.pk, 'DEPOSIT', [(Decimal('500'), 'b')])
+        after_deposit = timezone.now()
+        debit_wallet(self.wallet.pk, 'WITHDRAW', [(Decimal('200'), 'c')])
+
+        # Trước checkpoint (lùi từ checkpoint), sau checkpoint (checkpoint + đoạn cuối)
+        self.assertEqual(balance_as_of(self.wallet.pk, start), Decimal('1000000.00'))
+        self.assertEqual(balance_as_of(self.wallet.pk, after_bet), Decimal('999000.00'))
+        self.assertEqual(balance_as_of(self.wallet.pk, after_deposit), Decimal('999500.00'))
+        self.assertEqual(balance_as_of(self.wallet.pk, timezone.now()), Decimal('999300.00'))
+        # Ví chưa có checkpoint nào sau thời điểm cần tra
+        WalletCheckpoint.objects.all().delete()
+        self.assertEqual(balance_as_of(self.wallet.pk, start), Decimal('1000000.00'))
+
+
+class WalletRollupTests(TestCase):
+
+    def setUp(self):
+        self.wallet = CustomUser.objects.create(username='vi').wallet
+        self.other = CustomUser.objects.create(username='vi2').wallet
+        self.today = timezone.localdate()
+        self.later = timezone.now() + datetime.timedelta(hours=1)  # mọi giao dịch đã "đủ cũ"
+        credit_wallet(self.wallet.pk, 'DEPOSIT', [(Decimal('50000'), 'a'), (Decimal('20000'), 'b')])
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('1000'), 'c')] * 3)
+        credit_wallet(self.other.pk, 'WIN', [(Decimal('70000'), 'd')])
+
+    def direct_totals(self, wallet):
+        return {
+            row['transaction_type']: {'total': row['total'], 'count': row['count']}
+            for row in wallet.transactions.values('transaction_type').annotate(total=Sum('amount'), count=Count('id'))
+        }
+
+    def test_incremental_rollup_matches_the_ledger(self):
+        self.assertEqual(roll_up_transactions(batch_size=2, now=self.later)[:2], (6, 4))
+        debit_wallet(self.wallet.pk, 'BET', [(Decimal('500'), 'e')])
+        debit_wallet(self.wallet.pk, 'WITHDRAW', [(Decimal('10000'), 'f')])
+        self.assertEqual(roll_up_transactions(now=self.later)[:2], (2, 2))
+        self.assertEqual(roll_up_transactions(now=self.later)[:2], (0, 0))
+
+        self.assertEqual(WalletDailyRollup.objects.count(), 4)
+        self.assertEqual(WalletDailyRollup.objects.get(wallet=self.wallet, transaction_type='BET').count, 4)
+        with self.assertNumQueries(3):
+            totals = wallet_totals(self.wallet.pk, self.today.replace(day=1), self.today)
+        self.assertEqual(totals, self.direct_totals(self.wallet))
+
+    def test_recent_transactions_are_read_from_the_tail(self):
+        roll_up_transactions(now=self.later)
+        credit_wallet(self.wallet.pk, 'REFUND', [(Decimal('1000'), 'g')])
+        # Giao dịch vừa ghi còn trong khoảng trễ: chưa được cộng, nhưng vẫn có trong số liệu
+        self.assertEqual(roll_up_transactions()[:2], (0, 0))
+
+        self.assertEqual(wallet_totals(self.wallet.pk, self.today, self.today), self.direct_totals(self.wallet))
+        report = daily_totals(self.today, self.today)
+        self.assertEqual(report[(self.today, 'REFUND')], {'total': Decimal('1000'), 'count': 1, 'wallets': 0})
+        self.assertEqual(report[(self.today, 'DEPOSIT')], {'total': Decimal('70000'), 'count': 2, 'wallets': 1})
+        self.assertEqual(wallet_totals(self.wallet.pk, self.today - datetime.timedelta(days=1),
+                                       self.today - datetime.timedelta(days=1)), {})
+
+
+class ReconcileTests(TestCase):
+
+    def setUp(self):
+        self.enterContext(override_settings(LOTTERY_ARCHIVE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.user = CustomUser.objects.create(username='vi')
+        self.wallet = self.user.wallet
+        station = LotteryStation.objects.create(name='Đài thử', identifier='dai-thu', prize_count=18)
+        day = timezone.localdate()
+
+        place_bet_slip(self.user, station, 'LO', ['12', '34'], Decimal('1000'), day)
+        write_checkpoints()
+        place_bet_slip(self.user, station, 'DE', ['12'], Decimal('2000'), day)
+        prizes = ['000012'] + ['12345'] * 11 + ['1234'] * 4 + ['123', '99']
+        settle_lottery_result(LotteryResult.objects.create(station=station, date=day, prizes=prizes))
+
+        deposit = DepositRequest.objects.create(user=self.user, amount=Decimal('50000'), status='APPROVED')
+        credit_wallet(self.wallet.pk, 'DEPOSIT', [(deposit.amount, f"Admin duyệt yêu cầu nạp tiền #{deposit.id}")])
+        withdrawal = WithdrawalRequest.objects.create(
+            user=self.user, amount=Decimal('30000'), status='APPROVED',
+            full_name_cccd='A', bank_name='VCB', account_number='1',
+        )
+        debit_wallet(self.wallet.pk, 'WITHDRAW', [(withdrawal.amount, f"Admin duyệt yêu cầu rút tiền #{withdrawal.id}")])
+        CustomUser.objects.create(username='vi2')
+
+    def reconcile(self):
+        results = [reconcile_range(lo, hi) for lo, hi in wallet_id_ranges(3)]
+        self.assertEqual(sum(result['wallets'] for result in results), 2)
+        return [diff for result in results for diff in result['diffs']]
+
+    def test_consistent_ledger_has_no_diffs(self):
+        self.assertEqual(Bet.objects.filter(status='WON').count(), 3)
+        self.assertEqual(self.reconcile(), [])
+
+    def test_mismatches_are_reported_per_wallet(self):
+        Wallet.objects.filter(pk=self.wallet.pk).update(balance=F('balance') + 1)
+        Bet.objects.filter(number='34').update(amount=Decimal('5000'))
+
+        diffs = self.reconcile()
+        self.assertEqual([diff['wallet_id'] for diff in diffs], [self.wallet.pk])
+        self.assertEqual({problem['check'] for problem in diffs[0]['problems']}, {'balance', 'bet_minus_refund'})
+
+    def test_archived_bets_are_included(self):
+        archive_bets(before=timezone.localdate() + datetime.timedelta(days=1))
+        self.assertFalse(Bet.objects.exists())
+        self.assertEqual(self.reconcile(), [])
+
+    def test_command_reads_each_archive_file_once_per_run(self):
+        archive_bets(before=timezone.localdate() + datetime.timedelta(days=1))
+        stdout = StringIO()
+
+        with patch('lottery.archive.read_month_chunks', wraps=read_month_chunks) as reads:
+            call_command('reconcile', parts=3, stdout=stdout)
+
+        self.assertEqual(reads.call_count, 1)
+        self.assertIn("Không có sai lệch.", stdout.getvalue())
+
+    def test_each_range_gets_only_its_archived_totals(self):
+        other = CustomUser.objects.get(username='vi2')
+        archived = {
+            self.user.pk: (Decimal('4000.00'), Decimal('1000.00')),
+            other.pk: (Decimal('1.00'), Decimal('0.00')),
+        }
+        ranges = [(self.wallet.pk, self.wallet.pk), (other.wallet.pk, other.wallet.pk)]
+
+        parts = split_archived_totals(archived, ranges)
+
+        self.assertEqual(parts, [{self.user.pk: archived[self.user.pk]}, {other.pk: archived[other.pk]}])
+        self.assertEqual(split_archived_totals(archived, ranges[:1]), [{self.user.pk: archived[self.user.pk]}])
+
+
+class WalletContentionStressTests(TransactionTestCase):
+    """
+    Nhiều luồng cùng trừ/cộng tiền MỘT ví. Với đọc-sửa-ghi trong Python
+    sẽ mất cập nhật; với UPDATE có điều kiện thì số dư cuối phải khớp
+    chính xác với số giao dịch đã ghi.
+    """
+    THREADS = 8
+    OPERATIONS_PER_THREAD = 25
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("Cần DB test dạng file để nhiều luồng cùng kết nối.")
+
+    def test_concurrent_debits_and_credits_keep_balance_exact(self):
+        wallet = CustomUser.objects.create(username='tranh-chap').wallet
+        Wallet.objects.filter(pk=wallet.pk).update(balance=Decimal('20000.00'))
+        errors = []
+
+        def worker(index):
+            try:
+                for i in range(self.OPERATIONS_PER_THREAD):
+                    try:
+                        if (index + i) % 3 == 0:
+                            credit_wallet(wallet.pk, 'REFUND', [(Decimal('1000'), f"t{index}-{i}")])
+                        else:
+                            debit_wallet(wallet.pk, 'BET', [(Decimal('1000'), f"t{index}-{i}")])
+                    except InsufficientBalance:
+                        pass
+            except Exception as e:  # lỗi DB (ví dụ: khóa) phải làm test thất bại
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        wallet.refresh_from_db()
+        credits = Transaction.objects.filter(wallet=wallet, transaction_type='REFUND').count()
+        debits = Transaction.objects.filter(wallet=wallet, transaction_type='BET').count()
+        self.assertEqual(wallet.balance, Decimal('20000.00') + Decimal('1000') * (credits - debits))
+        self.assertGreaterEqual(wallet.balance, 0)
@@ -4,4 +4,6 @@ from . import views
 urlpatterns = [
     path('nap-tien/', views.request_deposit_view, name='request_deposit'),
     path('rut-tien/', views.request_withdrawal_view, name='request_withdrawal'),
+    path('sao-ke/', views.statement_view, name='wallet_statement'),
+    path('sao-ke/json/', views.statement_json_view, name='wallet_statement_json'),
 ]
\ No newline at end of file
@@ -1,9 +1,16 @@
+import datetime
+
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
 #from django.db import transaction
-from .forms import DepositRequestForm, WithdrawalRequestForm
+from .forms import DepositRequestForm, StatementFilterForm, WithdrawalRequestForm
 from .models import DepositRequest, WithdrawalRequest, Transaction
+from .rollups import wallet_totals
 
 
 @login_required
@@ -70,3 +77,118 @@ def request_withdrawal_view(request):
         'form': form,
         'recent_requests': recent_requests,
     })
+
+
+# --- SAO KÊ VÍ ---
+# Phân trang theo con trỏ (timestamp, id) trên index (wallet, timestamp, id):
+# mỗi trang là một lần quét index từ vị trí con trỏ, không OFFSET, nên thời
+# gian tải trang không phụ thuộc độ dài lịch sử của ví.
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# id lớn nhất mà cột INTEGER (64 bit) chứa được
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+def encode_cursor(tx):
+    """Con trỏ sau giao dịch `tx`: '<timestamp tính bằng micro giây>_<id>'."""
+    return f"{(tx.timestamp - EPOCH) // datetime.timedelta(microseconds=1)}_{tx.id}"
+
+
+def decode_cursor(value):
+    """(timestamp, id) từ con trỏ, hoặc None nếu con trỏ không hợp lệ."""
+    micros, _, tx_id = (value or '').partition('_')
+    if not (micros.isdigit() and tx_id.isdigit()) or int(tx_id) > MAX_CURSOR_ID:
+        return None
+    try:
+        return EPOCH + datetime.timedelta(microseconds=int(micros)), int(tx_id)
+    except (OverflowError, ValueError):
+        # Số quá lớn cho timedelta/datetime: con trỏ bị sửa tay
+        return None
+
+
+def statement_page(transactions, cursor, page_size=None):
+    """
+    Một trang giao dịch, mới nhất trước, sau con trỏ `cursor`.
+    Trả về (danh sách giao dịch, con trỏ trang sau hoặc None).
+    """
+    page_size = page_size or getattr(settings, 'WALLET_STATEMENT_PAGE_SIZE', 50)
+    transactions = transactions.order_by('-timestamp', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        timestamp, tx_id = position
+        # timestamp <= t giới hạn khoảng quét index; OR chỉ lọc các dòng cùng timestamp
+        transactions = transactions.filter(timestamp__lte=timestamp).filter(
+            Q(timestamp__lt=timestamp) | Q(id__lt=tx_id)
+        )
+
+    rows = list(transactions[:page_size + 1])
+    if len(rows) > page_size:
+        return rows[:page_size], encode_cursor(rows[page_size - 1])
+    return rows, None
+
+
+def _statement(request):
+    """(form lọc, giao dịch của trang, con trỏ trang sau) cho user hiện tại."""
+    form = StatementFilterForm(request.GET)
+    if not form.is_valid():
+        return form, [], None
+
+    transactions = Transaction.objects.filter(wallet_id=request.user.wallet.id)
+    if form.cleaned_data['transaction_type']:
+        transactions = transactions.filter(transaction_type=form.cleaned_data['transaction_type'])
+    tz = timezone.get_current_timezone()
+    if form.cleaned_data['date_from']:
+        start = datetime.datetime.combine(form.cleaned_data['date_from'], datetime.time.min, tzinfo=tz)
+        transactions = transactions.filter(timestamp__gte=start)
+    if form.cleaned_data['date_to']:
+        end = datetime.datetime.combine(form.cleaned_data['date_to'] + datetime.timedelta(days=1), datetime.time.min,
+                                        tzinfo=tz)
+        transactions = transactions.filter(timestamp__lt=end)
+
+    rows, next_cursor = statement_page(transactions, request.GET.get('cursor'))
+    return form, rows, next_cursor
+
+
+@login_required
+def statement_view(request):
+    form, transactions, next_cursor = _statement(request)
+
+    # Giữ bộ lọc khi chuyển trang
+    filters = request.GET.copy()
+    filters.pop('cursor', None)
+
+    # Tổng tháng này theo loại giao dịch (từ bảng tổng hợp theo ngày)
+    today = timezone.localdate()
+    month_totals = wallet_totals(request.user.wallet.id, today.replace(day=1), today)
+
+    return render(request, 'wallet/statement.html', {
+        'form': form,
+        'month_summary': [
+            (label, month_totals[code]) for code, label in Transaction.TRANSACTION_TYPES if code in month_totals
+        ],
+        'transactions': transactions,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+        'filters': filters.urlencode(),
+    })
+
+
+@login_required
+def statement_json_view(request):
+    form, transactions, next_cursor = _statement(request)
+    if form.errors:
+        return JsonResponse({'errors': form.errors}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': tx.id,
+                'timestamp': tx.timestamp.isoformat(),
+                'transaction_type': tx.transaction_type,
+                'amount': str(tx.amount),
+                'signed_amount': str(-tx.amount if tx.transaction_type in Transaction.DEBIT_TYPES else tx.amount),
+                'description': tx.description,
+            }
+            for tx in transactions
+        ],
+        'next_cursor': next_cursor,
+    })